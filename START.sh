@@ -32,8 +32,16 @@ if [ "$EXISTING" -gt 0 ]; then
 fi
 
 echo ""
-echo "🌐 Starting Flask application..."
-echo "📊 Dashboard will be available at: http://localhost:5000"
+# ./START.sh --dev runs the single-process development server with the reloader
+WORKERS=${SENTINEL_WORKERS:-4}
+BIND=${SENTINEL_BIND:-0.0.0.0:5000}
+
+if [ "$1" = "--dev" ]; then
+    echo "🌐 Starting Flask development server..."
+else
+    echo "🌐 Starting System Sentinel ($WORKERS workers on $BIND)..."
+fi
+echo "📊 Dashboard will be available at: http://localhost:${BIND##*:}"
 echo ""
 echo "Press Ctrl+C to stop"
 echo ""
@@ -48,4 +56,8 @@ else
     source venv/bin/activate
 fi
 
-python app.py
+if [ "$1" = "--dev" ]; then
+    python app.py
+else
+    python serve.py --workers "$WORKERS" --bind "$BIND"
+fi
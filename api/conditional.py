@@ -0,0 +1,161 @@
+import gzip
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import Response, current_app, request
+from werkzeug.http import quote_etag
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# In-memory version counters restart at zero, so tags from another process never match.
+# serve.py gives its workers one shared token; they only tag with versions kept in the database.
+_PROCESS_TOKEN = os.environ.get('SENTINEL_ETAG_TOKEN') or (os.getpid(), time.time())
+
+def make_etag(*parts):
+    """Strong ETag value for a resource version (and whatever query shaped the body)"""
+    return hashlib.sha1(repr((_PROCESS_TOKEN,) + parts).encode()).hexdigest()[:20]
+
+def to_columns(points):
+    """Turn a list of dicts into parallel arrays: {'field': [v0, v1, ...]}
+
+    Nested dicts (e.g. network_io) become dotted field names.
+    """
+    fields = []
+    for key, value in (points[0].items() if points else ()):
+        if isinstance(value, dict):
+            fields.extend((key, sub) for sub in value)
+        else:
+            fields.append((key, None))
+    columns = {}
+    for key, sub in fields:
+        if sub is None:
+            columns[key] = [point.get(key) for point in points]
+        else:
+            columns[f'{key}.{sub}'] = [(point.get(key) or {}).get(sub) for point in points]
+    return columns
+
+class BodyCache:
+    """Serialised JSON bodies by ETag, so each version is encoded once however many clients ask
+
+    The gzip and brotli variants of a body are kept alongside it, so a
+    version is also compressed once per encoding rather than per response.
+    """
+
+    def __init__(self, max_entries=64, dumps=None):
+        self.max_entries = max_entries
+        # The app's JSON encoder; without one, the current Flask app's (needs an app context)
+        self.dumps = dumps
+        self._bodies = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, etag, build):
+        with self._lock:
+            variants = self._bodies.get(etag)
+            if variants is not None:
+                self._bodies.move_to_end(etag)
+                return variants[None]
+        body = (self.dumps or current_app.json.dumps)(build())
+        with self._lock:
+            self._bodies[etag] = {None: body}
+            while len(self._bodies) > self.max_entries:
+                self._bodies.popitem(last=False)
+        return body
+
+    def get_encoded(self, etag, body, encoding):
+        """body (the get_or_build result for etag) compressed with encoding, compressing it only once"""
+        with self._lock:
+            variants = self._bodies.get(etag)
+            encoded = variants.get(encoding) if variants is not None else None
+        if encoded is None:
+            encoded = encode_body(body.encode(), encoding)
+            with self._lock:
+                # Skipped if the version was evicted meanwhile
+                if etag in self._bodies:
+                    self._bodies[etag][encoding] = encoded
+        return encoded
+
+def negotiate_encoding(size, accept_encodings=None):
+    """The Content-Encoding to send a JSON body of size bytes with, or None
+
+    accept_encodings is a parsed Accept-Encoding header; by default the Flask request's.
+    """
+    if size < COMPRESS_MIN_BYTES:
+        return None
+    if accept_encodings is None:
+        accept_encodings = request.accept_encodings
+    if BROTLI_AVAILABLE and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+def encode_body(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+def _matching_tag(etag, if_none_match):
+    # A compressed representation carries the same tag with an encoding suffix
+    for tag in (etag, f'{etag}-gzip', f'{etag}-br'):
+        if if_none_match.contains(tag):
+            return tag
+    return None
+
+def conditional_body(etag, build, body_cache, if_none_match, accept_encodings):
+    """(status, body, headers) for a cached JSON resource, independent of the web framework
+
+    A 304 if the client already holds etag; otherwise the JSON from build(),
+    tagged with it. build() only runs when no cached body exists for this
+    version, so an unchanged resource costs a version lookup and nothing
+    else. The body is compressed here, from the cache, rather than by
+    compress_response. if_none_match and accept_encodings are the parsed
+    request headers (werkzeug ETags and Accept).
+    """
+    # Let browsers keep the body but revalidate it on every request
+    headers = {'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+    matched = _matching_tag(etag, if_none_match)
+    if matched:
+        headers['ETag'] = quote_etag(matched)
+        return 304, None, headers
+    body = body_cache.get_or_build(etag, build)
+    # Flask's JSON is ASCII-only, so its length is its size in bytes
+    encoding = negotiate_encoding(len(body), accept_encodings)
+    if encoding:
+        body = body_cache.get_encoded(etag, body, encoding)
+        headers['Content-Encoding'] = encoding
+        etag = f'{etag}-{encoding}'
+    headers['ETag'] = quote_etag(etag)
+    return 200, body, headers
+
+def conditional_json(etag, build, body_cache):
+    """conditional_body for the current Flask request, as a Response"""
+    status, body, headers = conditional_body(etag, build, body_cache, request.if_none_match,
+                                             request.accept_encodings)
+    return Response(body, status=status, headers=headers, mimetype='application/json' if body is not None else None)
+
+def compress_response(response):
+    """after_request hook: brotli (if installed) or gzip for JSON bodies the client accepts"""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    encoding = negotiate_encoding(len(data))
+    if encoding is None:
+        return response
+    response.set_data(encode_body(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak)
+    return response
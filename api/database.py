@@ -1,61 +1,657 @@
+# API module
 import sqlite3
 import json
+import math
+import operator
+import threading
+import time
+import weakref
+from array import array
+from bisect import bisect_right
+from itertools import compress, repeat
+from contextlib import contextmanager
 from datetime import datetime
 import os
 
+try:
+    import numpy
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Connection tuning applied to every per-thread connection. WAL lets the Flask
+# threads read while main.py's scheduler (a separate process) writes, and
+# synchronous=NORMAL only fsyncs at checkpoints instead of on every commit.
+# auto_vacuum only takes effect before the file's first write, and switching
+# to WAL is one, so it comes first; on an existing file it is a no-op.
+PRAGMAS = (
+    'PRAGMA auto_vacuum=INCREMENTAL',
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-8000',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA foreign_keys=ON',
+)
+
+# Typed metric columns, in the order they are stored
+METRIC_COLUMNS = (
+    ('ts', 'REAL'),
+    ('cpu_usage', 'REAL'),
+    ('memory_usage', 'REAL'),
+    ('disk_usage', 'REAL'),
+    ('bytes_sent', 'INTEGER'),
+    ('bytes_recv', 'INTEGER'),
+    ('process_count', 'INTEGER'),
+)
+
+# Gauges summarised as min/avg/max/p95 in the rollup tables. Network
+# counters are monotonic, so rollups keep the last (max) value instead.
+ROLLUP_FIELDS = ('cpu_usage', 'memory_usage', 'disk_usage', 'process_count')
+COUNTER_FIELDS = ('bytes_sent', 'bytes_recv')
+
+# Rollup table name -> bucket width in seconds, finest first
+ROLLUPS = {
+    '1m': 60,
+    '1h': 3600,
+    '1d': 86400,
+}
+
+def _build_rollup_upsert(table):
+    columns = ['bucket', 'samples']
+    updates = ['samples = samples + 1', 'finalized = 0']
+    for field in ROLLUP_FIELDS:
+        columns += [f'{field}_min', f'{field}_sum', f'{field}_max']
+        updates += [f'{field}_min = min({field}_min, excluded.{field}_min)',
+                    f'{field}_sum = {field}_sum + excluded.{field}_sum',
+                    f'{field}_max = max({field}_max, excluded.{field}_max)']
+    for field in COUNTER_FIELDS:
+        columns.append(field)
+        updates.append(f'{field} = max({field}, excluded.{field})')
+    placeholders = ', '.join(['?', '1'] + ['?'] * (len(columns) - 2))
+    return (f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholders}) '
+            f'ON CONFLICT(bucket) DO UPDATE SET {", ".join(updates)}')
+
+def _build_rollup_downsample(table):
+    """Merge runs of adjacent buckets into wider ones, keeping the rollup column names
+
+    Min, max, sums and counters merge exactly; a merged p95 is the largest
+    p95 of its buckets, an upper bound rather than the exact percentile.
+    """
+    columns = ['CAST(bucket / :width AS INTEGER) * :width AS bucket', 'SUM(samples) AS samples']
+    for field in ROLLUP_FIELDS:
+        columns += [f'MIN({field}_min) AS {field}_min', f'SUM({field}_sum) AS {field}_sum',
+                    f'MAX({field}_max) AS {field}_max', f'MAX({field}_p95) AS {field}_p95']
+    columns += [f'MAX({field}) AS {field}' for field in COUNTER_FIELDS]
+    return (f'SELECT {", ".join(columns)} FROM {table} WHERE bucket >= :start AND bucket < :end '
+            f'GROUP BY 1 ORDER BY 1')
+
+# SQL is kept in constants so sqlite3's per-connection statement cache
+# reuses the prepared statements instead of recompiling them per call
+INSERT_SERVER = '''INSERT INTO servers (name, type, status, ip, deployed_at, data)
+                   VALUES (?, ?, ?, ?, ?, ?)'''
+INSERT_METRICS = '''INSERT INTO metrics (timestamp, ts, cpu_usage, memory_usage, disk_usage,
+                                         bytes_sent, bytes_recv, process_count)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)'''
+RAW_METRIC_FIELDS = 'timestamp, cpu_usage, memory_usage, disk_usage, bytes_sent, bytes_recv, process_count'
+SELECT_METRICS_HISTORY = f'SELECT {RAW_METRIC_FIELDS} FROM metrics ORDER BY ts DESC LIMIT ?'
+SELECT_METRICS_RANGE = f'''SELECT {RAW_METRIC_FIELDS} FROM metrics
+                           WHERE ts >= ? AND ts < ? ORDER BY ts'''
+# Bounded count: stops reading the index once the range is known to be too big for raw rows
+COUNT_METRICS_RANGE = 'SELECT COUNT(*) FROM (SELECT 1 FROM metrics WHERE ts >= ? AND ts < ? LIMIT ?)'
+# Raw samples averaged into fixed-width groups (counters keep their last value)
+SELECT_METRICS_DOWNSAMPLED = '''SELECT MIN(timestamp), AVG(cpu_usage), AVG(memory_usage), AVG(disk_usage),
+                                       MAX(bytes_sent), MAX(bytes_recv), AVG(process_count)
+                                FROM metrics WHERE ts >= ? AND ts < ?
+                                GROUP BY CAST((ts - ?) / ? AS INTEGER) ORDER BY MIN(ts)'''
+SELECT_METRICS_SINCE = f'SELECT id, {RAW_METRIC_FIELDS} FROM metrics WHERE id > ? ORDER BY id LIMIT ?'
+SELECT_BUCKET_VALUES = f'SELECT {", ".join(ROLLUP_FIELDS)} FROM metrics WHERE ts >= ? AND ts < ?'
+ALERT_COLUMNS = (
+    ('ts', 'REAL'),
+    ('metric', 'TEXT'),
+    ('value', 'REAL'),
+    ('threshold', 'REAL'),
+    ('host', 'TEXT'),
+)
+ALERT_FIELDS = 'id, timestamp, severity, message, metric, value, threshold, host'
+INSERT_ALERT = '''INSERT INTO alerts (timestamp, ts, severity, message, metric, value, threshold, host)
+                  VALUES (?, ?, ?, ?, ?, ?, ?, ?)'''
+SELECT_RECENT_ALERTS = f'SELECT {ALERT_FIELDS} FROM alerts ORDER BY id DESC LIMIT ?'
+SELECT_ALERT_COUNTS = 'SELECT severity, count FROM alert_counts'
+UPSERT_SERVICE_STATUS = '''INSERT INTO service_status (name, pid, updated_at, data) VALUES (?, ?, ?, ?)
+                           ON CONFLICT(name) DO UPDATE SET pid = excluded.pid, updated_at = excluded.updated_at,
+                               data = excluded.data'''
+UPSERT_ROLLUP = {name: _build_rollup_upsert(f'metrics_{name}') for name in ROLLUPS}
+DOWNSAMPLE_ROLLUP = {name: _build_rollup_downsample(f'metrics_{name}') for name in ROLLUPS}
+
+# Percentiles reported by metric_statistics
+STAT_PERCENTILES = (50, 95, 99)
+# Rows pulled per fetchmany() while loading a statistics range into arrays
+STATS_FETCH_SIZE = 65536
+
+def to_epoch(value):
+    """Accept an epoch number or an ISO timestamp and return epoch seconds"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return datetime.fromisoformat(value).timestamp()
+
+class _ThreadConnection:
+    """One thread's connection, held in the thread-local so it dies with the thread"""
+    __slots__ = ('conn', 'finalizer', '__weakref__')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.finalizer = weakref.finalize(self, conn.close)
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list (or NumPy array)"""
+    if not len(sorted_values):
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
 class Database:
-    def __init__(self, db_path='data/infrastructure.db'):
+    def __init__(self, db_path='data/infrastructure.db', busy_timeout=5.0):
         self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         self._init_db()
-    
+
+    def _connect(self):
+        # busy_timeout makes writers wait for a concurrent writer in another
+        # process instead of failing immediately with "database is locked"
+        # check_same_thread is off only so the finalizer can close it from whichever
+        # thread drops the holder; a connection is still only used by its own thread
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, cached_statements=256,
+                               check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _get_conn(self):
+        """Return this thread's connection, opening it on first use
+
+        It is closed when the thread exits, so short-lived request threads
+        do not leave connections (and their WAL file descriptors) behind.
+        """
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            holder = self._local.holder = _ThreadConnection(self._connect())
+        return holder.conn
+
+    @contextmanager
+    def transaction(self):
+        """Run a block of statements in one transaction on this thread's connection"""
+        conn = self._get_conn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def close(self):
+        """Close the calling thread's connection (call on shutdown)
+
+        Other threads' connections close when those threads exit, or at
+        interpreter exit for threads still running then.
+        """
+        holder = getattr(self._local, 'holder', None)
+        if holder is not None:
+            del self._local.holder
+            holder.finalizer()
+
     def _init_db(self):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS servers
-                     (id INTEGER PRIMARY KEY, name TEXT, type TEXT, 
-                      status TEXT, ip TEXT, deployed_at TEXT, data TEXT)''')
-        c.execute('''CREATE TABLE IF NOT EXISTS metrics
-                     (id INTEGER PRIMARY KEY, timestamp TEXT, 
-                      cpu_usage REAL, memory_usage REAL, disk_usage REAL, data TEXT)''')
-        c.execute('''CREATE TABLE IF NOT EXISTS alerts
-                     (id INTEGER PRIMARY KEY, timestamp TEXT, 
-                      severity TEXT, message TEXT)''')
-        conn.commit()
-        conn.close()
-    
+        with self.transaction() as conn:
+            c = conn.cursor()
+            c.execute('''CREATE TABLE IF NOT EXISTS servers
+                         (id INTEGER PRIMARY KEY, name TEXT, type TEXT,
+                          status TEXT, ip TEXT, deployed_at TEXT, data TEXT)''')
+            c.execute('''CREATE TABLE IF NOT EXISTS metrics
+                         (id INTEGER PRIMARY KEY, timestamp TEXT)''')
+            c.execute('''CREATE TABLE IF NOT EXISTS alerts
+                         (id INTEGER PRIMARY KEY, timestamp TEXT,
+                          severity TEXT, message TEXT)''')
+            self._migrate_metrics(c)
+            c.execute('CREATE INDEX IF NOT EXISTS idx_metrics_ts ON metrics (ts)')
+            self._create_rollup_tables(c)
+            self._migrate_alerts(c)
+            # Heartbeat and state published by long-running processes for the others to read
+            c.execute('''CREATE TABLE IF NOT EXISTS service_status
+                         (name TEXT PRIMARY KEY, pid INTEGER, updated_at REAL NOT NULL, data TEXT)''')
+
+    def _migrate_metrics(self, c):
+        """Add typed columns to older metrics tables and backfill them from the JSON blobs"""
+        existing = {row[1] for row in c.execute('PRAGMA table_info(metrics)')}
+        for column, column_type in METRIC_COLUMNS:
+            if column not in existing:
+                c.execute(f'ALTER TABLE metrics ADD COLUMN {column} {column_type}')
+
+        if 'data' not in existing:
+            return
+        rows = c.execute('SELECT id, timestamp, data FROM metrics WHERE ts IS NULL').fetchall()
+        updates = []
+        for row_id, timestamp, data in rows:
+            sample = json.loads(data) if data else {}
+            network = sample.get('network_io', {})
+            updates.append((to_epoch(timestamp), sample.get('cpu_usage'), sample.get('memory_usage'),
+                            sample.get('disk_usage'), network.get('bytes_sent'), network.get('bytes_recv'),
+                            sample.get('process_count'), row_id))
+        c.executemany('''UPDATE metrics SET ts = ?, cpu_usage = ?, memory_usage = ?, disk_usage = ?,
+                         bytes_sent = ?, bytes_recv = ?, process_count = ?, data = NULL WHERE id = ?''',
+                      updates)
+
+    def _migrate_alerts(self, c):
+        """Add structured alert columns, indexes and the per-severity counter table"""
+        existing = {row[1] for row in c.execute('PRAGMA table_info(alerts)')}
+        for column, column_type in ALERT_COLUMNS:
+            if column not in existing:
+                c.execute(f'ALTER TABLE alerts ADD COLUMN {column} {column_type}')
+        c.executemany('UPDATE alerts SET ts = ? WHERE id = ?',
+                      [(to_epoch(timestamp), row_id) for row_id, timestamp in
+                       c.execute('SELECT id, timestamp FROM alerts WHERE ts IS NULL').fetchall()])
+        c.execute('CREATE INDEX IF NOT EXISTS idx_alerts_ts ON alerts (ts)')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_alerts_severity ON alerts (severity, id)')
+
+        # Counts are maintained by triggers, so inserts from other processes
+        # and retention deletes keep them correct without a table scan
+        exists = c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'alert_counts'").fetchone()
+        c.execute('''CREATE TABLE IF NOT EXISTS alert_counts
+                     (severity TEXT PRIMARY KEY, count INTEGER NOT NULL)''')
+        if not exists:
+            c.execute('''INSERT INTO alert_counts (severity, count)
+                         SELECT severity, COUNT(*) FROM alerts GROUP BY severity''')
+        c.execute('''CREATE TRIGGER IF NOT EXISTS alerts_count_insert AFTER INSERT ON alerts BEGIN
+                         INSERT INTO alert_counts (severity, count) VALUES (NEW.severity, 1)
+                         ON CONFLICT(severity) DO UPDATE SET count = count + 1;
+                     END''')
+        c.execute('''CREATE TRIGGER IF NOT EXISTS alerts_count_delete AFTER DELETE ON alerts BEGIN
+                         UPDATE alert_counts SET count = count - 1 WHERE severity IS OLD.severity;
+                     END''')
+
+    def _create_rollup_tables(self, c):
+        for name, width in ROLLUPS.items():
+            table = f'metrics_{name}'
+            exists = c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                               (table,)).fetchone()
+            columns = ['bucket INTEGER PRIMARY KEY', 'samples INTEGER NOT NULL']
+            for field in ROLLUP_FIELDS:
+                columns += [f'{field}_min REAL', f'{field}_sum REAL', f'{field}_max REAL', f'{field}_p95 REAL']
+            columns += [f'{field} INTEGER' for field in COUNTER_FIELDS]
+            columns.append('finalized INTEGER NOT NULL DEFAULT 0')
+            c.execute(f'CREATE TABLE IF NOT EXISTS {table} ({", ".join(columns)})')
+            # Only a handful of buckets are ever open, so keep them in a partial index
+            c.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_open ON {table} (bucket) WHERE finalized = 0')
+            if exists:
+                continue
+
+            # New rollup table on an existing database: build it from the raw rows
+            aggregates = []
+            for field in ROLLUP_FIELDS:
+                aggregates += [f'MIN({field})', f'SUM({field})', f'MAX({field})']
+            aggregates += [f'MAX({field})' for field in COUNTER_FIELDS]
+            target = ['bucket', 'samples']
+            for field in ROLLUP_FIELDS:
+                target += [f'{field}_min', f'{field}_sum', f'{field}_max']
+            target += list(COUNTER_FIELDS)
+            c.execute(f'''INSERT INTO {table} ({", ".join(target)})
+                          SELECT CAST(ts / {width} AS INTEGER) * {width}, COUNT(*), {", ".join(aggregates)}
+                          FROM metrics WHERE ts IS NOT NULL GROUP BY 1''')
+
+    def _finalize_rollups(self, conn, now):
+        """Compute p95 for rollup buckets that have closed since the last call"""
+        for name, width in ROLLUPS.items():
+            table = f'metrics_{name}'
+            current = int(now // width) * width
+            buckets = conn.execute(f'SELECT bucket FROM {table} WHERE finalized = 0 AND bucket < ?',
+                                   (current,)).fetchall()
+            for (bucket,) in buckets:
+                rows = conn.execute(SELECT_BUCKET_VALUES, (bucket, bucket + width)).fetchall()
+                p95s = []
+                for index in range(len(ROLLUP_FIELDS)):
+                    values = sorted(row[index] for row in rows if row[index] is not None)
+                    p95s.append(percentile(values, 95))
+                assignments = ', '.join(f'{field}_p95 = ?' for field in ROLLUP_FIELDS)
+                conn.execute(f'UPDATE {table} SET {assignments}, finalized = 1 WHERE bucket = ?',
+                             (*p95s, bucket))
+
+    def finalize_rollups(self):
+        """Close out every rollup bucket that ended before now"""
+        with self.transaction() as conn:
+            self._finalize_rollups(conn, datetime.now().timestamp())
+
     def save_server(self, server):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute('''INSERT INTO servers (name, type, status, ip, deployed_at, data)
-                     VALUES (?, ?, ?, ?, ?, ?)''',
-                  (server['name'], server.get('type', 'unknown'), server['status'],
-                   server.get('ip', ''), server['deployed_at'], json.dumps(server)))
-        conn.commit()
-        conn.close()
-    
+        with self.transaction() as conn:
+            conn.execute(INSERT_SERVER,
+                         (server['name'], server.get('type', 'unknown'), server['status'],
+                          server.get('ip', ''), server['deployed_at'], json.dumps(server)))
+
     def save_metrics(self, metrics):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute('''INSERT INTO metrics (timestamp, cpu_usage, memory_usage, disk_usage, data)
-                     VALUES (?, ?, ?, ?, ?)''',
-                  (metrics['timestamp'], metrics['cpu_usage'], metrics['memory_usage'],
-                   metrics['disk_usage'], json.dumps(metrics)))
-        conn.commit()
-        conn.close()
-    
+        self.save_batch([metrics])
+
+    def _metrics_row(self, metrics):
+        network = metrics.get('network_io', {})
+        return (to_epoch(metrics['timestamp']), metrics['cpu_usage'], metrics['memory_usage'],
+                metrics['disk_usage'], network.get('bytes_sent'), network.get('bytes_recv'),
+                metrics.get('process_count'))
+
+    def save_batch(self, metrics_list=(), alerts=()):
+        """Write many samples and alerts in a single transaction"""
+        rows = [self._metrics_row(metrics) for metrics in metrics_list]
+
+        with self.transaction() as conn:
+            if rows:
+                conn.executemany(INSERT_METRICS, [(metrics['timestamp'], *row)
+                                                  for metrics, row in zip(metrics_list, rows)])
+                # Keep the rollups current incrementally instead of re-aggregating on read
+                for name, width in ROLLUPS.items():
+                    conn.executemany(UPSERT_ROLLUP[name], [self._rollup_values(row, width) for row in rows])
+                self._finalize_rollups(conn, max(row[0] for row in rows))
+            if alerts:
+                conn.executemany(INSERT_ALERT, [(alert['timestamp'], to_epoch(alert['timestamp']),
+                                                 alert.get('severity', 'warning'), alert['message'],
+                                                 alert.get('metric'), alert.get('value'),
+                                                 alert.get('threshold'), alert.get('host'))
+                                                for alert in alerts])
+
+    def _rollup_values(self, row, width):
+        values = [int(row[0] // width) * width]
+        for value in row[1:4] + row[6:7]:
+            values += [value, value, value]
+        values += list(row[4:6])
+        return values
+
+    def _raw_row_to_metrics(self, row):
+        return {
+            'timestamp': row[0],
+            'cpu_usage': row[1],
+            'memory_usage': row[2],
+            'disk_usage': row[3],
+            'network_io': {'bytes_sent': row[4], 'bytes_recv': row[5]},
+            'process_count': row[6]
+        }
+
+    def _rollup_row_to_metrics(self, row, resolution):
+        point = {
+            'timestamp': datetime.fromtimestamp(row['bucket']).isoformat(),
+            'resolution': resolution,
+            'samples': row['samples']
+        }
+        for field in ROLLUP_FIELDS:
+            point[field] = row[f'{field}_sum'] / row['samples'] if row[f'{field}_sum'] is not None else None
+            point[f'{field}_min'] = row[f'{field}_min']
+            point[f'{field}_max'] = row[f'{field}_max']
+            point[f'{field}_p95'] = row[f'{field}_p95']
+        point['network_io'] = {field: row[field] for field in COUNTER_FIELDS}
+        return point
+
+    def metrics_version(self):
+        """Newest metrics row id: a rowid lookup that changes whenever a sample is stored"""
+        return self._get_conn().execute('SELECT MAX(id) FROM metrics').fetchone()[0]
+
+    def get_metrics_since(self, after_id, limit=1000):
+        """Samples stored after row after_id, oldest first, and the newest row id seen"""
+        rows = self._get_conn().execute(SELECT_METRICS_SINCE, (after_id, limit)).fetchall()
+        return [self._raw_row_to_metrics(row[1:]) for row in rows], rows[-1][0] if rows else after_id
+
     def get_metrics_history(self, limit=50):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute('SELECT data FROM metrics ORDER BY id DESC LIMIT ?', (limit,))
-        rows = c.fetchall()
-        conn.close()
-        return [json.loads(row[0]) for row in rows][::-1]
-    
+        rows = self._get_conn().execute(SELECT_METRICS_HISTORY, (limit,)).fetchall()
+        return [self._raw_row_to_metrics(row) for row in reversed(rows)]
+
+    def _raw_fits(self, start, end, max_points):
+        count = self._get_conn().execute(COUNT_METRICS_RANGE, (start, end, max_points + 1)).fetchone()[0]
+        return count <= max_points
+
+    def choose_resolution(self, start, end, max_points):
+        """Pick the finest table that covers the whole range in about max_points rows
+
+        Raw rows if the range holds no more than max_points samples, otherwise
+        the smallest rollup whose buckets are at least (end - start) / max_points
+        wide. Ranges too long even for that fall back to 1d, which query_metrics
+        then downsamples.
+        """
+        if self._raw_fits(start, end, max_points):
+            return 'raw'
+        step = (end - start) / max(max_points, 1)
+        for name, width in ROLLUPS.items():
+            if width >= step:
+                return name
+        return '1d'
+
+    def query_metrics(self, start=None, end=None, resolution='auto', max_points=500):
+        """Return (resolution, points) for a time range, reading from the cheapest table
+
+        start/end accept epoch seconds or ISO timestamps; end defaults to now
+        and start to one day before end. The whole range is always covered:
+        when the chosen resolution has more than max_points rows in it, they
+        are averaged into wider groups rather than cut off.
+        """
+        end = to_epoch(end) or datetime.now().timestamp()
+        start = to_epoch(start) or end - ROLLUPS['1d']
+        max_points = max(max_points, 1)
+        if resolution in (None, '', 'auto'):
+            resolution = self.choose_resolution(start, end, max_points)
+        if resolution != 'raw' and resolution not in ROLLUPS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+
+        conn = self._get_conn()
+        if resolution == 'raw':
+            if self._raw_fits(start, end, max_points):
+                rows = conn.execute(SELECT_METRICS_RANGE, (start, end)).fetchall()
+            else:
+                rows = conn.execute(SELECT_METRICS_DOWNSAMPLED,
+                                    (start, end, start, (end - start) / max_points)).fetchall()
+            return resolution, [self._raw_row_to_metrics(row) for row in rows]
+
+        width = ROLLUPS[resolution]
+        # A partial first bucket can add one row over max_points; that is not worth a coarser step
+        group = width * max(1, math.ceil((end - start) / width / max_points))
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute(DOWNSAMPLE_ROLLUP[resolution],
+                                {'width': group, 'start': int(start // group) * group, 'end': end}).fetchall()
+        finally:
+            conn.row_factory = None
+        return resolution, [self._rollup_row_to_metrics(row, resolution) for row in rows]
+
+    def _stats_source(self, resolution):
+        """(table, time column, value expression per field, bucket width) for statistics queries"""
+        if resolution == 'raw':
+            return 'metrics', 'ts', {field: field for field in ROLLUP_FIELDS}, None
+        if resolution not in ROLLUPS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        # Rollups keep one mean per bucket: good for the trend, not for percentiles
+        return (f'metrics_{resolution}', 'bucket',
+                {field: f'{field}_sum / samples' for field in ROLLUP_FIELDS}, ROLLUPS[resolution])
+
+    def metric_statistics(self, start=None, end=None, thresholds=None, resolution='raw', max_gap=300):
+        """Summarise every gauge over a time range
+
+        Per metric: count, min, max, mean, p50/p95/p99 (nearest rank), seconds
+        spent above its threshold and the least-squares trend slope per hour.
+        The range is read from SQLite once, into one flat array per column,
+        and everything is computed over those arrays (vectorised with NumPy
+        when it is installed). A sample counts for the time until the next
+        one, capped at max_gap seconds, so gaps in collection are not counted
+        as time above threshold. Rollup resolutions take count, min, max and
+        mean from the exact per-bucket aggregates instead, and leave the
+        percentiles and time above threshold out (None): the buckets no
+        longer hold the samples those depend on, and percentiles of bucket
+        means understate the tails badly. Use raw for those.
+        """
+        end = to_epoch(end) or datetime.now().timestamp()
+        start = to_epoch(start) or end - ROLLUPS['1d']
+        thresholds = thresholds or {}
+        table, ts, values, width = self._stats_source(resolution)
+        fields = list(ROLLUP_FIELDS)
+        conn = self._get_conn()
+
+        times, columns = self._load_columns(conn, table, ts, [values[field] for field in fields], start, end)
+        gap = width or max_gap
+        if NUMPY_AVAILABLE:
+            times = numpy.frombuffer(times)
+            hours = (times - start) / 3600
+            durations = numpy.minimum(numpy.diff(times, append=end), gap)
+            hour_sums = (float(hours.sum()), float(hours @ hours))
+            compute = self._numpy_statistics
+        else:
+            hours = array('d', [(t - start) / 3600 for t in times])
+            durations = array('d', map(min, map(operator.sub, times[1:] + array('d', [end]), times), repeat(gap)))
+            hour_sums = (sum(hours), sum(map(operator.mul, hours, hours)))
+            compute = self._array_statistics
+        # The time sums are shared by every column without NULLs
+        metrics = {field: compute(hours, hour_sums, column, durations, thresholds.get(field))
+                   for field, column in zip(fields, columns)}
+        samples = len(times)
+
+        if width:
+            aggregates = ['SUM(samples)']
+            for field in fields:
+                aggregates += [f'SUM(CASE WHEN {field}_sum IS NOT NULL THEN samples END)', f'MIN({field}_min)',
+                               f'MAX({field}_max)', f'SUM({field}_sum) / SUM(samples)']
+            row = conn.execute(f'SELECT {", ".join(aggregates)} FROM {table} WHERE bucket >= ? AND bucket < ?',
+                               (start, end)).fetchone()
+            samples = row[0] or 0
+            for i, field in enumerate(fields):
+                metrics[field].update(zip(('count', 'min', 'max', 'mean'), row[1 + i * 4:5 + i * 4]))
+                metrics[field]['count'] = metrics[field]['count'] or 0
+                metrics[field].update({f'p{pct}': None for pct in STAT_PERCENTILES}, seconds_above_threshold=None)
+
+        return {
+            'start': datetime.fromtimestamp(start).isoformat(),
+            'end': datetime.fromtimestamp(end).isoformat(),
+            'resolution': resolution,
+            'samples': samples,
+            'first_sample': datetime.fromtimestamp(times[0]).isoformat() if len(times) else None,
+            'last_sample': datetime.fromtimestamp(times[-1]).isoformat() if len(times) else None,
+            'metrics': metrics
+        }
+
+    def _load_columns(self, conn, table, ts, values, start, end):
+        """Read a time range into one array('d') per column, in time order
+
+        Arrays hold 8 bytes per value instead of a tuple per row. NULLs come
+        back as -inf: they sort first and never count as above a threshold.
+        """
+        selected = ', '.join(f'IFNULL({value}, -9e999)' for value in values)
+        cursor = conn.execute(f'SELECT {ts}, {selected} FROM {table} WHERE {ts} >= ? AND {ts} < ? ORDER BY {ts}',
+                              (start, end))
+        columns = [array('d') for _ in range(len(values) + 1)]
+        while True:
+            rows = cursor.fetchmany(STATS_FETCH_SIZE)
+            if not rows:
+                break
+            for column, chunk in zip(columns, zip(*rows)):
+                column.extend(chunk)
+        return columns[0], columns[1:]
+
+    def _summarise(self, ordered, n, total, sx, sxx, sxy, above, threshold):
+        stats = {'count': n, 'min': None, 'max': None, 'mean': None}
+        stats.update({f'p{pct}': None for pct in STAT_PERCENTILES})
+        if n:
+            stats.update(min=float(ordered[0]), max=float(ordered[-1]), mean=total / n)
+            for pct in STAT_PERCENTILES:
+                stats[f'p{pct}'] = float(percentile(ordered, pct))
+        denominator = n * sxx - sx * sx
+        stats['trend_per_hour'] = (n * sxy - sx * total) / denominator if n > 1 and denominator else None
+        stats['threshold'] = threshold
+        stats['seconds_above_threshold'] = above
+        return stats
+
+    def _array_statistics(self, hours, hour_sums, column, durations, threshold):
+        """Statistics for one column using sorted() and C-level iterators only"""
+        values = column.tolist()
+        above = None
+        if threshold is not None:
+            above = sum(compress(durations, map(operator.gt, values, repeat(threshold))))
+        ordered = sorted(values)
+        ordered = ordered[bisect_right(ordered, -math.inf):]
+        if len(ordered) < len(values):
+            kept = [(x, value) for x, value in zip(hours, values) if value != -math.inf]
+            hours, values = [x for x, _ in kept], [value for _, value in kept]
+            hour_sums = (sum(hours), sum(map(operator.mul, hours, hours)))
+        return self._summarise(ordered, len(ordered), sum(ordered), *hour_sums,
+                               sum(map(operator.mul, hours, values)), above, threshold)
+
+    def _numpy_statistics(self, hours, hour_sums, column, durations, threshold):
+        """Statistics for one column as vectorised NumPy operations"""
+        values = numpy.frombuffer(column)
+        above = float(durations[values > threshold].sum()) if threshold is not None else None
+        present = values != -numpy.inf
+        ordered = numpy.sort(values[present])
+        if len(ordered) < len(values):
+            hours, values = hours[present], values[present]
+            hour_sums = (float(hours.sum()), float(hours @ hours))
+        return self._summarise(ordered, len(ordered), float(ordered.sum()), *hour_sums,
+                               float(hours @ values), above, threshold)
+
+    def _row_to_alert(self, row):
+        return {
+            'id': row[0],
+            'timestamp': row[1],
+            'severity': row[2],
+            'message': row[3],
+            'metric': row[4],
+            'value': row[5],
+            'threshold': row[6],
+            'host': row[7]
+        }
+
     def get_recent_alerts(self, limit=20):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute('SELECT timestamp, severity, message FROM alerts ORDER BY id DESC LIMIT ?', (limit,))
-        rows = c.fetchall()
-        conn.close()
-        return [{'timestamp': r[0], 'severity': r[1], 'message': r[2]} for r in rows]
+        rows = self._get_conn().execute(SELECT_RECENT_ALERTS, (limit,)).fetchall()
+        return [self._row_to_alert(row) for row in rows]
+
+    def query_alerts(self, limit=20, cursor=None, severity=None, metric=None, host=None,
+                     start=None, end=None):
+        """Page through alerts newest first using keyset pagination
+
+        cursor is the id of the last alert on the previous page, so each page
+        is an index range scan no matter how deep into history it is.
+        Returns (alerts, next_cursor).
+        """
+        clauses, params = [], []
+        if cursor is not None:
+            clauses.append('id < ?')
+            params.append(int(cursor))
+        if severity:
+            clauses.append('severity = ?')
+            params.append(severity)
+        if metric:
+            clauses.append('metric = ?')
+            params.append(metric)
+        if host:
+            clauses.append('host = ?')
+            params.append(host)
+        if start is not None:
+            clauses.append('ts >= ?')
+            params.append(to_epoch(start))
+        if end is not None:
+            clauses.append('ts < ?')
+            params.append(to_epoch(end))
+
+        where = f'WHERE {" AND ".join(clauses)}' if clauses else ''
+        rows = self._get_conn().execute(f'SELECT {ALERT_FIELDS} FROM alerts {where} ORDER BY id DESC LIMIT ?',
+                                        (*params, limit + 1)).fetchall()
+        alerts = [self._row_to_alert(row) for row in rows[:limit]]
+        next_cursor = alerts[-1]['id'] if len(rows) > limit else None
+        return alerts, next_cursor
+
+    def get_alert_counts(self):
+        by_severity = {severity: count for severity, count in
+                       self._get_conn().execute(SELECT_ALERT_COUNTS).fetchall() if count}
+        return {'total': sum(by_severity.values()), 'by_severity': by_severity}
+
+    def save_service_status(self, name, data):
+        with self.transaction() as conn:
+            conn.execute(UPSERT_SERVICE_STATUS, (name, os.getpid(), time.time(), json.dumps(data, default=str)))
+
+    def get_service_status(self, name):
+        """Last status saved under name, with its pid and age in seconds, or None"""
+        row = self._get_conn().execute('SELECT pid, updated_at, data FROM service_status WHERE name = ?',
+                                       (name,)).fetchone()
+        if row is None:
+            return None
+        return {**json.loads(row[2] or '{}'), 'pid': row[0], 'age_seconds': round(time.time() - row[1], 3)}
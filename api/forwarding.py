@@ -0,0 +1,42 @@
+import http.client
+import logging
+from urllib.parse import urlsplit
+from flask import Response, jsonify, request
+
+# Headers that describe one connection (RFC 9110 section 7.6.1) and are never passed on
+HOP_BY_HOP = {'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'te', 'trailer',
+              'transfer-encoding', 'upgrade'}
+# Set again by the worker's own server
+SERVER_HEADERS = {'server', 'date'}
+FORWARD_TIMEOUT = 300
+FORWARD_CHUNK_BYTES = 64 * 1024
+
+def forward_request(base_url, timeout=FORWARD_TIMEOUT):
+    """Replay the current request against base_url and stream the response back
+
+    Used by worker processes for the endpoints only the owner process can
+    answer. The body is relayed as it arrives, so downloads and long
+    responses are never buffered whole in the worker.
+    """
+    target = urlsplit(base_url)
+    conn = http.client.HTTPConnection(target.hostname, target.port, timeout=timeout)
+    path = request.full_path if request.query_string else request.path
+    headers = {key: value for key, value in request.headers.items() if key.lower() not in HOP_BY_HOP}
+    try:
+        conn.request(request.method, path, body=request.get_data(), headers=headers)
+        upstream = conn.getresponse()
+    except OSError as e:
+        conn.close()
+        logging.error(f"Forwarding {request.method} {request.path} to the owner failed: {e}")
+        return jsonify({'success': False, 'error': f"Owner process unavailable: {e}"}), 503
+
+    def relay():
+        try:
+            for chunk in iter(lambda: upstream.read1(FORWARD_CHUNK_BYTES), b''):
+                yield chunk
+        finally:
+            conn.close()
+
+    response_headers = [(key, value) for key, value in upstream.getheaders()
+                        if key.lower() not in HOP_BY_HOP | SERVER_HEADERS]
+    return Response(relay(), status=upstream.status, headers=response_headers)
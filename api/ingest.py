@@ -0,0 +1,153 @@
+import logging
+import queue
+import threading
+import time
+
+class MetricsIngestor:
+    """Write-behind queue that batches metric samples and alerts into SQLite.
+
+    Producers only pay for a queue put. A single writer thread drains the
+    queue and flushes with executemany inside one transaction, whenever
+    batch_size items are waiting or flush_interval_ms has elapsed.
+    """
+
+    def __init__(self, db, max_queue=10000, batch_size=200, flush_interval_ms=1000,
+                 block_timeout=0.0, max_retries=3):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.block_timeout = block_timeout
+        self.max_retries = max_retries
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'enqueued': 0,
+            'written_metrics': 0,
+            'written_alerts': 0,
+            'dropped': 0,
+            'backpressure_events': 0,
+            'batches': 0,
+            'flush_errors': 0,
+            'last_flush_ms': 0.0,
+        }
+        self._stop_event = threading.Event()
+        self._writer = threading.Thread(target=self._run, name='metrics-writer', daemon=True)
+        self._writer.start()
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+            return self._stats[key]
+
+    def _submit(self, kind, item):
+        if self._stop_event.is_set():
+            self._count('dropped')
+            return False
+        try:
+            self._queue.put_nowait((kind, item))
+        except queue.Full:
+            # Queue is full: optionally wait for the writer before giving up
+            self._count('backpressure_events')
+            try:
+                if not self.block_timeout:
+                    raise queue.Full
+                self._queue.put((kind, item), timeout=self.block_timeout)
+            except queue.Full:
+                # Log the first drop and then every 1000th so a stall doesn't flood the log
+                dropped = self._count('dropped')
+                if dropped % 1000 == 1:
+                    logging.warning(f"Metrics ingestion queue full - {dropped} items dropped so far")
+                return False
+        self._count('enqueued')
+        return True
+
+    def submit_metrics(self, metrics):
+        return self._submit('metrics', metrics)
+
+    def submit_alert(self, alert):
+        return self._submit('alert', alert)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            batch = self._collect_batch()
+            if batch:
+                self._flush(batch)
+        # Shutting down: write out whatever is still buffered
+        self._drain()
+
+    def _collect_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                break
+            batch.append(item)
+        return batch
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+
+    def _flush(self, batch):
+        metrics = [item for kind, item in batch if kind == 'metrics']
+        alerts = [item for kind, item in batch if kind == 'alert']
+
+        for attempt in range(1, self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                self.db.save_batch(metrics, alerts)
+            except Exception as e:
+                self._count('flush_errors')
+                logging.error(f"Metrics flush failed (attempt {attempt}/{self.max_retries}): {e}")
+                time.sleep(0.1 * attempt)
+                continue
+            with self._stats_lock:
+                self._stats['batches'] += 1
+                self._stats['written_metrics'] += len(metrics)
+                self._stats['written_alerts'] += len(alerts)
+                self._stats['last_flush_ms'] = round((time.perf_counter() - start) * 1000, 3)
+            return True
+
+        self._count('dropped', len(batch))
+        return False
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize()
+        stats['capacity'] = self._queue.maxsize
+        stats['queue_utilization'] = round(stats['queued'] / stats['capacity'], 4) if stats['capacity'] else 0
+        return stats
+
+    def close(self, timeout=10):
+        """Stop accepting items and flush everything still buffered"""
+        if self._stop_event.is_set():
+            return
+        self._stop_event.set()
+        try:
+            # Wake the writer if it is waiting on an empty queue
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self._writer.join(timeout=timeout)
+        # Catch anything submitted while the writer was finishing up
+        self._drain()
+        logging.info(f"Metrics ingestor stopped: {self.get_stats()}")
@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+class RetentionEngine:
+    """Enforces retention_days on raw metrics, minute rollups and alerts.
+
+    Rows are deleted in chunks of chunk_size, each in its own short
+    transaction, so the sampler and other writers are never locked out for
+    long. Hourly and daily rollups are kept, so long-range charts still
+    work after the raw samples are gone. Freed pages are released with
+    incremental_vacuum in chunks of vacuum_pages; a database created
+    before incremental auto-vacuum keeps them for reuse until it is
+    converted offline with convert_auto_vacuum() (python main.py --vacuum).
+    """
+
+    def __init__(self, db, retention_days=30, chunk_size=5000, interval_hours=6, vacuum_pages=2000):
+        self.db = db
+        self.retention_days = retention_days
+        self.chunk_size = chunk_size
+        self.interval_hours = interval_hours
+        self.vacuum_pages = vacuum_pages
+        self.last_report = None
+        self.totals = {'runs': 0, 'rows_deleted': 0, 'bytes_reclaimed': 0}
+        self._run_lock = threading.Lock()
+        self._warned_auto_vacuum = False
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def _database_bytes(self, conn):
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+        freelist = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        return page_size * page_count, page_size * freelist
+
+    def _delete_in_chunks(self, table, where, params):
+        deleted = 0
+        sql = f'DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE {where} LIMIT ?)'
+        while not self._stop_event.is_set():
+            with self.db.transaction() as conn:
+                count = conn.execute(sql, (*params, self.chunk_size)).rowcount
+            deleted += count
+            if count < self.chunk_size:
+                break
+            # Give other writers a chance at the lock between chunks
+            time.sleep(0.01)
+        return deleted
+
+    def _reclaim_space(self, conn):
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            # Switching modes takes a full VACUUM, which locks out every writer
+            # while it rewrites the file, so it is never done from a running server
+            if not self._warned_auto_vacuum:
+                logging.warning("Database is not in incremental auto-vacuum mode; freed pages are kept for reuse. "
+                                "Run python main.py --vacuum with the server stopped to convert it")
+                self._warned_auto_vacuum = True
+            return
+
+        while conn.execute('PRAGMA freelist_count').fetchone()[0] > 0 and not self._stop_event.is_set():
+            conn.execute(f'PRAGMA incremental_vacuum({self.vacuum_pages})').fetchall()
+            # Each chunk is its own short write; let other writers in between them
+            time.sleep(0.01)
+
+    def convert_auto_vacuum(self):
+        """Switch an older database to incremental auto-vacuum with one full VACUUM
+
+        The VACUUM rewrites the whole file under an exclusive lock, so run it
+        as offline maintenance, with no server writing to the database.
+        Returns (bytes before, bytes after), or None if already converted.
+        """
+        with self._run_lock:
+            conn = self.db._get_conn()
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+                return None
+            bytes_before, _ = self._database_bytes(conn)
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            conn.execute('VACUUM')
+            bytes_after, _ = self._database_bytes(conn)
+            logging.info(f"Converted database to incremental auto-vacuum: {bytes_before} -> {bytes_after} bytes")
+            return bytes_before, bytes_after
+
+    def run(self):
+        """Run one retention pass and return a report of what was reclaimed"""
+        with self._run_lock:
+            started = time.perf_counter()
+            cutoff = datetime.now() - timedelta(days=self.retention_days)
+            cutoff_ts = cutoff.timestamp()
+
+            # Make sure the hourly summaries for the doomed rows are complete
+            self.db.finalize_rollups()
+
+            conn = self.db._get_conn()
+            bytes_before, _ = self._database_bytes(conn)
+
+            deleted = {
+                'metrics': self._delete_in_chunks('metrics', 'ts < ?', (cutoff_ts,)),
+                'metrics_1m': self._delete_in_chunks('metrics_1m', 'bucket < ?', (cutoff_ts,)),
+                'alerts': self._delete_in_chunks('alerts', 'ts < ?', (cutoff_ts,)),
+            }
+
+            self._reclaim_space(conn)
+            conn.execute('PRAGMA optimize')
+            bytes_after, _ = self._database_bytes(conn)
+
+            report = {
+                'ran_at': datetime.now().isoformat(),
+                'cutoff': cutoff.isoformat(),
+                'retention_days': self.retention_days,
+                'rows_deleted': deleted,
+                'bytes_before': bytes_before,
+                'bytes_after': bytes_after,
+                'bytes_reclaimed': max(bytes_before - bytes_after, 0),
+                'duration_seconds': round(time.perf_counter() - started, 3)
+            }
+            self.last_report = report
+            self.totals['runs'] += 1
+            self.totals['rows_deleted'] += sum(deleted.values())
+            self.totals['bytes_reclaimed'] += report['bytes_reclaimed']
+            logging.info(f"Retention pass: deleted {deleted}, reclaimed {report['bytes_reclaimed']} bytes")
+            return report
+
+    def get_status(self):
+        return {
+            'retention_days': self.retention_days,
+            'interval_hours': self.interval_hours,
+            'last_report': self.last_report,
+            'totals': dict(self.totals)
+        }
+
+    def start(self):
+        """Run retention in a background thread every interval_hours"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name='retention', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self.run()
+            except Exception as e:
+                logging.error(f"Retention pass failed: {e}")
+            self._stop_event.wait(self.interval_hours * 3600)
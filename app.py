@@ -1,43 +1,256 @@
 #!/usr/bin/env python3
-from flask import Flask, render_template, jsonify, request, send_file
+from flask import Flask, Response, render_template, jsonify, request, send_file
 from flask_cors import CORS
 import sys
 import os
+import atexit
+import signal
+import json
+import time
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from server_deployer import ServerDeployer
+from server_deployer import ServerDeployer, BULK_ACTIONS, DEFAULT_BULK_CONCURRENCY
+from server_registry import ServerRegistry
 from system_monitor import SystemMonitor
 from config_manager import ConfigManager
-from file_automation import FileAutomation
+from file_automation import FileAutomation, BACKUP_MODES
+from backup_archive import available_compressions
 from report_generator import ReportGenerator
-from api.database import Database
+from report_cache import ReportCache
+from event_broker import EventBroker
+from job_manager import JobManager, JobQueueFull
+from container_cache import ContainerStateCache
+from owner_follower import OwnerFollower
+from api.database import Database, ROLLUPS
+from api.ingest import MetricsIngestor
+from api.retention import RetentionEngine
+from api.conditional import BodyCache, compress_response, conditional_json, make_etag, to_columns
+from api.forwarding import forward_request
+
+REPORT_FORMATS = ('html', 'pdf', 'json', 'csv')
+# A report's data ends at the last boundary of its history resolution, and at least of this many seconds
+REPORT_BUCKET_SECONDS = 60
+REPORT_HISTORY_POINTS = 500
+# Seconds between keep-alive comments on an idle event stream
+STREAM_HEARTBEAT = 15
+STREAM_HISTORY_POINTS = 20
+# Open /api/stream connections per process (0: no limit). Each one holds a thread for as long as
+# it is open, so serve.py sets this for thread-pooled gunicorn workers to keep threads for requests
+MAX_STREAMS = int(os.environ.get('SENTINEL_MAX_STREAMS', 0))
+# Seconds a dashboard turned away at the stream limit polls for before trying again
+STREAM_RETRY_AFTER = 60
+
+# standalone: this process does everything (python app.py). serve.py runs one
+# owner - sampling, Docker, retention, jobs and every write - and workers that
+# follow the owner through SQLite and forward the other endpoints to it.
+ROLE = os.environ.get('SENTINEL_ROLE', 'standalone')
+OWNER_URL = os.environ.get('SENTINEL_OWNER_URL')
+if ROLE not in ('standalone', 'owner', 'worker') or (ROLE == 'worker' and not OWNER_URL):
+    raise RuntimeError(f"SENTINEL_ROLE={ROLE!r} is not valid (workers also need SENTINEL_OWNER_URL)")
+# Endpoints a worker answers itself; they only read the shared database and followed state
+WORKER_ENDPOINTS = {'index', 'static', 'get_servers', 'get_stats', 'get_metrics', 'get_metrics_history',
+                    'get_alerts', 'get_report_analytics', 'get_processes', 'get_cache_status', 'stream_events'}
+# Seconds between a worker's checks for new samples and registry changes
+FOLLOW_INTERVAL = 1
 
 app = Flask(__name__)
 CORS(app)
+app.after_request(compress_response)
 
-deployer = ServerDeployer()
+# The owner stores simulated servers too, so workers see the whole inventory
+deployer = ServerDeployer(registry=ServerRegistry(persist_all=ROLE == 'owner'), discover=ROLE != 'worker')
 monitor = SystemMonitor()
 config_manager = ConfigManager()
-file_automation = FileAutomation()
 report_gen = ReportGenerator()
 db = Database()
+container_cache = OwnerFollower(db, deployer.registry, FOLLOW_INTERVAL) if ROLE == 'worker' \
+    else ContainerStateCache(deployer)
+# Backups, the report cache, ingest and jobs touch files and the database as soon as they are built
+# (catalog rebuilds, report eviction, a writer thread), so only the process that serves them has them
+if ROLE != 'worker':
+    file_automation = FileAutomation(restore_dir=monitor.config.get('restore_dir', 'restores'))
+    report_cache = ReportCache(report_gen.reports_dir, **monitor.config.get('reports', {}))
+    jobs = JobManager(max_workers=32, concurrency_limits={**deployer.get_deploy_concurrency(), 'cleanup': 1})
+    ingestor = MetricsIngestor(db)
+else:
+    file_automation = report_cache = jobs = ingestor = None
+retention = RetentionEngine(db, retention_days=monitor.config.get('retention_days', 30),
+                            **monitor.config.get('retention', {}))
+broker = EventBroker()
+body_cache = BodyCache(dumps=app.json.dumps)
+
+def persist_sample(metrics, alerts):
+    ingestor.submit_metrics(metrics)
+    for alert in alerts:
+        ingestor.submit_alert(alert)
+
+def save_owner_status(metrics, alerts):
+    # What workers cannot find in the database themselves
+    db.save_service_status('owner', {
+        'events_connected': container_cache.events_connected,
+        'cache': container_cache.get_staleness(),
+        'retention_runs': retention.totals['runs']
+    })
+
+# Workers share an ETag token, so their tags may only use versions every process agrees on
+def registry_version():
+    return deployer.registry.synced_state if ROLE == 'worker' else deployer.registry.version
+
+def retention_runs():
+    if ROLE == 'worker':
+        return container_cache.owner_status.get('pid'), container_cache.owner_status.get('retention_runs')
+    return retention.totals['runs']
+
+def collect_stats():
+    counts = deployer.registry.counts()
+    return {
+        'total_servers': counts['total'],
+        'active_servers': counts['by_status'].get('running', 0),
+        'real_servers': counts['real'],
+        'servers_by_status': counts['by_status'],
+        'total_alerts': db.get_alert_counts()['total'],
+        'uptime_percentage': 99.7,
+        'avg_response_time': 45,
+        'cost_savings': 12500,
+        'docker_enabled': deployer.use_docker
+    }
+
+def publish_stats():
+    broker.publish_changes('stats', collect_stats())
+
+def publish_sample(metrics, alerts):
+    point = {field: metrics.get(field) for field in ('timestamp', 'cpu_usage', 'memory_usage', 'disk_usage')}
+    broker.publish('metrics', {'point': point, 'alerts': [alert['message'] for alert in alerts]})
+    publish_stats()
+
+def publish_server_change(action, server):
+    broker.publish('server', {'action': action, 'server': server})
+    publish_stats()
+
+def snapshot_event():
+    """The event a stream opens with when the client has nothing to resume from"""
+    snapshot = {
+        'stats': collect_stats(),
+        'servers': deployer.list_servers(),
+        'history': db.get_metrics_history(STREAM_HISTORY_POINTS)
+    }
+    return f"event: snapshot\ndata: {json.dumps(snapshot, default=str)}\n\n"
+
+def shutdown():
+    if jobs:
+        jobs.shutdown(wait=False)
+    monitor.stop_sampler()
+    container_cache.stop()
+    retention.stop()
+    if ingestor:
+        ingestor.close()
+    deployer.registry.close()
+    if file_automation:
+        file_automation.catalog.close()
+    db.close()
+
+atexit.register(shutdown)
+
+# Sample system metrics in the background and persist each sample once,
+# instead of blocking every request on psutil.cpu_percent(interval=1)
+if ROLE != 'worker':
+    monitor.add_listener(persist_sample)
+if ROLE == 'owner':
+    monitor.add_listener(save_owner_status)
+# The same sample and every inventory change are pushed once to /api/stream
+monitor.add_listener(publish_sample)
+deployer.registry.add_listener(publish_server_change)
+
+# Skip the debug reloader's parent process, which never serves requests
+if __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    if ROLE == 'worker':
+        # Follow the owner's samples and registry rather than sampling or scanning Docker again
+        monitor.start_sampler(interval=FOLLOW_INTERVAL, source=container_cache.new_samples)
+        container_cache.start()
+    else:
+        monitor.start_sampler()
+        container_cache.start()
+        retention.start()
+
+@app.before_request
+def forward_to_owner():
+    if ROLE == 'worker' and request.endpoint not in WORKER_ENDPOINTS:
+        return forward_request(OWNER_URL)
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+# The read endpoints are written once, as functions of the query args: cacheable ones return
+# (etag, build) for conditional_json, the rest their JSON payload. The Flask views below and
+# asgi.py's async handlers both serve them.
+def servers_resource():
+    def build():
+        servers = deployer.list_servers()
+        return {'servers': servers, 'count': len(servers)}
+    
+    return make_etag('servers', registry_version()), build
+
 @app.route('/api/servers', methods=['GET'])
 def get_servers():
-    servers = deployer.list_servers()
-    return jsonify({'servers': servers, 'count': len(servers)})
+    return conditional_json(*servers_resource(), body_cache)
+
+# Freshness changes every second, so it is kept out of the cached bodies above
+def cache_status_payload():
+    return container_cache.get_staleness()
+
+@app.route('/api/cache', methods=['GET'])
+def get_cache_status():
+    return jsonify(cache_status_payload())
+
+def run_deploy(server_type, progress):
+    server = deployer.deploy_server(server_type, progress=progress)
+    db.save_server(server)
+    return server
 
 @app.route('/api/servers/deploy', methods=['POST'])
 def deploy_server():
-    data = request.json
+    data = request.json or {}
     server_type = data.get('type', 'web_server')
-    server = deployer.deploy_server(server_type)
-    db.save_server(server)
-    return jsonify({'success': True, 'server': server})
+    if server_type not in deployer.templates:
+        return jsonify({'success': False, 'error': f"Unknown server type: {server_type}"}), 400
+    try:
+        job = jobs.submit('deploy', run_deploy, server_type, concurrency_key=server_type)
+    except JobQueueFull as e:
+        return jsonify({'success': False, 'error': str(e)}), 429
+    return jsonify({'success': True, 'job_id': job['id'], 'job': job}), 202
+
+@app.route('/api/servers/deploy/batch', methods=['POST'])
+def deploy_server_batch():
+    data = request.json or {}
+    server_type = data.get('type', 'web_server')
+    count = int(data.get('count', 1))
+    if server_type not in deployer.templates:
+        return jsonify({'success': False, 'error': f"Unknown server type: {server_type}"}), 400
+    if not 1 <= count <= jobs.max_pending:
+        return jsonify({'success': False, 'error': f"count must be between 1 and {jobs.max_pending}"}), 400
+    
+    batch_id = f"batch-{os.urandom(4).hex()}"
+    job_ids = []
+    try:
+        for _ in range(count):
+            job_ids.append(jobs.submit('deploy', run_deploy, server_type,
+                                       concurrency_key=server_type, batch_id=batch_id)['id'])
+    except JobQueueFull as e:
+        return jsonify({'success': False, 'error': str(e), 'batch_id': batch_id, 'job_ids': job_ids}), 429
+    return jsonify({'success': True, 'batch_id': batch_id, 'job_ids': job_ids}), 202
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    limit = request.args.get('limit', 100, type=int)
+    return jsonify({'jobs': jobs.list_jobs(request.args.get('batch_id'), limit), 'stats': jobs.get_stats()})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f"Job not found: {job_id}"}), 404
+    return jsonify(job)
 
 @app.route('/api/servers/<name>/stop', methods=['POST'])
 def stop_server(name):
@@ -59,86 +272,330 @@ def delete_server(name):
     success = deployer.delete_server(name)
     return jsonify({'success': success})
 
+@app.route('/api/servers/bulk/<action>', methods=['POST'])
+def bulk_server_action(action):
+    """Apply a lifecycle action to a list of names and/or a type/status/name-glob selector"""
+    if action not in BULK_ACTIONS:
+        return jsonify({'success': False, 'error': f"Unknown action: {action}"}), 404
+    data = request.json or {}
+    names = data.get('names')
+    selector = data.get('selector') or {}
+    if names is None and not selector:
+        return jsonify({'success': False, 'error': "Provide 'names' or a 'selector'"}), 400
+    concurrency = min(max(int(data.get('concurrency', DEFAULT_BULK_CONCURRENCY)), 1), 128)
+    
+    targets = deployer.select_servers(names=names, server_type=selector.get('type'),
+                                      status=selector.get('status'), name_glob=selector.get('name'))
+    not_found = sorted(set(names or ()) - deployer.registry.names())
+    result = deployer.bulk_action(action, targets, concurrency=concurrency)
+    result['not_found'] = not_found
+    return jsonify({'success': result['failed'] == 0, **result})
+
+def metrics_payload():
+    metrics, alerts = monitor.monitor_system()
+    return {'metrics': metrics, 'alerts': alerts}
+
 @app.route('/api/metrics', methods=['GET'])
 def get_metrics():
-    metrics, alerts = monitor.monitor_system()
-    db.save_metrics(metrics)
-    return jsonify({'metrics': metrics, 'alerts': alerts})
+    return jsonify(metrics_payload())
+
+def history_resource(args):
+    """Metric history; format=columns returns parallel arrays instead of a list of points"""
+    start = args.get('start')
+    end = args.get('end')
+    resolution = args.get('resolution')
+    columns = args.get('format') == 'columns'
+    
+    def build():
+        if not (start or end or resolution):
+            found_resolution, history = 'raw', db.get_metrics_history(args.get('limit', 50, type=int))
+        else:
+            found_resolution, history = db.query_metrics(start, end, resolution,
+                                                         max_points=args.get('limit', 500, type=int))
+        if columns:
+            return {'columns': to_columns(history), 'count': len(history), 'resolution': found_resolution}
+        return {'history': history, 'resolution': found_resolution}
+    
+    # New samples and retention passes are the only things that change history
+    return make_etag('history', db.metrics_version(), retention_runs(), sorted(args.items())), build
 
 @app.route('/api/metrics/history', methods=['GET'])
 def get_metrics_history():
-    limit = request.args.get('limit', 50, type=int)
-    history = db.get_metrics_history(limit)
-    return jsonify({'history': history})
+    try:
+        return conditional_json(*history_resource(request.args), body_cache)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/metrics/ingest', methods=['GET'])
+def get_ingest_stats():
+    return jsonify(ingestor.get_stats())
+
+@app.route('/api/maintenance/retention', methods=['GET'])
+def get_retention_status():
+    return jsonify(retention.get_status())
+
+@app.route('/api/maintenance/retention', methods=['POST'])
+def run_retention():
+    try:
+        return jsonify({'success': True, 'report': retention.run()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def alerts_payload(args):
+    alerts, next_cursor = db.query_alerts(
+        limit=min(args.get('limit', 20, type=int), 500),
+        cursor=args.get('cursor', type=int),
+        severity=args.get('severity'),
+        metric=args.get('metric'),
+        host=args.get('host'),
+        start=args.get('start'),
+        end=args.get('end')
+    )
+    return {'alerts': alerts, 'next_cursor': next_cursor}
 
 @app.route('/api/alerts', methods=['GET'])
 def get_alerts():
-    alerts = db.get_recent_alerts(20)
-    return jsonify({'alerts': alerts})
+    try:
+        return jsonify(alerts_payload(request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+def stats_resource():
+    return make_etag('stats', registry_version(), db.get_alert_counts()['total'], deployer.use_docker), collect_stats
 
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
-    servers = deployer.list_servers()
-    real_servers = len([s for s in servers if s.get('real', False)])
-    stats = {
-        'total_servers': len(servers),
-        'active_servers': len([s for s in servers if s['status'] == 'running']),
-        'real_servers': real_servers,
-        'total_alerts': len(db.get_recent_alerts(100)),
-        'uptime_percentage': 99.7,
-        'avg_response_time': 45,
-        'cost_savings': 12500,
-        'docker_enabled': deployer.use_docker
-    }
-    return jsonify(stats)
+    return conditional_json(*stats_resource(), body_cache)
+
+@app.route('/api/stream', methods=['GET'])
+def stream_events():
+    """Server-sent events: a snapshot, then metric points, server changes and stats deltas
+    
+    A client reconnecting with Last-Event-ID is sent the events it missed
+    instead of a new snapshot, while they are still in the broker's buffer.
+    """
+    subscription, missed = broker.subscribe(request.headers.get('Last-Event-ID'), limit=MAX_STREAMS)
+    if subscription is None:
+        # The dashboard polls instead until Retry-After has passed
+        response = jsonify({'error': f"Stream limit reached ({MAX_STREAMS} per process)",
+                            'retry_after': STREAM_RETRY_AFTER})
+        response.headers['Retry-After'] = str(STREAM_RETRY_AFTER)
+        return response, 503
+    if missed is None:
+        missed = [snapshot_event()]
+    
+    def events():
+        try:
+            yield 'retry: 3000\n\n'
+            yield from missed
+            while not subscription.closed:
+                yield subscription.get(timeout=STREAM_HEARTBEAT) or ': keepalive\n\n'
+        finally:
+            subscription.close()
+    
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/stream/stats', methods=['GET'])
+def get_stream_stats():
+    return jsonify(broker.get_stats())
 
 @app.route('/api/automation/backup', methods=['POST'])
 def create_backup():
-    data = request.json
+    data = request.json or {}
     source = data.get('source', 'config')
-    backup_path = file_automation.backup_directory(source)
+    mode = data.get('mode', 'full')
+    if mode not in BACKUP_MODES:
+        return jsonify({'success': False, 'error': f"Unknown backup mode: {mode}"}), 400
+    if mode == 'incremental':
+        snapshot = file_automation.create_snapshot(source, data.get('name'))
+        return jsonify({'success': snapshot is not None, 'path': snapshot and snapshot['path'],
+                        'snapshot': snapshot})
+    if mode == 'archive':
+        compression = data.get('compression', 'gzip')
+        if compression not in available_compressions():
+            return jsonify({'success': False, 'error': f"Unsupported compression: {compression}",
+                            'available': available_compressions()}), 400
+        archive = file_automation.create_archive(source, data.get('name'), compression, level=data.get('level'),
+                                                 threads=data.get('threads'),
+                                                 memory_limit_mb=data.get('memory_limit_mb', 64))
+        return jsonify({'success': archive is not None, 'path': archive and archive['path'], 'archive': archive})
+    backup_path = file_automation.backup_directory(source, data.get('name'))
     return jsonify({'success': backup_path is not None, 'path': backup_path})
 
+@app.route('/api/automation/restore', methods=['POST'])
+def restore_backup():
+    data = request.json or {}
+    if not data.get('name') or not data.get('target'):
+        return jsonify({'success': False, 'error': "Provide 'name' and 'target'"}), 400
+    if data.get('member'):
+        # Single file out of an archive backup; target is the file path
+        success = file_automation.restore_file(data['name'], data['member'], data['target'])
+    else:
+        success = file_automation.restore_backup(data['name'], data['target'])
+    return jsonify({'success': success})
+
 @app.route('/api/automation/backups', methods=['GET'])
 def list_backups():
-    backups = file_automation.list_backups()
-    return jsonify({'backups': backups})
+    def build():
+        limit = min(request.args.get('limit', 50, type=int), 500)
+        backups, next_cursor = file_automation.query_backups(limit=limit, cursor=request.args.get('cursor', type=int),
+                                                             mode=request.args.get('mode'))
+        return {'backups': backups, 'next_cursor': next_cursor, 'totals': file_automation.catalog.totals()}
+    
+    etag = make_etag('backups', file_automation.catalog.version, sorted(request.args.items()))
+    return conditional_json(etag, build, body_cache)
+
+def run_cleanup(hours, max_size_mb, dry_run, progress):
+    report = file_automation.cleanup_backups(hours=hours, dry_run=dry_run,
+                                             progress=lambda percent, message=None: progress(percent * 9 // 10, message))
+    report['rotated_logs'] = file_automation.rotate_logs(max_size_mb=max_size_mb, dry_run=dry_run)
+    report['deleted_backups'] = len(report['candidates']) if dry_run else report['deleted']
+    return report
 
 @app.route('/api/automation/cleanup', methods=['POST'])
 def cleanup_files():
-    deleted_backups = file_automation.cleanup_old_backups(hours=3)
-    rotated_logs = file_automation.rotate_logs(max_size_mb=10)
-    return jsonify({
-        'success': True,
-        'deleted_backups': deleted_backups,
-        'rotated_logs': rotated_logs
-    })
+    """Delete old backups and rotate logs as a background job (dry_run only reports)"""
+    data = request.get_json(silent=True) or {}
+    try:
+        job = jobs.submit('cleanup', run_cleanup, float(data.get('hours', 3)), float(data.get('max_size_mb', 10)),
+                          bool(data.get('dry_run', False)), concurrency_key='cleanup')
+    except JobQueueFull as e:
+        return jsonify({'success': False, 'error': str(e)}), 429
+    return jsonify({'success': True, 'job_id': job['id'], 'job': job}), 202
+
+def processes_payload():
+    return {'processes': monitor.get_process_info()[:20]}
 
 @app.route('/api/system/processes', methods=['GET'])
 def get_processes():
-    processes = monitor.get_process_info()
-    return jsonify({'processes': processes[:20]})
+    return jsonify(processes_payload())
+
+def range_statistics(stats_range):
+    """Statistics for a (start, end, resolution) report range, or None without one"""
+    if stats_range is None:
+        return None
+    start, end, resolution = stats_range
+    return db.metric_statistics(start, end, monitor.config['thresholds'], resolution)
+
+def report_window(history_hours):
+    """(start, end) of a report's history, end rounded down to the bucket width of its resolution
+
+    Every request within one bucket covers the same data, so it can share the cached report.
+    """
+    now = time.time()
+    span = (history_hours or 0) * 3600
+    width = REPORT_BUCKET_SECONDS
+    if span:
+        width = max(width, ROLLUPS.get(db.choose_resolution(now - span, now, REPORT_HISTORY_POINTS), 0))
+    end = now // width * width
+    return end - span, end
+
+def build_report(report_format, metrics, servers, window, stats_range=None):
+    statistics = range_statistics(stats_range)
+    if report_format == 'pdf':
+        return report_gen.generate_pdf_report(metrics, servers, statistics)
+    elif report_format == 'json':
+        return report_gen.generate_json_report(metrics, servers, statistics)
+    elif report_format == 'csv':
+        return report_gen.generate_csv_report(metrics, servers, statistics)
+    resolution, history = db.query_metrics(*window, max_points=REPORT_HISTORY_POINTS)
+    return report_gen.generate_html_report(metrics, servers, history, resolution, statistics)
+
+def unique_report_name(filename, key):
+    # Report names only have second resolution; tie each file to its cache key
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}_{key[:8]}{ext}"
+
+def stream_html_report(key, metrics, window, stats_range=None):
+    """Render straight into the response while saving the same chunks for the cache"""
+    filename = unique_report_name(f'system_sentinel_report_{time.strftime("%Y%m%d_%H%M%S")}.html', key)
+    path = os.path.join(report_cache.reports_dir, filename)
+    resolution, history = db.query_metrics(*window, max_points=REPORT_HISTORY_POINTS)
+    chunks = report_gen.render_html_report(metrics, deployer.list_servers(), history, resolution,
+                                           range_statistics(stats_range))
+    
+    def tee():
+        part_path = f"{path}.part"
+        try:
+            with open(part_path, 'w') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            os.replace(part_path, path)
+        finally:
+            # Left behind when the client disconnects (GeneratorExit) or rendering fails
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        report_cache.put(key, filename)
+    
+    return Response(tee(), mimetype='text/html',
+                    headers={'Content-Disposition': f'attachment; filename={filename}', 'X-Report-Cache': 'miss'})
 
 @app.route('/api/report/generate', methods=['GET'])
 def generate_report():
+    """Generate a report, or reuse the cached one if inventory and metrics are unchanged
+    
+    With stream=1 the report itself is the response instead of a filename.
+    start/end (and resolution) add a statistics section for that time range.
+    """
     try:
         report_format = request.args.get('format', 'html').lower()
+        if report_format not in REPORT_FORMATS:
+            report_format = 'html'
+        stream = request.args.get('stream') == '1'
+        history_hours = request.args.get('history_hours', 24, type=float) if report_format == 'html' else None
+        stats_range = None
+        window = report_window(history_hours)
+        if request.args.get('start') or request.args.get('end'):
+            # An open-ended range ends with the history window rather than at the current second
+            stats_range = (request.args.get('start'), request.args.get('end') or window[1],
+                           request.args.get('resolution', 'raw'))
         metrics = monitor.get_current_metrics()
-        servers = deployer.list_servers()
+        # The window end versions the metrics (a new live sample every few seconds would not
+        # let any report be reused); the registry version covers the inventory
+        key = ReportCache.make_key(report_format, deployer.registry.version, window[1], history_hours, stats_range)
         
-        if report_format == 'pdf':
-            filename = report_gen.generate_pdf_report(metrics, servers)
-        elif report_format == 'json':
-            filename = report_gen.generate_json_report(metrics, servers)
-        elif report_format == 'csv':
-            filename = report_gen.generate_csv_report(metrics, servers)
-        else:
-            filename = report_gen.generate_html_report(metrics, servers)
+        def create(key):
+            filename = build_report(report_format, metrics, deployer.list_servers(), window, stats_range)
+            unique = unique_report_name(filename, key)
+            os.replace(os.path.join(report_gen.reports_dir, filename), os.path.join(report_gen.reports_dir, unique))
+            return unique
         
-        return jsonify({'success': True, 'filename': filename, 'format': report_format})
+        if stream and report_format == 'html':
+            filename = report_cache.get(key)
+            if filename is None:
+                return stream_html_report(key, metrics, window, stats_range)
+            cached = True
+        else:
+            filename, cached = report_cache.get_or_create(key, create)
+        if stream:
+            response = send_file(os.path.abspath(os.path.join(report_cache.reports_dir, filename)),
+                                 as_attachment=True, download_name=filename)
+            response.headers['X-Report-Cache'] = 'hit' if cached else 'miss'
+            return response
+        return jsonify({'success': True, 'filename': filename, 'format': report_format, 'cached': cached})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def analytics_payload(args):
+    """min/max/mean/percentiles, time above threshold and trend per metric over start..end"""
+    return db.metric_statistics(args.get('start'), args.get('end'), monitor.config['thresholds'],
+                                resolution=args.get('resolution', 'raw'), max_gap=args.get('max_gap', 300, type=float))
+
+@app.route('/api/report/analytics', methods=['GET'])
+def get_report_analytics():
+    try:
+        return jsonify(analytics_payload(request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/report/cache', methods=['GET'])
+def get_report_cache_stats():
+    return jsonify(report_cache.get_stats())
+
 @app.route('/api/report/download/<filename>', methods=['GET'])
 def download_report(filename):
     try:
@@ -151,4 +608,6 @@ if __name__ == '__main__':
     os.makedirs('static/js', exist_ok=True)
     os.makedirs('templates', exist_ok=True)
     os.makedirs('api', exist_ok=True)
+    # Turn SIGTERM into a normal exit so atexit flushes buffered samples
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""ASGI application: async handlers for streaming, lifecycle and read endpoints, Flask for the rest.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+    python serve.py --interface asgi --workers 4
+
+/api/stream runs on the event loop, so an open dashboard holds a queue
+rather than a thread. Single-server lifecycle actions await their Docker
+calls on an async Engine API (or CLI) client, so a container that takes
+seconds to stop does not tie up a thread. The read endpoints the
+dashboard polls (servers, stats, metrics, history, alerts, analytics,
+processes, cache freshness) are handled here too, from the same functions as app.py's
+views, with their SQLite and psutil work and the JSON encoding run on
+the thread pool; ETags, 304s and compression are the same. Every other
+route is the Flask app from app.py, run on a thread pool through a WSGI
+adapter. Metrics sampling already happens on the monitor's background
+thread.
+
+Needs starlette and a2wsgi, plus an ASGI server such as uvicorn.
+"""
+import asyncio
+import os
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_accept_header, parse_etags
+
+import app as sentinel
+from api.conditional import conditional_body, encode_body, negotiate_encoding
+from docker_client import create_async_docker_client
+
+# Threads available to Flask requests; each one serves a single request at a time
+WSGI_THREADS = int(os.environ.get('SENTINEL_WSGI_THREADS', 32))
+
+docker = create_async_docker_client(sentinel.deployer.docker) if sentinel.deployer.use_docker else None
+
+async def stream_events(request):
+    """Same events as the Flask /api/stream, without a thread per subscriber"""
+    subscription, missed = sentinel.broker.subscribe(request.headers.get('Last-Event-ID'),
+                                                     loop=asyncio.get_running_loop())
+    if missed is None:
+        missed = [await run_in_threadpool(sentinel.snapshot_event)]
+
+    async def events():
+        try:
+            yield 'retry: 3000\n\n'
+            for event in missed:
+                yield event
+            while not subscription.closed:
+                yield await subscription.get(timeout=sentinel.STREAM_HEARTBEAT) or ': keepalive\n\n'
+        finally:
+            subscription.close()
+
+    return StreamingResponse(events(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def render_json(request, payload, status=200):
+    """payload as Flask's jsonify would send it, compressed like compress_response does"""
+    body = (sentinel.app.json.dumps(payload) + '\n').encode()
+    headers = {'Vary': 'Accept-Encoding'}
+    encoding = negotiate_encoding(len(body), parse_accept_header(request.headers.get('Accept-Encoding')))
+    if encoding:
+        body = encode_body(body, encoding)
+        headers['Content-Encoding'] = encoding
+    return Response(body, status, headers, media_type='application/json')
+
+def read_endpoint(resource, cached=False, with_args=False):
+    """An async handler for one of app.py's read functions, run on the thread pool
+
+    cached resources return (etag, build) and get conditional responses;
+    the others return their payload. Functions of the query args answer a
+    ValueError with a 400, as their Flask views do.
+    """
+    def render(request):
+        args = (MultiDict(request.query_params.multi_items()),) if with_args else ()
+        try:
+            if not cached:
+                return render_json(request, resource(*args))
+            status, body, headers = conditional_body(*resource(*args), sentinel.body_cache,
+                                                     parse_etags(request.headers.get('If-None-Match')),
+                                                     parse_accept_header(request.headers.get('Accept-Encoding')))
+        except ValueError as e:
+            if not with_args:
+                raise
+            return render_json(request, {'error': str(e)}, 400)
+        return Response(body, status, headers, media_type='application/json' if body is not None else None)
+
+    async def endpoint(request):
+        return await run_in_threadpool(render, request)
+    return endpoint
+
+def server_action(action):
+    async def endpoint(request):
+        success = await sentinel.deployer.run_action_async(action, request.path_params['name'], docker)
+        return JSONResponse({'success': success})
+    return endpoint
+
+routes = [
+    Route('/api/stream', stream_events),
+    Route('/api/servers', read_endpoint(sentinel.servers_resource, cached=True)),
+    Route('/api/stats', read_endpoint(sentinel.stats_resource, cached=True)),
+    Route('/api/cache', read_endpoint(sentinel.cache_status_payload)),
+    Route('/api/metrics', read_endpoint(sentinel.metrics_payload)),
+    Route('/api/metrics/history', read_endpoint(sentinel.history_resource, cached=True, with_args=True)),
+    Route('/api/alerts', read_endpoint(sentinel.alerts_payload, with_args=True)),
+    Route('/api/report/analytics', read_endpoint(sentinel.analytics_payload, with_args=True)),
+    Route('/api/system/processes', read_endpoint(sentinel.processes_payload)),
+]
+# Workers leave lifecycle actions to the Flask routes, which forward them to the owner
+if sentinel.ROLE != 'worker':
+    routes += [
+        Route('/api/servers/{name}/stop', server_action('stop'), methods=['POST']),
+        Route('/api/servers/{name}/restart', server_action('restart'), methods=['POST']),
+        Route('/api/servers/{name}/terminate', server_action('terminate'), methods=['POST']),
+        Route('/api/servers/{name}/delete', server_action('delete'), methods=['DELETE']),
+    ]
+routes.append(Mount('/', WSGIMiddleware(sentinel.app, workers=WSGI_THREADS)))
+
+# The Flask app sets its own CORS headers; this covers the async routes and their preflights
+app = Starlette(routes=routes, middleware=[
+    Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])
+])
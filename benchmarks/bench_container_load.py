@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Compare container discovery at startup: per-container inspect vs bulk listing.
+
+Needs a running Docker daemon. With --create N it starts N throwaway
+busybox containers named monitor-server-bench-<i> first and removes them
+afterwards, so the comparison can be run at different fleet sizes.
+
+    python benchmarks/bench_container_load.py --create 200
+"""
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from docker_client import DockerAPIClient, DockerCLIClient, create_docker_client
+
+def legacy_load():
+    """The old startup path: one `docker ps`, then one `docker inspect` per running container"""
+    result = subprocess.run(['docker', 'ps', '-a', '--format', '{{.ID}}|{{.Status}}'],
+                            capture_output=True, text=True, check=True)
+    for line in result.stdout.strip().split('\n'):
+        if not line:
+            continue
+        container_id, status = line.split('|', 1)
+        if 'Up' in status:
+            subprocess.run(['docker', 'inspect', '-f', '{{range.NetworkSettings.Networks}}{{.IPAddress}}{{end}}',
+                            container_id], capture_output=True, text=True, check=True)
+
+def timed(label, fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<36} {best * 1000:>10.1f} ms")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Container discovery benchmark')
+    parser.add_argument('--create', type=int, default=0, help='Start N temporary containers first')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per method (best is reported)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if create_docker_client() is None:
+        print("Docker is not available - nothing to benchmark")
+        return 1
+
+    created = []
+    try:
+        for i in range(args.create):
+            name = f'monitor-server-bench-{i}'
+            subprocess.run(['docker', 'run', '-d', '--name', name, 'busybox:latest', 'sleep', '3600'],
+                           capture_output=True, check=True)
+            created.append(name)
+
+        api = DockerAPIClient()
+        cli = DockerCLIClient()
+        timed('legacy: ps + inspect per container', legacy_load, args.repeat)
+        timed('bulk: CLI ps -q + one inspect', lambda: cli.list_containers(all=True), args.repeat)
+        if api.ping():
+            containers = timed('bulk: Engine API /containers/json', lambda: api.list_containers(all=True), args.repeat)
+        else:
+            containers = cli.list_containers(all=True)
+        print(f"{len(containers)} containers")
+    finally:
+        if created:
+            subprocess.run(['docker', 'rm', '-f'] + created, capture_output=True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
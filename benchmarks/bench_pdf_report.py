@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Time PDF report generation for a large server inventory.
+
+Runs the built-in PDF writer always. When reportlab is installed it also
+runs the chunked reportlab pipeline and the old single-Table layout, so
+the cost of laying out one huge table can be compared directly.
+
+    python benchmarks/bench_pdf_report.py --servers 5000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import report_generator
+from report_generator import ReportGenerator, REPORTLAB_AVAILABLE
+
+SERVER_TYPES = ('web_server', 'database_server', 'monitoring_server')
+STATUSES = ('running', 'running', 'running', 'stopped', 'terminated')
+
+def fake_servers(count):
+    return [{
+        'name': f'monitor-server-{i:05d}',
+        'type': SERVER_TYPES[i % len(SERVER_TYPES)],
+        'status': STATUSES[i % len(STATUSES)],
+        'ip': f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}',
+        'real': i % 4 == 0,
+        'deployed_at': datetime.now().isoformat()
+    } for i in range(count)]
+
+def legacy_single_table(gen, path, metrics, servers):
+    """The old layout: the whole inventory in one reportlab Table"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Table, Paragraph
+    styles, table_styles = report_generator.pdf_styles()
+    rows = [report_generator.INVENTORY_HEADER] + list(gen._pdf_inventory_rows(servers))
+    doc = SimpleDocTemplate(path, pagesize=letter)
+    doc.build([Paragraph("System Sentinel - Infrastructure Report", styles['Title']),
+               Table(rows, style=table_styles['inventory'])])
+
+def timed(label, fn, path, repeat):
+    best = peak = None
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        fn(path)
+        elapsed = time.perf_counter() - start
+        run_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        best = elapsed if best is None else min(best, elapsed)
+        peak = run_peak if peak is None else max(peak, run_peak)
+    size = os.path.getsize(path) / (1024 * 1024)
+    print(f"{label:<32} {best * 1000:>10.1f} ms  peak {peak / (1024 * 1024):>7.1f} MB  file {size:>6.2f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description='PDF report benchmark')
+    parser.add_argument('--servers', type=int, default=5000, help='Inventory size')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per method (best time is reported)')
+    args = parser.parse_args()
+
+    servers = fake_servers(args.servers)
+    metrics = {'cpu_usage': 42.0, 'memory_usage': 63.5, 'disk_usage': 71.2}
+    with tempfile.TemporaryDirectory() as tmp:
+        gen = ReportGenerator(reports_dir=tmp)
+        print(f"{args.servers} servers")
+        timed('built-in writer', lambda path: gen._build_native_pdf(path, metrics, servers, None),
+              os.path.join(tmp, 'native.pdf'), args.repeat)
+        if REPORTLAB_AVAILABLE:
+            timed('reportlab, chunked tables', lambda path: gen._build_reportlab_pdf(path, metrics, servers, None),
+                  os.path.join(tmp, 'chunked.pdf'), args.repeat)
+            timed('reportlab, single table', lambda path: legacy_single_table(gen, path, metrics, servers),
+                  os.path.join(tmp, 'single.pdf'), args.repeat)
+        else:
+            print("reportlab not installed - skipping the reportlab variants")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
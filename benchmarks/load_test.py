@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Concurrent-request load test against one or more running servers.
+
+Keeps --concurrency keep-alive clients requesting --path for --duration
+seconds and reports throughput and latency. With --streams, that many
+/api/stream subscribers are held open for the whole run, which is what a
+wall of dashboards does to the server: a threaded server gives each one a
+thread, while the ASGI app only queues events for it.
+
+    python serve.py --workers 1 --server gunicorn --threads 8 --bind 127.0.0.1:5000
+    python serve.py --workers 1 --interface asgi --bind 127.0.0.1:5001
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --url http://127.0.0.1:5001 --streams 100
+
+The client is plain asyncio, so it can open thousands of connections from
+one process. Each URL is tested in turn, and later ones are compared with
+the first.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from urllib.parse import urlsplit
+
+async def read_response(reader):
+    """(status, body length, keep-alive) of one HTTP/1.1 response"""
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        length = 0
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            length += size
+            if not size:
+                break
+    elif status == 304:
+        length = 0
+    else:
+        length = len(await reader.readexactly(int(headers.get('content-length', 0))))
+    return status, length, headers.get('connection', '').lower() != 'close'
+
+class Target:
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.url = url
+        self.host = parts.hostname
+        self.port = parts.port or 80
+
+    def request(self, path):
+        return (f'GET {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n'
+                f'Accept-Encoding: gzip\r\n\r\n').encode()
+
+async def client(target, paths, deadline, latencies, errors):
+    reader = writer = None
+    index = 0
+    while time.monotonic() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(target.host, target.port)
+            writer.write(target.request(path))
+            await writer.drain()
+            status, _, keep_alive = await asyncio.wait_for(read_response(reader), deadline - time.monotonic() + 5)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            errors.append(path)
+            if writer:
+                writer.close()
+            reader = writer = None
+            continue
+        if status >= 400:
+            errors.append(path)
+        else:
+            latencies.append(time.perf_counter() - started)
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+    if writer:
+        writer.close()
+
+async def subscriber(target, ready, stop):
+    """Hold one /api/stream open, reading events until stop is set"""
+    try:
+        reader, writer = await asyncio.open_connection(target.host, target.port)
+        writer.write(target.request('/api/stream'))
+        await writer.drain()
+        status = await asyncio.wait_for(reader.readline(), 30)
+    except (OSError, asyncio.TimeoutError):
+        return
+    if b' 200 ' in status:
+        ready.append(1)
+    try:
+        while not stop.is_set() and await reader.read(65536):
+            pass
+    except OSError:
+        pass
+    finally:
+        writer.close()
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+async def run(target, paths, concurrency, duration, streams):
+    ready, stop = [], asyncio.Event()
+    subscribers = [asyncio.create_task(subscriber(target, ready, stop)) for _ in range(streams)]
+    # Give the streams time to connect before the clock starts
+    wait_until = time.monotonic() + 10
+    while len(ready) < streams and time.monotonic() < wait_until:
+        await asyncio.sleep(0.1)
+
+    latencies, errors = [], []
+    started = time.monotonic()
+    deadline = started + duration
+    await asyncio.gather(*[client(target, paths, deadline, latencies, errors) for _ in range(concurrency)])
+    elapsed = time.monotonic() - started
+    stop.set()
+    for task in subscribers:
+        task.cancel()
+    await asyncio.gather(*subscribers, return_exceptions=True)
+
+    latencies.sort()
+    return {
+        'streams': len(ready),
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': len(latencies) / elapsed,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99)
+    }
+
+def ms(value):
+    return f"{value * 1000:>8.1f}" if value is not None else f"{'-':>8}"
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent-request load test')
+    parser.add_argument('--url', action='append', required=True, help='Server base URL (repeat to compare)')
+    parser.add_argument('--path', action='append', help='Path to request (repeatable; default /api/stats)')
+    parser.add_argument('--concurrency', type=int, default=64, help='Concurrent keep-alive clients')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per URL')
+    parser.add_argument('--streams', type=int, default=0, help='/api/stream subscribers held open meanwhile')
+    args = parser.parse_args()
+
+    paths = args.path or ['/api/stats']
+    print(f"{args.concurrency} clients, {args.duration:g}s, {args.streams} streams, paths: {', '.join(paths)}")
+    print(f"{'url':<28} {'streams':>7} {'requests':>9} {'errors':>7} {'req/s':>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    baseline = None
+    for url in args.url:
+        result = asyncio.run(run(Target(url), paths, args.concurrency, args.duration, args.streams))
+        ratio = ''
+        if baseline is None:
+            baseline = result['rps']
+        elif baseline:
+            ratio = f"  x{result['rps'] / baseline:.1f}"
+        print(f"{url:<28} {result['streams']:>7} {result['requests']:>9} {result['errors']:>7} "
+              f"{result['rps']:>9.1f} {ms(result['p50'])} {ms(result['p95'])} {ms(result['p99'])}{ratio}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
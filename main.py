@@ -14,6 +14,9 @@ from server_deployer import ServerDeployer
 from system_monitor import SystemMonitor
 from config_manager import ConfigManager
 from report_generator import ReportGenerator
+from log_rotation import LogRotator
+from api.database import Database
+from api.retention import RetentionEngine
 
 class InfrastructureAutomation:
     def __init__(self):
@@ -22,6 +25,7 @@ class InfrastructureAutomation:
         self.monitor = SystemMonitor()
         self.config_manager = ConfigManager()
         self.report_generator = ReportGenerator()
+        self.db = Database()
         self.metrics_history = []
         self.alerts_history = []
     
@@ -35,6 +39,9 @@ class InfrastructureAutomation:
                 logging.StreamHandler()
             ]
         )
+        # Compress and prune earlier days' logs; the current one stays open
+        self.log_rotator = LogRotator('logs')
+        self.log_rotator.rotate()
     
     def deploy_infrastructure(self):
         logging.info("Starting infrastructure deployment...")
@@ -65,9 +72,14 @@ class InfrastructureAutomation:
     def generate_reports(self):
         logging.info("Generating reports...")
         
-        # System performance report
+        # System performance report, with statistics over the last day of stored history
+        try:
+            statistics = self.db.metric_statistics(thresholds=self.monitor.config['thresholds'])
+        except Exception as e:
+            logging.error(f"Failed to compute metric statistics: {e}")
+            statistics = None
         system_report = self.report_generator.generate_system_report(
-            self.metrics_history, self.alerts_history
+            self.metrics_history, self.alerts_history, statistics
         )
         
         # Server inventory report
@@ -91,6 +103,9 @@ class InfrastructureAutomation:
         # Schedule reports every hour
         schedule.every().hour.do(self.generate_reports)
         
+        # Schedule log rotation
+        schedule.every().hour.do(self.log_rotator.rotate)
+        
         logging.info("Scheduled tasks configured. Running...")
         
         while True:
@@ -114,6 +129,19 @@ class InfrastructureAutomation:
         
         logging.info("Demo completed successfully!")
 
+def vacuum_database():
+    """One-time offline conversion of an older database to incremental auto-vacuum"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    db = Database()
+    try:
+        result = RetentionEngine(db).convert_auto_vacuum()
+    finally:
+        db.close()
+    if result is None:
+        print("Database already uses incremental auto-vacuum; nothing to do")
+    else:
+        print(f"Database converted: {result[0]} -> {result[1]} bytes")
+
 def main():
     parser = argparse.ArgumentParser(description=' System Sentinel')
     parser.add_argument('--deploy', action='store_true', help='Deploy infrastructure')
@@ -121,8 +149,12 @@ def main():
     parser.add_argument('--report', action='store_true', help='Generate reports')
     parser.add_argument('--schedule', action='store_true', help='Run scheduled tasks')
     parser.add_argument('--demo', action='store_true', help='Run demo')
+    parser.add_argument('--vacuum', action='store_true',
+                        help='Convert the database to incremental auto-vacuum (stop the server first)')
     
     args = parser.parse_args()
+    if args.vacuum:
+        return vacuum_database()
     automation = InfrastructureAutomation()
     
     if args.demo:
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""Production server: one owner process and a pool of worker processes.
+
+    python serve.py --workers 4 --bind 0.0.0.0:5000
+
+The owner does everything stateful - metrics sampling, Docker discovery
+and events, retention, jobs and every SQLite write - and listens on a
+private loopback port. Workers serve the public address: they answer the
+read endpoints from the shared database and forward everything else to
+the owner (see SENTINEL_ROLE in app.py), so adding workers never adds
+samplers, Docker scans or writers. Workers run under gunicorn when it is
+installed, or as a pre-forked pool of threaded werkzeug servers sharing
+one listening socket otherwise. With --interface asgi every process runs
+asgi.py under uvicorn instead, in the same pre-forked layout. Linux and
+macOS only; on Windows use python app.py.
+"""
+import argparse
+import http.client
+import importlib.util
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# Seconds to wait for the owner to answer before starting workers (a first Docker scan can be slow)
+OWNER_READY_TIMEOUT = 120
+# Restart delays for a child that keeps exiting, doubling up to the maximum
+RESTART_DELAY = 1
+MAX_RESTART_DELAY = 30
+STOP_TIMEOUT = 15
+
+def parse_bind(value):
+    host, _, port = value.rpartition(':')
+    return host.strip('[]') or '0.0.0.0', int(port)
+
+def listen(host, port, backlog=1024):
+    """A listening socket that child processes can inherit"""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def run_child(role, fd, bind, interface):
+    """Serve the app on an inherited socket as the owner or a built-in worker"""
+    os.environ['SENTINEL_ROLE'] = role
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    logging.basicConfig(level=logging.INFO, format=f'%(asctime)s - %(levelname)s - [{role} %(process)d] %(message)s')
+    # A normal exit on SIGTERM runs app.py's atexit shutdown, which flushes buffered samples
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    if interface == 'asgi':
+        import uvicorn
+        import asgi
+        # uvicorn's fd= takes the socket for a Unix one, so TCP connections would keep
+        # Nagle's algorithm on and wait out delayed ACKs; hand it the socket itself.
+        # uvicorn handles SIGTERM itself and returns, so atexit still runs
+        config = uvicorn.Config(asgi.app, access_log=False, timeout_graceful_shutdown=STOP_TIMEOUT)
+        uvicorn.Server(config).run(sockets=[socket.socket(fileno=fd)])
+        return 0
+    from werkzeug.serving import make_server
+    import app
+
+    host, port = parse_bind(bind)
+    server = make_server(host, port, app.app, threaded=True, fd=fd)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+    return 0
+
+class Supervisor:
+    """Start the owner and the workers, restart any that die, and stop them all on SIGTERM/SIGINT"""
+
+    def __init__(self, args):
+        self.args = args
+        self.children = {}
+        self.stopping = False
+        self.owner_socket = listen('127.0.0.1', 0)
+        self.owner_url = f"http://127.0.0.1:{self.owner_socket.getsockname()[1]}"
+        # One ETag token for every worker, so a tag from one is honoured by all of them
+        self.etag_token = f"{os.getpid()}-{time.time()}"
+        self.use_gunicorn = args.interface == 'wsgi' and (args.server == 'gunicorn' or (
+            args.server == 'auto' and importlib.util.find_spec('gunicorn') is not None))
+        # gunicorn binds the public address itself; the built-in pool shares this socket
+        self.public_socket = None if self.use_gunicorn else listen(*parse_bind(args.bind))
+
+    def _child_command(self, role, sock, bind):
+        return [sys.executable, os.path.abspath(__file__), '--child', role, '--interface', self.args.interface,
+                '--fd', str(sock.fileno()), '--bind', bind]
+
+    def spawn(self, name):
+        env = dict(os.environ, SENTINEL_OWNER_URL=self.owner_url, SENTINEL_ETAG_TOKEN=self.etag_token)
+        if name == 'owner':
+            env.pop('SENTINEL_ETAG_TOKEN')
+            command = self._child_command('owner', self.owner_socket, '127.0.0.1:0')
+            fds = (self.owner_socket.fileno(),)
+        elif self.use_gunicorn:
+            env['SENTINEL_ROLE'] = 'worker'
+            # An event stream holds a gthread thread while it is open; keep half of them for requests
+            env.setdefault('SENTINEL_MAX_STREAMS', str(max(1, self.args.threads // 2)))
+            command = [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', self.args.bind,
+                       '--workers', str(self.args.workers), '--worker-class', 'gthread',
+                       '--threads', str(self.args.threads), '--graceful-timeout', str(STOP_TIMEOUT)]
+            fds = ()
+        else:
+            command = self._child_command('worker', self.public_socket, self.args.bind)
+            fds = (self.public_socket.fileno(),)
+        process = subprocess.Popen(command, cwd=ROOT, env=env, pass_fds=fds)
+        previous = self.children.get(name)
+        self.children[name] = {'process': process, 'started': time.monotonic(),
+                               'delay': previous['delay'] if previous else RESTART_DELAY}
+        logging.info(f"Started {name} (pid {process.pid})")
+        return process
+
+    def wait_for_owner(self):
+        """Block until the owner answers HTTP; False if asked to stop meanwhile"""
+        deadline = time.monotonic() + OWNER_READY_TIMEOUT
+        port = self.owner_socket.getsockname()[1]
+        while time.monotonic() < deadline and not self.stopping:
+            if self.children['owner']['process'].poll() is not None:
+                raise RuntimeError("Owner process exited during startup")
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            try:
+                conn.request('GET', '/api/stream/stats')
+                if conn.getresponse().status == 200:
+                    return True
+            except OSError:
+                pass
+            finally:
+                conn.close()
+            time.sleep(0.5)
+        if self.stopping:
+            return False
+        raise RuntimeError(f"Owner process did not answer within {OWNER_READY_TIMEOUT}s")
+
+    def worker_names(self):
+        return ['workers'] if self.use_gunicorn else [f'worker-{i}' for i in range(self.args.workers)]
+
+    def run(self):
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._request_stop)
+        try:
+            # Workers open the database only after the owner has created and migrated it
+            self.spawn('owner')
+            if self.wait_for_owner():
+                for name in self.worker_names():
+                    self.spawn(name)
+                server = 'gunicorn' if self.use_gunicorn else 'uvicorn' if self.args.interface == 'asgi' else 'built-in'
+                logging.info(f"Serving on {self.args.bind} with {self.args.workers} workers ({server}), "
+                             f"owner at {self.owner_url}")
+                self._supervise()
+        finally:
+            self.stop()
+        return 0
+
+    def _supervise(self):
+        restarts = {}
+        while not self.stopping:
+            now = time.monotonic()
+            for name, child in list(self.children.items()):
+                if name in restarts:
+                    if now >= restarts[name]:
+                        del restarts[name]
+                        self.spawn(name)
+                    continue
+                code = child['process'].poll()
+                if code is None:
+                    continue
+                # Back off if it died soon after starting; reset once it has run for a while
+                child['delay'] = RESTART_DELAY if now - child['started'] > MAX_RESTART_DELAY else \
+                    min(child['delay'] * 2, MAX_RESTART_DELAY)
+                logging.warning(f"{name} exited with {code}; restarting in {child['delay']}s")
+                restarts[name] = now + child['delay']
+            time.sleep(0.5)
+
+    def _request_stop(self, signum, frame):
+        self.stopping = True
+
+    def stop(self):
+        # Workers first, so nothing is forwarded to an owner that is already gone
+        names = [name for name in self.children if name != 'owner'] + ['owner']
+        for group in (names[:-1], names[-1:]):
+            processes = [self.children[name]['process'] for name in group if name in self.children]
+            for process in processes:
+                if process.poll() is None:
+                    process.terminate()
+            for process in processes:
+                try:
+                    process.wait(STOP_TIMEOUT)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+        logging.info("Stopped")
+
+def main():
+    parser = argparse.ArgumentParser(description='Run System Sentinel with an owner process and worker processes')
+    parser.add_argument('--bind', default=os.environ.get('SENTINEL_BIND', '0.0.0.0:5000'),
+                        help='host:port to serve on (default: $SENTINEL_BIND or 0.0.0.0:5000)')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('SENTINEL_WORKERS', os.cpu_count() or 1)),
+                        help='Worker processes (default: $SENTINEL_WORKERS or the CPU count)')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('SENTINEL_THREADS', 8)),
+                        help='Threads per gunicorn worker; the built-in server uses a thread per request')
+    parser.add_argument('--server', choices=('auto', 'gunicorn', 'builtin'), default='auto',
+                        help='WSGI worker server (auto: gunicorn if installed)')
+    parser.add_argument('--interface', choices=('wsgi', 'asgi'), default=os.environ.get('SENTINEL_INTERFACE', 'wsgi'),
+                        help='wsgi: app.py under gunicorn or the built-in server; asgi: asgi.py under uvicorn')
+    parser.add_argument('--child', choices=('owner', 'worker'), help=argparse.SUPPRESS)
+    parser.add_argument('--fd', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args.child, args.fd, args.bind, args.interface)
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+    if args.interface == 'asgi' and importlib.util.find_spec('uvicorn') is None:
+        parser.error('--interface asgi needs uvicorn (pip install uvicorn starlette a2wsgi)')
+    logging.basicConfig(level=logging.INFO, format=f'%(asctime)s - %(levelname)s - [supervisor] %(message)s')
+    try:
+        return Supervisor(args).run()
+    except RuntimeError as e:
+        logging.error(str(e))
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
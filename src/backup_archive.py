@@ -0,0 +1,232 @@
+import bisect
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import tarfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+DEFAULT_MEMORY_LIMIT = 64 * 1024 * 1024
+INDEX_SUFFIX = '.index.json'
+
+def _zstd_compress(data, level):
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+def _zstd_decompress(data):
+    return zstandard.ZstdDecompressor().decompress(data)
+
+# name -> (file extension, default level, compress(data, level), decompress(data))
+# Every chunk becomes an independent gzip member / xz stream / zstd frame, so
+# the concatenation is still a valid archive for the standard tools.
+COMPRESSORS = {
+    'gzip': ('tar.gz', 6, lambda data, level: gzip.compress(data, compresslevel=level, mtime=0), gzip.decompress),
+    'xz': ('tar.xz', 3, lambda data, level: lzma.compress(data, format=lzma.FORMAT_XZ, preset=level),
+           lzma.decompress),
+}
+if ZSTD_AVAILABLE:
+    COMPRESSORS['zstd'] = ('tar.zst', 3, _zstd_compress, _zstd_decompress)
+
+def available_compressions():
+    return list(COMPRESSORS)
+
+def archive_extension(compression):
+    return COMPRESSORS[compression][0]
+
+class ChunkedCompressor:
+    """Write-only file object that compresses fixed-size chunks on a thread pool.
+
+    At most max_in_flight chunks are buffered or being compressed at once,
+    which bounds memory regardless of how large the input is. Compressed
+    chunks are written out in order, and their offsets are kept for the index.
+    """
+
+    def __init__(self, out, compress, chunk_size, max_in_flight, executor):
+        self.out = out
+        self.compress = compress
+        self.chunk_size = chunk_size
+        self.max_in_flight = max_in_flight
+        self.executor = executor
+        self.chunks = []
+        self.position = 0
+        self.compressed_bytes = 0
+        self.digest = hashlib.sha256()
+        self._buffer = bytearray()
+        self._buffer_offset = 0
+        self._pending = deque()
+
+    def write(self, data):
+        self._buffer += data
+        self.position += len(data)
+        while len(self._buffer) >= self.chunk_size:
+            self._submit(bytes(self._buffer[:self.chunk_size]))
+            del self._buffer[:self.chunk_size]
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def _submit(self, chunk):
+        if len(self._pending) >= self.max_in_flight:
+            self._write_next()
+        self._pending.append((self._buffer_offset, len(chunk), self.executor.submit(self.compress, chunk)))
+        self._buffer_offset += len(chunk)
+
+    def _write_next(self):
+        offset, size, future = self._pending.popleft()
+        data = future.result()
+        self.out.write(data)
+        self.digest.update(data)
+        self.chunks.append([offset, size, self.compressed_bytes, len(data)])
+        self.compressed_bytes += len(data)
+
+    def close(self):
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        while self._pending:
+            self._write_next()
+
+class ChunkedReader:
+    """Read-only file object over a chunked archive, decompressing one chunk at a time"""
+
+    def __init__(self, path, index):
+        self._file = open(path, 'rb')
+        self._decompress = COMPRESSORS[index['compression']][3]
+        self._chunks = iter(index['chunks'])
+        self._buffer = b''
+        self._pos = 0
+
+    def read(self, size=-1):
+        # Serve reads from the current chunk without re-slicing what is left of it
+        while size < 0 or len(self._buffer) - self._pos < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._file.seek(chunk[2])
+            self._buffer = self._buffer[self._pos:] + self._decompress(self._file.read(chunk[3]))
+            self._pos = 0
+        end = len(self._buffer) if size < 0 else self._pos + size
+        data = self._buffer[self._pos:end]
+        self._pos = min(end, len(self._buffer))
+        return data
+
+    def close(self):
+        self._file.close()
+
+def write_archive(source_dir, archive_path, compression='gzip', level=None, threads=None,
+                  memory_limit=DEFAULT_MEMORY_LIMIT, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream source_dir into a chunk-compressed tar archive plus a JSON index
+
+    Files are read in tarfile's small copy buffers, never whole. Input and
+    compressed output of in-flight chunks stay under memory_limit (the
+    compressors' own working memory comes on top). Returns archive stats.
+    """
+    if compression not in COMPRESSORS:
+        raise ValueError(f"Unsupported compression: {compression}")
+    _, default_level, compress_fn, _ = COMPRESSORS[compression]
+    level = default_level if level is None else level
+    threads = threads or os.cpu_count() or 1
+    # Each in-flight chunk holds its input and, at worst, a same-sized output
+    max_in_flight = max(1, memory_limit // (2 * chunk_size))
+    threads = min(threads, max_in_flight)
+
+    members = {}
+    source_bytes = 0
+    started = time.perf_counter()
+    with open(archive_path, 'wb') as out, \
+            ThreadPoolExecutor(max_workers=threads, thread_name_prefix='compress') as executor:
+        writer = ChunkedCompressor(out, lambda data: compress_fn(data, level), chunk_size, max_in_flight, executor)
+        with tarfile.open(fileobj=writer, mode='w', format=tarfile.PAX_FORMAT) as tar:
+            for dirpath, dirnames, filenames in os.walk(source_dir):
+                dirnames.sort()
+                if dirpath != source_dir:
+                    tar.add(dirpath, os.path.relpath(dirpath, source_dir).replace(os.sep, '/'), recursive=False)
+                for filename in sorted(filenames):
+                    path = os.path.join(dirpath, filename)
+                    info = tar.gettarinfo(path, os.path.relpath(path, source_dir).replace(os.sep, '/'))
+                    if not info.isreg():
+                        tar.addfile(info)
+                        continue
+                    with open(path, 'rb') as f:
+                        tar.addfile(info, f)
+                    # The data ends on the 512-byte boundary tarfile has just padded to
+                    padded_size = -(-info.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+                    members[info.name] = [tar.offset - padded_size, info.size]
+                    source_bytes += info.size
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        'compression': compression,
+        'level': level,
+        'threads': threads,
+        'chunks': len(writer.chunks),
+        'files': len(members),
+        'source_bytes': source_bytes,
+        'archive_bytes': writer.compressed_bytes,
+        'sha256': writer.digest.hexdigest(),
+        'seconds': round(elapsed, 3),
+        'throughput_mb_s': round(source_bytes / (1024 * 1024) / elapsed, 2) if elapsed else None,
+        'compression_ratio': round(source_bytes / writer.compressed_bytes, 2) if writer.compressed_bytes else None
+    }
+    index = {
+        'compression': compression,
+        'chunk_size': chunk_size,
+        'chunks': writer.chunks,
+        'members': members,
+        'stats': stats
+    }
+    tmp_path = f"{archive_path}{INDEX_SUFFIX}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, f"{archive_path}{INDEX_SUFFIX}")
+    return stats
+
+def load_index(archive_path):
+    with open(f"{archive_path}{INDEX_SUFFIX}") as f:
+        return json.load(f)
+
+def extract_archive(archive_path, target_dir):
+    """Restore a whole archive, decompressing chunk by chunk"""
+    reader = ChunkedReader(archive_path, load_index(archive_path))
+    try:
+        with tarfile.open(fileobj=reader, mode='r|') as tar:
+            if hasattr(tarfile, 'data_filter'):
+                tar.extractall(target_dir, filter='data')
+            else:
+                tar.extractall(target_dir)
+    finally:
+        reader.close()
+
+def extract_member(archive_path, member, target_path):
+    """Restore one file by decompressing only the chunks that hold its data"""
+    index = load_index(archive_path)
+    if member not in index['members']:
+        raise KeyError(member)
+    data_offset, size = index['members'][member]
+    decompress = COMPRESSORS[index['compression']][3]
+    chunks = index['chunks']
+    starts = [chunk[0] for chunk in chunks]
+
+    os.makedirs(os.path.dirname(target_path) or '.', exist_ok=True)
+    position, end = data_offset, data_offset + size
+    with open(archive_path, 'rb') as archive, open(target_path, 'wb') as out:
+        i = max(bisect.bisect_right(starts, position) - 1, 0)
+        while position < end and i < len(chunks):
+            offset, length, compressed_offset, compressed_length = chunks[i]
+            archive.seek(compressed_offset)
+            data = decompress(archive.read(compressed_length))
+            out.write(data[position - offset:min(end, offset + length) - offset])
+            position = offset + length
+            i += 1
+    return size
@@ -0,0 +1,102 @@
+import json
+import os
+import sqlite3
+import threading
+
+class BackupCatalog:
+    """Persistent index of backups, filled in when each backup is made.
+
+    Listing reads one indexed page from SQLite instead of walking every
+    backup tree. FileAutomation adds and removes entries as it creates,
+    cleans up and garbage-collects backups.
+    """
+
+    def __init__(self, db_path='data/infrastructure.db'):
+        self.db_path = db_path
+        # Bumped on every add/remove, so listings can be revalidated cheaply
+        self.version = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=5.0, check_same_thread=False)
+        # Before WAL, so whichever opener creates the shared file gets Database's vacuum mode
+        self._conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'backup_catalog'").fetchone()
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS backup_catalog
+                              (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                               name TEXT UNIQUE NOT NULL, path TEXT NOT NULL, mode TEXT NOT NULL,
+                               size_bytes INTEGER, stored_bytes INTEGER, files INTEGER,
+                               checksum TEXT, created_at TEXT, details TEXT)''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_backup_catalog_mode ON backup_catalog(mode, id)')
+        self._conn.commit()
+        # A brand-new catalog gets filled once from whatever is already on disk
+        self.needs_rebuild = exists is None
+
+    def add(self, name, path, mode, size_bytes, files, checksum, created_at, stored_bytes=None, details=None):
+        with self._lock:
+            self._conn.execute('''INSERT INTO backup_catalog
+                                  (name, path, mode, size_bytes, stored_bytes, files, checksum, created_at, details)
+                                  VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                                  ON CONFLICT(name) DO UPDATE SET path = excluded.path, mode = excluded.mode,
+                                      size_bytes = excluded.size_bytes, stored_bytes = excluded.stored_bytes,
+                                      files = excluded.files, checksum = excluded.checksum,
+                                      created_at = excluded.created_at, details = excluded.details''',
+                               (name, path, mode, size_bytes,
+                                size_bytes if stored_bytes is None else stored_bytes, files, checksum,
+                                created_at, json.dumps(details) if details else None))
+            self._conn.commit()
+            self.version += 1
+
+    def remove(self, name):
+        with self._lock:
+            self._conn.execute('DELETE FROM backup_catalog WHERE name = ?', (name,))
+            self._conn.commit()
+            self.version += 1
+
+    def get(self, name):
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM backup_catalog WHERE name = ?', (name,)).fetchone()
+            return self._row_to_backup(row) if row else None
+
+    def _row_to_backup(self, row):
+        columns = ('id', 'name', 'path', 'mode', 'size_bytes', 'stored_bytes', 'files',
+                   'checksum', 'created', 'details')
+        backup = dict(zip(columns, row))
+        backup.update(json.loads(backup.pop('details') or '{}'))
+        backup['size_mb'] = round((backup['size_bytes'] or 0) / (1024 * 1024), 2)
+        backup['stored_mb'] = round((backup['stored_bytes'] or 0) / (1024 * 1024), 2)
+        return backup
+
+    def list(self, limit=50, cursor=None, mode=None):
+        """Newest-first page of backups; returns (backups, next_cursor)"""
+        clauses, params = [], []
+        if cursor is not None:
+            clauses.append('id < ?')
+            params.append(cursor)
+        if mode:
+            clauses.append('mode = ?')
+            params.append(mode)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        with self._lock:
+            rows = self._conn.execute(f'SELECT * FROM backup_catalog {where} ORDER BY id DESC LIMIT ?',
+                                      params + [limit + 1]).fetchall()
+        backups = [self._row_to_backup(row) for row in rows[:limit]]
+        next_cursor = backups[-1]['id'] if len(rows) > limit else None
+        return backups, next_cursor
+
+    def totals(self):
+        with self._lock:
+            count, size, stored = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size_bytes), 0), COALESCE(SUM(stored_bytes), 0) FROM backup_catalog'
+            ).fetchone()
+        return {'count': count, 'size_bytes': size, 'stored_bytes': stored}
+
+    def names(self):
+        with self._lock:
+            return {row[0] for row in self._conn.execute('SELECT name FROM backup_catalog')}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
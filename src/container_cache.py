@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+from docker_client import DockerError
+
+# Docker event actions -> what to do with the server record
+RUNNING_ACTIONS = {'start', 'restart', 'unpause'}
+STOPPED_ACTIONS = {'die', 'stop', 'kill', 'pause', 'create'}
+REMOVED_ACTIONS = {'destroy'}
+
+class ContainerStateCache:
+    """Keeps ServerDeployer's records in sync with Docker in the background.
+
+    Subscribes to the Docker events stream and applies each container event
+    to the deployer's records as it arrives. If the stream is unavailable it
+    falls back to one bulk container listing every poll_interval seconds.
+    Readers never call Docker; they read the records and get_staleness().
+    Reconnects to a stream that keeps failing back off up to max_backoff
+    seconds, with polling carrying on in between.
+    """
+
+    def __init__(self, deployer, poll_interval=30, max_backoff=600):
+        self.deployer = deployer
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self.events_connected = False
+        self.events_applied = 0
+        self._last_sync = None
+        self._last_event = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        if not self.deployer.use_docker or (self._thread and self._thread.is_alive()):
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='container-cache', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def resync(self):
+        """Reconcile every record against one bulk container listing"""
+        self.deployer.sync_containers(self.deployer.docker.list_containers(all=True))
+        self._last_sync = time.monotonic()
+
+    def _poll(self):
+        try:
+            self.resync()
+        except Exception as e:
+            logging.error(f"Container resync failed: {e!r}")
+
+    def _run(self):
+        failures = 0
+        while not self._stop_event.is_set():
+            connected_at = time.monotonic()
+            stream = None
+            try:
+                stream = self.deployer.docker.events(self._stop_event)
+                self.events_connected = True
+                # Catch anything that changed before the subscription started
+                self.resync()
+                # Blocks for as long as the daemon keeps the stream open
+                for event in stream:
+                    self._apply_event(event)
+            except DockerError as e:
+                logging.warning(f"Docker events unavailable, polling every {self.poll_interval}s: {e}")
+            except Exception as e:
+                # Anything else (a bad payload, a socket error) must not end the thread
+                logging.error(f"Docker event stream failed, polling every {self.poll_interval}s: {e!r}")
+            finally:
+                if stream is not None:
+                    # Releases the stream's connection or CLI process
+                    stream.close()
+            self.events_connected = False
+
+            # A stream that keeps failing quickly is retried less and less often; meanwhile poll
+            failures = 0 if time.monotonic() - connected_at > self.poll_interval else failures + 1
+            retry_at = time.monotonic() + min(self.poll_interval * 2 ** max(failures - 1, 0), self.max_backoff)
+            while not self._stop_event.wait(self.poll_interval):
+                self._poll()
+                if time.monotonic() >= retry_at:
+                    break
+
+    def _apply_event(self, event):
+        self._last_event = time.monotonic()
+        action = event['action'].split(':')[0]
+        if not event['id'] or action not in RUNNING_ACTIONS | STOPPED_ACTIONS | REMOVED_ACTIONS:
+            return
+
+        if action in REMOVED_ACTIONS:
+            self.deployer.remove_container(event['id'])
+        else:
+            if not self.deployer.server_type_for_name(event['name']):
+                return
+            try:
+                container = self.deployer.docker.get_container(event['id'])
+            except DockerError:
+                # Removed again before we could look at it; the destroy event follows
+                return
+            self.deployer.apply_container_state(container)
+
+        self.events_applied += 1
+
+    def get_staleness(self):
+        """Describe how current the cached records are"""
+        now = time.monotonic()
+        since_sync = round(now - self._last_sync, 3) if self._last_sync is not None else None
+        return {
+            'mode': 'events' if self.events_connected else 'polling',
+            # With a live event stream the records are current up to event delivery latency
+            'staleness_seconds': 0.0 if self.events_connected else since_sync,
+            'seconds_since_resync': since_sync,
+            'seconds_since_event': round(now - self._last_event, 3) if self._last_event is not None else None,
+            'events_applied': self.events_applied
+        }
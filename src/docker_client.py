@@ -0,0 +1,459 @@
+import asyncio
+import http.client
+import json
+import logging
+import os
+import socket
+import subprocess
+import threading
+from datetime import datetime, timezone
+from urllib.parse import quote, urlencode
+
+DEFAULT_SOCKET = '/var/run/docker.sock'
+
+class DockerError(Exception):
+    """A Docker operation failed"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection that talks to a Unix domain socket instead of TCP"""
+
+    def __init__(self, socket_path, timeout=30):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+def _container_name(names):
+    return names[0].lstrip('/') if names else ''
+
+def _network_ip(networks):
+    for network in (networks or {}).values():
+        if network.get('IPAddress'):
+            return network['IPAddress']
+    return 'N/A'
+
+def _parse_created(created):
+    # Docker reports nanosecond precision, e.g. 2024-01-01T10:00:00.123456789Z
+    try:
+        return datetime.strptime(created[:19], '%Y-%m-%dT%H:%M:%S').replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+def _normalize_inspect(details):
+    state = details.get('State', {})
+    return {
+        'id': details['Id'],
+        'name': details.get('Name', '').lstrip('/'),
+        'image': details.get('Config', {}).get('Image', ''),
+        'state': state.get('Status', ''),
+        'status': state.get('Status', ''),
+        'created': _parse_created(details.get('Created')),
+        'ip': _network_ip(details.get('NetworkSettings', {}).get('Networks'))
+    }
+
+def _normalize_event(event):
+    actor = event.get('Actor', {})
+    attributes = actor.get('Attributes', {})
+    return {
+        'action': event.get('Action') or event.get('status', ''),
+        'id': actor.get('ID') or event.get('id', ''),
+        'name': attributes.get('name', ''),
+        'image': attributes.get('image') or event.get('from', ''),
+        'time': event.get('time')
+    }
+
+class DockerAPIClient:
+    """Docker Engine API client over the daemon's Unix socket.
+
+    Each thread keeps one keep-alive connection, so a request costs a
+    round-trip on an open socket instead of forking the docker CLI.
+    """
+
+    backend = 'api'
+
+    def __init__(self, socket_path=None, timeout=30):
+        self.socket_path = socket_path or self._socket_from_env()
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _socket_from_env(self):
+        host = os.environ.get('DOCKER_HOST', '')
+        if host.startswith('unix://'):
+            return host[len('unix://'):]
+        return DEFAULT_SOCKET
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _reset_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+        self._local.conn = None
+
+    def _request(self, method, path, params=None, body=None, timeout=None):
+        if params:
+            path = f"{path}?{urlencode(params)}"
+        headers = {'Host': 'docker'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+
+        # Retry once on a fresh socket if the daemon closed the idle connection. Only reads are
+        # retried: a POST may have reached the daemon before the connection dropped, and
+        # resending /containers/create would create a second container
+        attempts = 2 if method in ('GET', 'HEAD') else 1
+        for attempt in range(attempts):
+            conn = self._connection()
+            try:
+                if conn.sock is None:
+                    conn.connect()
+                conn.sock.settimeout(timeout or self.timeout)
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as e:
+                self._reset_connection()
+                if attempt == attempts - 1:
+                    raise DockerError(f"{method} {path} failed: {e}")
+            except (OSError, http.client.HTTPException) as e:
+                self._reset_connection()
+                raise DockerError(f"{method} {path} failed: {e}")
+
+        if response.getheader('Connection', '').lower() == 'close':
+            self._reset_connection()
+        content = None
+        if data and response.getheader('Content-Type', '').startswith('application/json'):
+            try:
+                content = json.loads(data)
+            except ValueError:
+                # Streaming endpoints (e.g. image pulls) send one JSON object per line
+                content = [json.loads(line) for line in data.splitlines() if line.strip()]
+        if response.status >= 400:
+            message = content.get('message') if isinstance(content, dict) else data.decode(errors='replace')
+            raise DockerError(f"{method} {path} returned {response.status}: {message}", response.status)
+        return response.status, content
+
+    def ping(self):
+        try:
+            self._request('GET', '/_ping', timeout=2)
+            return True
+        except DockerError:
+            return False
+
+    def list_containers(self, all=True, name_filters=None):
+        params = {'all': '1' if all else '0'}
+        if name_filters:
+            params['filters'] = json.dumps({'name': list(name_filters)})
+        _, containers = self._request('GET', '/containers/json', params=params)
+        return [{
+            'id': container['Id'],
+            'name': _container_name(container.get('Names')),
+            'image': container.get('Image', ''),
+            'state': container.get('State', ''),
+            'status': container.get('Status', ''),
+            'created': container.get('Created'),
+            'ip': _network_ip(container.get('NetworkSettings', {}).get('Networks'))
+        } for container in containers or []]
+
+    def _pull_image(self, image):
+        name, _, tag = image.partition(':')
+        self._request('POST', '/images/create', params={'fromImage': name, 'tag': tag or 'latest'}, timeout=300)
+
+    def run_container(self, name, image, command):
+        body = {'Image': image, 'Cmd': command}
+        try:
+            _, created = self._request('POST', '/containers/create', params={'name': name}, body=body)
+        except DockerError as e:
+            # Same as `docker run`: pull a missing image, then try again
+            if e.status != 404:
+                raise
+            self._pull_image(image)
+            _, created = self._request('POST', '/containers/create', params={'name': name}, body=body)
+        container_id = created['Id']
+        self.start(container_id)
+        return container_id
+
+    def inspect(self, container_id):
+        _, details = self._request('GET', f'/containers/{quote(container_id)}/json')
+        return details
+
+    def get_container(self, container_id):
+        return _normalize_inspect(self.inspect(container_id))
+
+    def container_ip(self, container_id):
+        return _network_ip(self.inspect(container_id).get('NetworkSettings', {}).get('Networks'))
+
+    def start(self, container_id):
+        self._request('POST', f'/containers/{quote(container_id)}/start')
+
+    def stop(self, container_id, timeout=None):
+        params = {'t': timeout} if timeout is not None else None
+        # The daemon holds the request open until the container stops
+        self._request('POST', f'/containers/{quote(container_id)}/stop', params=params,
+                      timeout=(timeout if timeout is not None else 10) + self.timeout)
+
+    def remove(self, container_id, force=True):
+        self._request('DELETE', f'/containers/{quote(container_id)}', params={'force': '1' if force else '0'})
+
+    def events(self, stop_event=None):
+        """Subscribe to container events and return an iterator over them
+
+        Uses its own connection with no read timeout, since the stream stays
+        open indefinitely. The iterator ends when the daemon closes the stream.
+        """
+        conn = UnixHTTPConnection(self.socket_path, timeout=None)
+        try:
+            params = urlencode({'filters': json.dumps({'type': ['container']})})
+            conn.request('GET', f'/events?{params}', headers={'Host': 'docker'})
+            response = conn.getresponse()
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            raise DockerError(f"Event stream failed: {e}")
+        if response.status >= 400:
+            conn.close()
+            raise DockerError(f"GET /events returned {response.status}", response.status)
+        return self._iter_events(conn, response, stop_event)
+
+    def _iter_events(self, conn, response, stop_event):
+        try:
+            while not (stop_event and stop_event.is_set()):
+                line = response.readline()
+                if not line:
+                    return
+                if line.strip():
+                    yield _normalize_event(json.loads(line))
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            raise DockerError(f"Event stream failed: {e}")
+        finally:
+            conn.close()
+
+class DockerCLIClient:
+    """Fallback backend that shells out to the docker CLI"""
+
+    backend = 'cli'
+
+    def _run(self, args, timeout=None):
+        try:
+            result = subprocess.run(['docker'] + args, capture_output=True, text=True, check=True, timeout=timeout)
+        except subprocess.CalledProcessError as e:
+            raise DockerError(e.stderr.strip() or str(e))
+        except (OSError, subprocess.TimeoutExpired) as e:
+            raise DockerError(str(e))
+        return result.stdout.strip()
+
+    def ping(self):
+        try:
+            self._run(['ps', '-q'], timeout=10)
+            return True
+        except DockerError:
+            return False
+
+    def list_containers(self, all=True, name_filters=None):
+        args = ['ps', '-q', '--no-trunc']
+        if all:
+            args.append('-a')
+        for name in name_filters or []:
+            args += ['--filter', f'name={name}']
+        container_ids = self._run(args).split()
+        return self.inspect_containers(container_ids)
+
+    def inspect_containers(self, container_ids, batch_size=500):
+        """Inspect many containers with one `docker inspect` per batch instead of one per container"""
+        containers = []
+        for i in range(0, len(container_ids), batch_size):
+            batch = container_ids[i:i + batch_size]
+            try:
+                details = json.loads(self._run(['inspect'] + batch))
+            except DockerError:
+                # A container vanished mid-listing; fall back to the survivors one by one
+                details = []
+                for container_id in batch:
+                    try:
+                        details += json.loads(self._run(['inspect', container_id]))
+                    except DockerError:
+                        pass
+            containers += [_normalize_inspect(detail) for detail in details]
+        return containers
+
+    def run_container(self, name, image, command):
+        return self._run(['run', '-d', '--name', name, image] + list(command))
+
+    def get_container(self, container_id):
+        return _normalize_inspect(json.loads(self._run(['inspect', container_id]))[0])
+
+    def container_ip(self, container_id):
+        ip = self._run(['inspect', '-f', '{{range.NetworkSettings.Networks}}{{.IPAddress}}{{end}}', container_id])
+        return ip if ip else 'N/A'
+
+    def start(self, container_id):
+        self._run(['start', container_id])
+
+    def stop(self, container_id, timeout=None):
+        args = ['stop', container_id]
+        if timeout is not None:
+            args[1:1] = ['-t', str(timeout)]
+        self._run(args, timeout=(timeout if timeout is not None else 10) + 5)
+
+    def remove(self, container_id, force=True):
+        self._run(['rm', '-f', container_id] if force else ['rm', container_id])
+
+    def events(self, stop_event=None):
+        try:
+            process = subprocess.Popen(['docker', 'events', '--filter', 'type=container', '--format', '{{json .}}'],
+                                       stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        except OSError as e:
+            raise DockerError(str(e))
+        return self._iter_events(process, stop_event)
+
+    def _iter_events(self, process, stop_event):
+        try:
+            for line in process.stdout:
+                if stop_event and stop_event.is_set():
+                    return
+                if line.strip():
+                    yield _normalize_event(json.loads(line))
+        except ValueError as e:
+            raise DockerError(f"Event stream failed: {e}")
+        finally:
+            process.kill()
+            process.wait()
+
+class AsyncDockerAPIClient:
+    """The lifecycle calls of DockerAPIClient for asyncio code
+
+    One short-lived connection per request over the daemon's Unix socket,
+    so a request the daemon holds open (a stop waits for the container)
+    costs a socket and no thread.
+    """
+
+    backend = 'api'
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, timeout=30):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    async def _read_body(self, reader, headers):
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if not size:
+                    return b''.join(chunks)
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+        if 'content-length' in headers:
+            return await reader.readexactly(int(headers['content-length']))
+        return await reader.read()
+
+    async def _exchange(self, method, path):
+        reader, writer = await asyncio.open_unix_connection(self.socket_path)
+        try:
+            writer.write(f'{method} {path} HTTP/1.1\r\nHost: docker\r\nContent-Length: 0\r\n'
+                         f'Connection: close\r\n\r\n'.encode())
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                key, _, value = line.decode('latin-1').partition(':')
+                headers[key.strip().lower()] = value.strip()
+            return status, headers, await self._read_body(reader, headers)
+        finally:
+            writer.close()
+
+    async def _request(self, method, path, params=None, timeout=None):
+        if params:
+            path = f"{path}?{urlencode(params)}"
+        try:
+            status, headers, data = await asyncio.wait_for(self._exchange(method, path), timeout or self.timeout)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            raise DockerError(f"{method} {path} failed: {e!r}")
+        if status >= 400:
+            try:
+                message = json.loads(data).get('message')
+            except ValueError:
+                message = data.decode(errors='replace')
+            raise DockerError(f"{method} {path} returned {status}: {message}", status)
+        return status
+
+    async def start(self, container_id):
+        await self._request('POST', f'/containers/{quote(container_id)}/start')
+
+    async def stop(self, container_id, timeout=None):
+        params = {'t': timeout} if timeout is not None else None
+        await self._request('POST', f'/containers/{quote(container_id)}/stop', params=params,
+                            timeout=(timeout if timeout is not None else 10) + self.timeout)
+
+    async def remove(self, container_id, force=True):
+        await self._request('DELETE', f'/containers/{quote(container_id)}', params={'force': '1' if force else '0'})
+
+class AsyncDockerCLIClient:
+    """The lifecycle calls of DockerCLIClient, awaiting the docker CLI instead of blocking on it"""
+
+    backend = 'cli'
+
+    async def _run(self, args, timeout=None):
+        try:
+            process = await asyncio.create_subprocess_exec('docker', *args, stdout=asyncio.subprocess.PIPE,
+                                                           stderr=asyncio.subprocess.PIPE)
+        except OSError as e:
+            raise DockerError(str(e))
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError as e:
+            process.kill()
+            await process.wait()
+            raise DockerError(f"docker {args[0]} timed out") from e
+        if process.returncode:
+            raise DockerError(stderr.decode(errors='replace').strip() or f"docker {args[0]} failed")
+        return stdout.decode().strip()
+
+    async def start(self, container_id):
+        await self._run(['start', container_id])
+
+    async def stop(self, container_id, timeout=None):
+        args = ['stop', container_id]
+        if timeout is not None:
+            args[1:1] = ['-t', str(timeout)]
+        await self._run(args, timeout=(timeout if timeout is not None else 10) + 5)
+
+    async def remove(self, container_id, force=True):
+        await self._run(['rm', '-f', container_id] if force else ['rm', container_id])
+
+def create_async_docker_client(client):
+    """The async counterpart of a client from create_docker_client, on the same backend"""
+    if client is None:
+        return None
+    if client.backend == 'api':
+        return AsyncDockerAPIClient(client.socket_path, client.timeout)
+    return AsyncDockerCLIClient()
+
+def create_docker_client(socket_path=None):
+    """Return the fastest available Docker backend, or None if Docker is unavailable"""
+    api = DockerAPIClient(socket_path)
+    if os.path.exists(api.socket_path) and api.ping():
+        logging.info(f"Using Docker Engine API at {api.socket_path}")
+        return api
+
+    cli = DockerCLIClient()
+    if cli.ping():
+        logging.info("Docker socket not reachable - falling back to the docker CLI")
+        return cli
+    return None
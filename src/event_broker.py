@@ -0,0 +1,156 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+class Subscription:
+    """One stream consumer's bounded queue of encoded events"""
+
+    def __init__(self, broker, max_queue):
+        self._broker = broker
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.closed = False
+
+    def put(self, encoded):
+        try:
+            self._queue.put_nowait(encoded)
+        except queue.Full:
+            # Too far behind to catch up; the client reconnects and gets a fresh snapshot
+            self._broker.drop(self)
+
+    def get(self, timeout=None):
+        """Next encoded event, or None if nothing arrived within timeout"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._broker.unsubscribe(self)
+
+class AsyncSubscription(Subscription):
+    """A subscription read from an asyncio event loop instead of a thread
+
+    Publishers run in their own threads and only schedule the hand-over, so
+    the queue is touched from the loop alone and a waiting reader holds no
+    thread.
+    """
+
+    def __init__(self, broker, max_queue, loop):
+        self._broker = broker
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self.closed = False
+
+    def put(self, encoded):
+        try:
+            self._loop.call_soon_threadsafe(self._deliver, encoded)
+        except RuntimeError:
+            # The loop has shut down under us
+            self._broker.unsubscribe(self)
+
+    def _deliver(self, encoded):
+        try:
+            self._queue.put_nowait(encoded)
+        except asyncio.QueueFull:
+            self._broker.drop(self)
+
+    async def get(self, timeout=None):
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class EventBroker:
+    """Fan-out of server-sent events to any number of subscribers.
+
+    An event is serialised once, when it is published, and every subscriber
+    queues the same encoded string, so the work per sample or state change
+    does not grow with the number of open dashboards. The last replay events
+    are kept so a client reconnecting with Last-Event-ID can catch up; IDs
+    carry a per-process epoch so an ID from before a restart is never
+    mistaken for a current one. A subscriber that falls max_queue events
+    behind is disconnected.
+    """
+
+    def __init__(self, max_queue=256, replay=256):
+        self.max_queue = max_queue
+        self.published = 0
+        self.dropped = 0
+        self.rejected = 0
+        # Reentrant: a full queue drops its subscriber from inside publish()
+        self._lock = threading.RLock()
+        self._subscribers = set()
+        self.epoch = f"{int(time.time()):x}"
+        self._next_id = 1
+        self._recent = deque(maxlen=replay)
+        self._last_values = {}
+
+    def publish(self, event, data):
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            encoded = f"id: {self.epoch}:{event_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+            self._recent.append((event_id, encoded))
+            self.published += 1
+            # Queued under the lock so every subscriber sees events in ID order
+            for subscription in list(self._subscribers):
+                subscription.put(encoded)
+        return event_id
+
+    def publish_changes(self, event, values):
+        """Publish only the keys of values that differ from the last call for this event"""
+        with self._lock:
+            last = self._last_values.get(event, {})
+            changed = {key: value for key, value in values.items() if last.get(key) != value}
+            self._last_values[event] = dict(values)
+            if changed:
+                self.publish(event, changed)
+        return changed
+
+    def _parse_id(self, last_event_id):
+        epoch, _, number = (last_event_id or '').partition(':')
+        if epoch != self.epoch or not number.isdigit():
+            return None
+        return int(number)
+
+    def subscribe(self, last_event_id=None, loop=None, limit=None):
+        """Return (subscription, missed events or None if a full snapshot is needed)
+
+        With loop, the subscription is an AsyncSubscription read on that event loop.
+        With limit, (None, None) is returned instead once limit subscribers are connected.
+        """
+        subscription = AsyncSubscription(self, self.max_queue, loop) if loop else Subscription(self, self.max_queue)
+        last = self._parse_id(last_event_id)
+        with self._lock:
+            if limit and len(self._subscribers) >= limit:
+                self.rejected += 1
+                return None, None
+            missed = None
+            if last is not None and last < self._next_id and (not self._recent or self._recent[0][0] <= last + 1):
+                missed = [encoded for event_id, encoded in self._recent if event_id > last]
+            self._subscribers.add(subscription)
+        return subscription, missed
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+        subscription.closed = True
+
+    def drop(self, subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self.dropped += 1
+        self.unsubscribe(subscription)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'published': self.published,
+                'dropped': self.dropped,
+                'rejected': self.rejected,
+                'last_event_id': f"{self.epoch}:{self._next_id - 1}"
+            }
@@ -1,18 +1,51 @@
 import os
 import shutil
 import logging
+import hashlib
+import tarfile
+import json
+import tempfile
 from datetime import datetime, timedelta
 import glob
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import backup_archive
+from backup_catalog import BackupCatalog
+from log_rotation import LogRotator
+
+HASH_CHUNK_SIZE = 1024 * 1024
+BACKUP_MODES = ('full', 'incremental', 'archive')
 
 class FileAutomation:
-    def __init__(self, backup_dir="backups", logs_dir="logs"):
+    def __init__(self, backup_dir="backups", logs_dir="logs", catalog=None, restore_dir="restores"):
         self.backup_dir = backup_dir
         self.logs_dir = logs_dir
+        # Restores only ever write below this directory
+        self.restore_dir = restore_dir
+        # Incremental snapshots: one blob per unique file content plus a manifest per snapshot
+        self.store_dir = os.path.join(backup_dir, '.store')
+        self.objects_dir = os.path.join(self.store_dir, 'objects')
+        self.manifests_dir = os.path.join(self.store_dir, 'manifests')
+        # A snapshot stores its objects before the manifest that references them
+        # exists, so snapshots and object GC never run at the same time
+        self._store_lock = threading.Lock()
         os.makedirs(backup_dir, exist_ok=True)
         os.makedirs(logs_dir, exist_ok=True)
+        self.log_rotator = LogRotator(logs_dir)
+        self.catalog = catalog if catalog is not None else BackupCatalog()
+        if self.catalog.needs_rebuild:
+            self.rebuild_catalog()
     
-    def backup_directory(self, source_dir, backup_name=None):
+    def backup_directory(self, source_dir, backup_name=None, mode='full', **archive_options):
         """Create a backup of a directory"""
+        if mode == 'incremental':
+            snapshot = self.create_snapshot(source_dir, backup_name)
+            return snapshot['path'] if snapshot else None
+        if mode == 'archive':
+            archive = self.create_archive(source_dir, backup_name, **archive_options)
+            return archive['path'] if archive else None
+        
         if not os.path.exists(source_dir):
             logging.error(f"Source directory not found: {source_dir}")
             return None
@@ -21,51 +54,444 @@ class FileAutomation:
         backup_name = backup_name or os.path.basename(source_dir)
         backup_path = os.path.join(self.backup_dir, f"{backup_name}_{timestamp}")
         
+        digests = {}
+        
+        def copy_and_hash(src, dst):
+            # Hash while copying so the checksum costs no extra read
+            digest = hashlib.sha256()
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                for chunk in iter(lambda: fsrc.read(HASH_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    fdst.write(chunk)
+            shutil.copystat(src, dst)
+            digests[os.path.relpath(dst, backup_path).replace(os.sep, '/')] = (digest.hexdigest(), os.path.getsize(dst))
+            return dst
+        
         try:
-            shutil.copytree(source_dir, backup_path)
+            shutil.copytree(source_dir, backup_path, copy_function=copy_and_hash)
             logging.info(f"Backup created: {backup_path}")
-            return backup_path
         except Exception as e:
             logging.error(f"Backup failed: {e}")
             return None
+        
+        self.catalog.add(os.path.basename(backup_path), backup_path, 'full',
+                         size_bytes=sum(size for _, size in digests.values()), files=len(digests),
+                         checksum=self._tree_checksum((path, digest) for path, (digest, _) in digests.items()),
+                         created_at=datetime.now().isoformat())
+        return backup_path
     
-    def cleanup_old_backups(self, hours=3):
-        """Delete backups older than specified hours"""
-        cutoff_date = datetime.now() - timedelta(hours=hours)
-        deleted_count = 0
+    def _tree_checksum(self, entries):
+        """One checksum for a whole tree, from (relative path, content hash) pairs"""
+        digest = hashlib.sha256()
+        for path, file_hash in sorted(entries):
+            digest.update(f"{path}\0{file_hash}\n".encode())
+        return digest.hexdigest()
+    
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+    
+    def _store_file(self, path):
+        """Copy a file into the object store, hashing the bytes as they are copied
         
-        for backup in os.listdir(self.backup_dir):
-            backup_path = os.path.join(self.backup_dir, backup)
-            if os.path.isdir(backup_path):
-                mtime = datetime.fromtimestamp(os.path.getmtime(backup_path))
-                if mtime < cutoff_date:
-                    try:
-                        shutil.rmtree(backup_path)
-                        deleted_count += 1
-                        logging.info(f"Deleted old backup: {backup}")
-                    except Exception as e:
-                        logging.error(f"Failed to delete {backup}: {e}")
+        The object is named after what was actually written, so a file that
+        changes mid-backup cannot end up under another content's digest.
+        Returns (digest, bytes stored); 0 bytes if that content was already there.
+        """
+        os.makedirs(self.objects_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', dir=self.objects_dir)
+        try:
+            with open(path, 'rb') as fsrc, os.fdopen(fd, 'wb') as fdst:
+                for chunk in iter(lambda: fsrc.read(HASH_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    fdst.write(chunk)
+            digest = digest.hexdigest()
+            object_path = self._object_path(digest)
+            if os.path.exists(object_path):
+                return digest, 0
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            os.replace(tmp_path, object_path)
+            return digest, os.path.getsize(object_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def _load_manifest(self, manifest_path):
+        with open(manifest_path) as f:
+            return json.load(f)
+    
+    def _iter_manifests(self):
+        if not os.path.isdir(self.manifests_dir):
+            return
+        for entry in os.scandir(self.manifests_dir):
+            if entry.name.endswith('.json'):
+                try:
+                    yield entry.path, self._load_manifest(entry.path)
+                except (OSError, ValueError) as e:
+                    logging.error(f"Unreadable backup manifest {entry.name}: {e}")
+    
+    def _latest_manifest(self, backup_name):
+        """The newest readable manifest of backup_name, reading only that one
         
-        logging.info(f"Cleaned up {deleted_count} old backups")
-        return deleted_count
+        Manifests are named {backup_name}_{YYYYmmdd_HHMMSS}.json, so the
+        newest of a backup sorts last among the names with its prefix.
+        """
+        if not os.path.isdir(self.manifests_dir):
+            return None
+        stamp_length = len('_YYYYmmdd_HHMMSS.json')
+        candidates = sorted((entry.name for entry in os.scandir(self.manifests_dir)
+                             if entry.name.endswith('.json') and entry.name[:-stamp_length] == backup_name),
+                            reverse=True)
+        for filename in candidates:
+            try:
+                manifest = self._load_manifest(os.path.join(self.manifests_dir, filename))
+            except (OSError, ValueError) as e:
+                logging.error(f"Unreadable backup manifest {filename}: {e}")
+                continue
+            if manifest['backup_name'] == backup_name:
+                return manifest
+        return None
+    
+    def create_snapshot(self, source_dir, backup_name=None):
+        """Create an incremental, content-addressed backup of a directory
+        
+        Files whose size and mtime match the previous snapshot of the same
+        backup reuse its hash without being read; only content the store has
+        not seen before is copied. Returns a summary of the snapshot.
+        """
+        if not os.path.isdir(source_dir):
+            logging.error(f"Source directory not found: {source_dir}")
+            return None
+        with self._store_lock:
+            return self._create_snapshot(source_dir, backup_name)
     
-    def rotate_logs(self, max_size_mb=10):
-        """Rotate log files larger than max_size_mb"""
-        rotated_count = 0
-        max_size_bytes = max_size_mb * 1024 * 1024
+    def _create_snapshot(self, source_dir, backup_name):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_name = backup_name or os.path.basename(os.path.normpath(source_dir))
+        name = f"{backup_name}_{timestamp}"
+        previous = self._latest_manifest(backup_name)
+        known = {entry['path']: entry for entry in previous['files']} if previous else {}
+        
+        files, dirs = [], []
+        stats = {'files': 0, 'hashed': 0, 'reused': 0, 'new_objects': 0, 'total_bytes': 0, 'stored_bytes': 0}
+        try:
+            for dirpath, dirnames, filenames in os.walk(source_dir):
+                dirnames.sort()
+                rel_dir = os.path.relpath(dirpath, source_dir)
+                if rel_dir != '.':
+                    dirs.append(rel_dir.replace(os.sep, '/'))
+                for filename in sorted(filenames):
+                    path = os.path.join(dirpath, filename)
+                    rel_path = os.path.relpath(path, source_dir).replace(os.sep, '/')
+                    st = os.stat(path)
+                    entry = known.get(rel_path)
+                    if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns \
+                            and os.path.exists(self._object_path(entry['hash'])):
+                        digest = entry['hash']
+                        stats['reused'] += 1
+                    else:
+                        digest, stored = self._store_file(path)
+                        stats['hashed'] += 1
+                        if stored:
+                            stats['new_objects'] += 1
+                            stats['stored_bytes'] += stored
+                    files.append({'path': rel_path, 'hash': digest, 'size': st.st_size,
+                                  'mtime_ns': st.st_mtime_ns, 'mode': st.st_mode & 0o777})
+                    stats['files'] += 1
+                    stats['total_bytes'] += st.st_size
+        except OSError as e:
+            logging.error(f"Backup failed: {e}")
+            return None
         
-        for log_file in glob.glob(os.path.join(self.logs_dir, "*.log")):
+        manifest = {
+            'name': name,
+            'backup_name': backup_name,
+            'source': os.path.abspath(source_dir),
+            'mode': 'incremental',
+            'created': datetime.now().isoformat(),
+            'parent': previous['name'] if previous else None,
+            'dirs': dirs,
+            'files': files,
+            'stats': stats
+        }
+        os.makedirs(self.manifests_dir, exist_ok=True)
+        manifest_path = os.path.join(self.manifests_dir, f"{name}.json")
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, manifest_path)
+        self.catalog.add(name, manifest_path, 'incremental', size_bytes=stats['total_bytes'],
+                         stored_bytes=stats['stored_bytes'], files=stats['files'],
+                         checksum=self._tree_checksum((entry['path'], entry['hash']) for entry in files),
+                         created_at=manifest['created'])
+        
+        logging.info(f"Snapshot created: {name} ({stats['files']} files, "
+                     f"{stats['new_objects']} new objects, {stats['stored_bytes']} bytes stored)")
+        return {'name': name, 'path': manifest_path, 'mode': 'incremental', **stats}
+    
+    def create_archive(self, source_dir, backup_name=None, compression='gzip', level=None,
+                       threads=None, memory_limit_mb=64):
+        """Write a directory to a single compressed tar archive with a random-access index"""
+        if not os.path.isdir(source_dir):
+            logging.error(f"Source directory not found: {source_dir}")
+            return None
+        if compression not in backup_archive.COMPRESSORS:
+            logging.error(f"Unsupported compression: {compression}")
+            return None
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_name = backup_name or os.path.basename(os.path.normpath(source_dir))
+        name = f"{backup_name}_{timestamp}.{backup_archive.archive_extension(compression)}"
+        archive_path = os.path.join(self.backup_dir, name)
+        try:
+            stats = backup_archive.write_archive(source_dir, archive_path, compression, level=level, threads=threads,
+                                                 memory_limit=memory_limit_mb * 1024 * 1024)
+        except (OSError, ValueError) as e:
+            logging.error(f"Archive backup failed: {e}")
+            for path in (archive_path, archive_path + backup_archive.INDEX_SUFFIX):
+                if os.path.exists(path):
+                    os.remove(path)
+            return None
+        
+        self.catalog.add(name, archive_path, 'archive', size_bytes=stats['archive_bytes'], files=stats['files'],
+                         checksum=stats['sha256'], created_at=datetime.now().isoformat(),
+                         details=self._archive_details(stats))
+        logging.info(f"Archive created: {archive_path} ({stats['throughput_mb_s']} MB/s, "
+                     f"ratio {stats['compression_ratio']})")
+        return {'name': name, 'path': archive_path, 'mode': 'archive', **stats}
+    
+    def _archive_details(self, stats):
+        return {
+            'source_mb': round(stats['source_bytes'] / (1024 * 1024), 2),
+            'compression': stats['compression'],
+            'compression_ratio': stats['compression_ratio']
+        }
+    
+    def _is_archive(self, path):
+        return os.path.isfile(path) and os.path.exists(path + backup_archive.INDEX_SUFFIX)
+    
+    def _restore_path(self, target):
+        """Resolve a restore target relative to restore_dir, or None if it would land outside it"""
+        if not target or os.path.isabs(target) or '..' in target.replace('\\', '/').split('/'):
+            return None
+        root = os.path.realpath(self.restore_dir)
+        # realpath also follows symlinks that point out of the restore directory
+        path = os.path.realpath(os.path.join(root, target))
+        if path == root or os.path.commonpath([root, path]) != root:
+            return None
+        return path
+    
+    def restore_file(self, name, member, target):
+        """Restore a single file from an archive backup without unpacking the rest
+        
+        target is a file path relative to restore_dir.
+        """
+        archive_path = os.path.join(self.backup_dir, name)
+        if os.path.basename(name) != name or not self._is_archive(archive_path):
+            logging.error(f"Archive not found: {name}")
+            return False
+        target_path = self._restore_path(target)
+        if target_path is None:
+            logging.error(f"Restore target must be a relative path inside {self.restore_dir}: {target}")
+            return False
+        try:
+            backup_archive.extract_member(archive_path, member, target_path)
+        except KeyError:
+            logging.error(f"{member} is not in {name}")
+            return False
+        except OSError as e:
+            logging.error(f"Restore of {member} from {name} failed: {e}")
+            return False
+        logging.info(f"Restored {member} from {name} to {target_path}")
+        return True
+    
+    def restore_backup(self, name, target):
+        """Restore a full backup, snapshot or archive into target, a directory relative to restore_dir"""
+        if not name or name.startswith('.') or os.sep in name or '/' in name:
+            logging.error(f"Invalid backup name: {name}")
+            return False
+        target_dir = self._restore_path(target)
+        if target_dir is None:
+            logging.error(f"Restore target must be a relative path inside {self.restore_dir}: {target}")
+            return False
+        if os.path.exists(target_dir) and os.listdir(target_dir):
+            logging.error(f"Restore target is not empty: {target_dir}")
+            return False
+        
+        manifest_path = os.path.join(self.manifests_dir, f"{name}.json")
+        backup_path = os.path.join(self.backup_dir, name)
+        try:
+            if os.path.exists(manifest_path):
+                manifest = self._load_manifest(manifest_path)
+                for rel_dir in manifest['dirs']:
+                    os.makedirs(os.path.join(target_dir, rel_dir), exist_ok=True)
+                os.makedirs(target_dir, exist_ok=True)
+                for entry in manifest['files']:
+                    path = os.path.join(target_dir, entry['path'])
+                    shutil.copyfile(self._object_path(entry['hash']), path)
+                    os.chmod(path, entry['mode'])
+                    os.utime(path, ns=(entry['mtime_ns'], entry['mtime_ns']))
+            elif self._is_archive(backup_path):
+                os.makedirs(target_dir, exist_ok=True)
+                backup_archive.extract_archive(backup_path, target_dir)
+            elif os.path.isdir(backup_path):
+                shutil.copytree(backup_path, target_dir, dirs_exist_ok=True)
+            else:
+                logging.error(f"Backup not found: {name}")
+                return False
+        except (OSError, tarfile.TarError) as e:
+            logging.error(f"Restore of {name} failed: {e}")
+            return False
+        
+        logging.info(f"Restored {name} to {target_dir}")
+        return True
+    
+    def gc_objects(self, dry_run=False, ignore_manifests=()):
+        """Delete stored blobs that no snapshot manifest references anymore
+        
+        With dry_run nothing is deleted; manifests named in ignore_manifests
+        are treated as already gone, which lets cleanup predict what GC frees.
+        A real run waits for any snapshot in progress to write its manifest.
+        """
+        if dry_run:
+            return self._gc_objects(True, ignore_manifests)
+        with self._store_lock:
+            return self._gc_objects(False, ignore_manifests)
+    
+    def _gc_objects(self, dry_run, ignore_manifests):
+        referenced = set()
+        for _, manifest in self._iter_manifests():
+            if manifest['name'] not in ignore_manifests:
+                referenced.update(entry['hash'] for entry in manifest['files'])
+        
+        removed, freed = 0, 0
+        if not os.path.isdir(self.objects_dir):
+            return removed, freed
+        for prefix in os.scandir(self.objects_dir):
+            if not prefix.is_dir():
+                continue
+            for obj in os.scandir(prefix.path):
+                if prefix.name + obj.name not in referenced:
+                    try:
+                        size = obj.stat().st_size
+                        if not dry_run:
+                            os.remove(obj.path)
+                        removed += 1
+                        freed += size
+                    except OSError as e:
+                        logging.error(f"Failed to delete object {obj.name}: {e}")
+        
+        if removed and not dry_run:
+            logging.info(f"Removed {removed} unreferenced backup objects ({freed} bytes)")
+        return removed, freed
+    
+    def _tree_bytes(self, path):
+        """Total file size under path; scandir entries carry their stat results"""
+        total = 0
+        stack = [path]
+        while stack:
             try:
-                if os.path.getsize(log_file) > max_size_bytes:
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    rotated_name = f"{log_file}.{timestamp}"
-                    shutil.move(log_file, rotated_name)
-                    rotated_count += 1
-                    logging.info(f"Rotated log: {log_file}")
-            except Exception as e:
-                logging.error(f"Failed to rotate {log_file}: {e}")
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            total += entry.stat(follow_symlinks=False).st_size
+            except OSError as e:
+                logging.error(f"Failed to scan {path}: {e}")
+        return total
+    
+    def _expired_backups(self, cutoff):
+        """Backups older than cutoff, as {name, mode, paths, bytes} in one pass over backup_dir"""
+        cutoff_ts = cutoff.timestamp()
+        expired = []
+        with os.scandir(self.backup_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') or entry.name.endswith(backup_archive.INDEX_SUFFIX):
+                    continue
+                st = entry.stat(follow_symlinks=False)
+                if st.st_mtime >= cutoff_ts:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    cataloged = self.catalog.get(entry.name)
+                    size = cataloged['size_bytes'] if cataloged else self._tree_bytes(entry.path)
+                    expired.append({'name': entry.name, 'mode': 'full', 'paths': [entry.path], 'bytes': size})
+                elif self._is_archive(entry.path):
+                    index_path = entry.path + backup_archive.INDEX_SUFFIX
+                    expired.append({'name': entry.name, 'mode': 'archive', 'paths': [entry.path, index_path],
+                                    'bytes': st.st_size + os.path.getsize(index_path)})
+        for manifest_path, manifest in self._iter_manifests():
+            if datetime.fromisoformat(manifest['created']) < cutoff:
+                expired.append({'name': manifest['name'], 'mode': 'incremental', 'paths': [manifest_path],
+                                'bytes': os.path.getsize(manifest_path)})
+        return expired
+    
+    def _delete_backup(self, backup):
+        for path in backup['paths']:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        self.catalog.remove(backup['name'])
+        logging.info(f"Deleted old backup: {backup['name']}")
+    
+    def cleanup_backups(self, hours=3, dry_run=False, max_workers=4, progress=None):
+        """Delete backups older than hours, or with dry_run report what would be freed
         
-        return rotated_count
+        Deletes run on at most max_workers threads so a large cleanup does
+        not saturate the disk. progress(percent, message) is called as
+        backups are removed, which is how JobManager jobs report progress.
+        """
+        progress = progress or (lambda percent, message=None: None)
+        started = time.perf_counter()
+        expired = self._expired_backups(datetime.now() - timedelta(hours=hours))
+        snapshots = {backup['name'] for backup in expired if backup['mode'] == 'incremental'}
+        # Blobs only the expired snapshots reference go with them
+        objects, object_bytes = self.gc_objects(dry_run=True, ignore_manifests=snapshots) if snapshots else (0, 0)
+        total_bytes = sum(backup['bytes'] for backup in expired) + object_bytes
+        progress(5, f"{len(expired)} backups to delete ({total_bytes} bytes)")
+        
+        report = {
+            'dry_run': dry_run,
+            'hours': hours,
+            'candidates': [{key: backup[key] for key in ('name', 'mode', 'bytes')} for backup in expired],
+            'objects': objects,
+            'bytes': total_bytes,
+            'deleted': 0,
+            'bytes_freed': 0,
+            'errors': []
+        }
+        if not dry_run and expired:
+            done_bytes = 0
+            with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='cleanup') as pool:
+                futures = {pool.submit(self._delete_backup, backup): backup for backup in expired}
+                for future in as_completed(futures):
+                    backup = futures[future]
+                    try:
+                        future.result()
+                        report['deleted'] += 1
+                        report['bytes_freed'] += backup['bytes']
+                    except OSError as e:
+                        logging.error(f"Failed to delete {backup['name']}: {e}")
+                        report['errors'].append({'name': backup['name'], 'error': str(e)})
+                    done_bytes += backup['bytes']
+                    progress(5 + int(85 * done_bytes / max(total_bytes, 1)), f"Deleted {backup['name']}")
+            if snapshots:
+                report['bytes_freed'] += self.gc_objects()[1]
+        
+        report['seconds'] = round(time.perf_counter() - started, 3)
+        if not dry_run:
+            logging.info(f"Cleaned up {report['deleted']} old backups ({report['bytes_freed']} bytes)")
+        return report
+    
+    def cleanup_old_backups(self, hours=3):
+        """Delete backups older than specified hours"""
+        return self.cleanup_backups(hours=hours)['deleted']
+    
+    def rotate_logs(self, max_size_mb=10, dry_run=False):
+        """Rotate log files larger than max_size_mb; compression and pruning run in the background"""
+        self.log_rotator.max_size_mb = max_size_mb
+        return self.log_rotator.rotate(dry_run=dry_run)
     
     def cleanup_temp_files(self, directory, pattern="*.tmp"):
         """Delete temporary files matching pattern"""
@@ -83,30 +509,45 @@ class FileAutomation:
     
     def get_directory_size(self, directory):
         """Calculate total size of directory in MB"""
-        total_size = 0
-        try:
-            for dirpath, dirnames, filenames in os.walk(directory):
-                for filename in filenames:
-                    filepath = os.path.join(dirpath, filename)
-                    if os.path.exists(filepath):
-                        total_size += os.path.getsize(filepath)
-        except Exception as e:
-            logging.error(f"Failed to calculate size: {e}")
-        
-        return total_size / (1024 * 1024)  # Convert to MB
+        return self._tree_bytes(directory) / (1024 * 1024)  # Convert to MB
+    
+    def list_backups(self, limit=50, cursor=None, mode=None):
+        """List backups newest first, one page at a time, from the catalog"""
+        return self.catalog.list(limit=limit, cursor=cursor, mode=mode)[0]
     
-    def list_backups(self):
-        """List all available backups"""
-        backups = []
+    def query_backups(self, limit=50, cursor=None, mode=None):
+        """Like list_backups, but also returns the cursor for the next page"""
+        return self.catalog.list(limit=limit, cursor=cursor, mode=mode)
+    
+    def _scan_backups(self):
+        """Walk the backup directory the slow way; only used to (re)build the catalog"""
         for backup in os.listdir(self.backup_dir):
             backup_path = os.path.join(self.backup_dir, backup)
-            if os.path.isdir(backup_path):
-                size_mb = self.get_directory_size(backup_path)
-                mtime = datetime.fromtimestamp(os.path.getmtime(backup_path))
-                backups.append({
-                    'name': backup,
-                    'path': backup_path,
-                    'size_mb': round(size_mb, 2),
-                    'created': mtime.isoformat()
-                })
-        return sorted(backups, key=lambda x: x['created'], reverse=True)
+            if os.path.isdir(backup_path) and not backup.startswith('.'):
+                files = sum(len(filenames) for _, _, filenames in os.walk(backup_path))
+                yield dict(name=backup, path=backup_path, mode='full',
+                           size_bytes=int(self.get_directory_size(backup_path) * 1024 * 1024), files=files,
+                           checksum=None,
+                           created_at=datetime.fromtimestamp(os.path.getmtime(backup_path)).isoformat())
+            elif self._is_archive(backup_path):
+                stats = backup_archive.load_index(backup_path)['stats']
+                yield dict(name=backup, path=backup_path, mode='archive', size_bytes=stats['archive_bytes'],
+                           files=stats['files'], checksum=stats.get('sha256'),
+                           created_at=datetime.fromtimestamp(os.path.getmtime(backup_path)).isoformat(),
+                           details=self._archive_details(stats))
+        for manifest_path, manifest in self._iter_manifests():
+            yield dict(name=manifest['name'], path=manifest_path, mode='incremental',
+                       size_bytes=manifest['stats']['total_bytes'], stored_bytes=manifest['stats']['stored_bytes'],
+                       files=manifest['stats']['files'],
+                       checksum=self._tree_checksum((entry['path'], entry['hash']) for entry in manifest['files']),
+                       created_at=manifest['created'])
+    
+    def rebuild_catalog(self):
+        """Re-index everything under backup_dir, dropping entries whose backup is gone"""
+        found = sorted(self._scan_backups(), key=lambda backup: backup['created_at'])
+        for backup in found:
+            self.catalog.add(**backup)
+        for name in self.catalog.names() - {backup['name'] for backup in found}:
+            self.catalog.remove(name)
+        logging.info(f"Backup catalog rebuilt: {len(found)} backups")
+        return len(found)
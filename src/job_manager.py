@@ -0,0 +1,171 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already waiting to run"""
+
+class JobManager:
+    """Runs long operations (deployments, cleanup, ...) on a bounded worker pool.
+
+    submit() returns immediately with a job record; callers poll get() for
+    status and progress. Jobs that share a concurrency_key are additionally
+    limited by concurrency_limits[key], e.g. per server type. Jobs over
+    their key's limit wait in a queue for that key and are only handed to
+    the pool when a slot frees up, so they never hold a pool thread that
+    jobs with other keys could use.
+    """
+
+    def __init__(self, max_workers=8, max_pending=200, concurrency_limits=None, max_history=1000):
+        self.max_pending = max_pending
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._limits = {}
+        self._running = {}
+        self._waiting = {}
+        for key, limit in (concurrency_limits or {}).items():
+            self.set_concurrency_limit(key, limit)
+
+    def set_concurrency_limit(self, key, limit):
+        with self._lock:
+            self._limits[key] = limit
+            self._running.setdefault(key, 0)
+            self._waiting.setdefault(key, deque())
+
+    def submit(self, kind, fn, *args, concurrency_key=None, batch_id=None, **kwargs):
+        """Queue fn(*args, progress=..., **kwargs) and return the new job record"""
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            'id': job_id,
+            'kind': kind,
+            'batch_id': batch_id,
+            'status': 'queued',
+            'progress': 0,
+            'message': 'Queued',
+            'result': None,
+            'error': None,
+            'created_at': datetime.now().isoformat(),
+            'started_at': None,
+            'finished_at': None
+        }
+
+        task = (job, fn, args, kwargs, concurrency_key)
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFull(f"{self._pending} jobs already pending")
+            self._pending += 1
+            self._jobs[job_id] = job
+            self._evict_finished()
+            limit = self._limits.get(concurrency_key)
+            if limit is not None and self._running[concurrency_key] >= limit:
+                job['message'] = f'Waiting for a {concurrency_key} slot'
+                self._waiting[concurrency_key].append(task)
+                task = None
+            elif limit is not None:
+                self._running[concurrency_key] += 1
+            snapshot = dict(job)
+
+        if task:
+            self._submit(task)
+        return snapshot
+
+    def _submit(self, task):
+        # A task handed to the pool holds its key's slot until it runs or is cancelled
+        def cancelled(future):
+            if future.cancelled():
+                with self._lock:
+                    self._cancel(task[0], task[4], holds_slot=True)
+        self._executor.submit(self._run, *task).add_done_callback(cancelled)
+
+    def _cancel(self, job, concurrency_key, holds_slot):
+        # Called with the lock held, for a job that will never run
+        self._pending -= 1
+        if holds_slot and concurrency_key in self._limits:
+            self._running[concurrency_key] -= 1
+        job.update(status='cancelled', message='Cancelled', error='Job manager shut down',
+                   finished_at=datetime.now().isoformat())
+
+    def _evict_finished(self):
+        # Called with the lock held; drop the oldest finished jobs first
+        excess = len(self._jobs) - self.max_history
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job['status'] in ('succeeded', 'failed', 'cancelled')][:excess]:
+            del self._jobs[job_id]
+
+    def _update(self, job, **fields):
+        with self._lock:
+            job.update(fields)
+
+    def _release_slot(self, concurrency_key):
+        """Hand a finished job's slot to the next job waiting on its key, if any"""
+        with self._lock:
+            if concurrency_key not in self._limits:
+                return
+            waiting = self._waiting[concurrency_key]
+            if not waiting:
+                self._running[concurrency_key] -= 1
+                return
+            task = waiting.popleft()
+        try:
+            self._submit(task)
+        except RuntimeError:
+            # Shut down while it waited
+            with self._lock:
+                self._cancel(task[0], concurrency_key, holds_slot=True)
+
+    def _run(self, job, fn, args, kwargs, concurrency_key):
+        def progress(percent, message=None):
+            self._update(job, progress=percent, message=message or job['message'])
+
+        self._update(job, status='running', message='Running', started_at=datetime.now().isoformat())
+        started = time.perf_counter()
+        try:
+            result = fn(*args, progress=progress, **kwargs)
+            self._update(job, status='succeeded', progress=100, message='Done', result=result)
+        except Exception as e:
+            logging.error(f"Job {job['id']} ({job['kind']}) failed: {e}")
+            self._update(job, status='failed', message='Failed', error=str(e))
+        finally:
+            with self._lock:
+                self._pending -= 1
+                job['finished_at'] = datetime.now().isoformat()
+                job['duration_seconds'] = round(time.perf_counter() - started, 3)
+            self._release_slot(concurrency_key)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self, batch_id=None, limit=100):
+        with self._lock:
+            jobs = [dict(job) for job in reversed(self._jobs.values())
+                    if batch_id is None or job['batch_id'] == batch_id]
+        return jobs[:limit]
+
+    def get_stats(self):
+        with self._lock:
+            statuses = {}
+            for job in self._jobs.values():
+                statuses[job['status']] = statuses.get(job['status'], 0) + 1
+            return {'pending': self._pending, 'max_pending': self.max_pending, 'by_status': statuses,
+                    'waiting_for_slot': {key: len(waiting) for key, waiting in self._waiting.items() if waiting}}
+
+    def shutdown(self, wait=True):
+        """Stop the pool; without wait, jobs that have not started are cancelled instead of run"""
+        if not wait:
+            with self._lock:
+                for concurrency_key, waiting in self._waiting.items():
+                    while waiting:
+                        self._cancel(waiting.popleft()[0], concurrency_key, holds_slot=False)
+        # Cancelling the pool's queued futures runs their callbacks, which cancel those jobs
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
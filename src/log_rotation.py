@@ -0,0 +1,160 @@
+import gzip
+import logging
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# app.log.20240101_120000(.gz) -> app
+ROTATED_PATTERN = re.compile(r'^(?P<base>.+)\.log\.\d{8}_\d{6}(?:_\d+)?(?:\.gz)?$')
+# Daily logs (automation_20240101.log) count as one log for retention
+DAILY_SUFFIX = re.compile(r'_\d{8}$')
+
+class LogRotator:
+    """Size-based log rotation with background compression and a retention budget.
+
+    A .log file over max_size_mb is moved aside to <name>.log.<timestamp>.
+    If this process has it open in a logging.FileHandler, the move happens
+    under the handler's lock and the handler reopens a fresh file on its
+    next record. Otherwise the file is copied and truncated in place.
+    Daily logs nobody has written to for stale_days are rotated as a whole.
+    Rotated files are gzipped on a single worker thread, so callers never
+    wait for compression. After each compression the oldest rotated files
+    are pruned: at most keep per log, and max_total_mb across all logs.
+    """
+
+    def __init__(self, logs_dir='logs', max_size_mb=10, keep=5, max_total_mb=200, stale_days=1):
+        self.logs_dir = logs_dir
+        self.max_size_mb = max_size_mb
+        self.keep = keep
+        self.max_total_mb = max_total_mb
+        self.stale_days = stale_days
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix='log-compress')
+        self._pending = []
+        # Rotated files still waiting for compression; prune leaves them alone
+        self._queued = set()
+
+    def _open_handlers(self):
+        """FileHandlers in this process, by absolute file path"""
+        handlers = {}
+        loggers = [logging.getLogger()] + [logger for logger in logging.Logger.manager.loggerDict.values()
+                                           if isinstance(logger, logging.Logger)]
+        for logger in loggers:
+            for handler in logger.handlers:
+                if isinstance(handler, logging.FileHandler):
+                    handlers[os.path.abspath(handler.baseFilename)] = handler
+        return handlers
+
+    def _rotated_name(self, path):
+        rotated = f"{path}.{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        suffix = 1
+        candidate = rotated
+        while os.path.exists(candidate) or os.path.exists(candidate + '.gz'):
+            candidate = f"{rotated}_{suffix}"
+            suffix += 1
+        return candidate
+
+    def _rotate_file(self, path, handler):
+        rotated = self._rotated_name(path)
+        if handler is not None:
+            # Reopen handshake: no record can be written between the move and the close
+            handler.acquire()
+            try:
+                os.replace(path, rotated)
+                # FileHandler opens the file again on its next record
+                if handler.stream:
+                    handler.stream.close()
+                    handler.stream = None
+            finally:
+                handler.release()
+        else:
+            # Someone else (e.g. another process) may still be appending: copy, then truncate
+            shutil.copyfile(path, rotated)
+            with open(path, 'r+b') as f:
+                f.truncate(0)
+        return rotated
+
+    def rotate(self, dry_run=False):
+        """Rotate oversized and stale logs; returns the number of files rotated"""
+        max_bytes = self.max_size_mb * 1024 * 1024
+        stale_before = time.time() - self.stale_days * 86400
+        handlers = self._open_handlers()
+        rotated_count = 0
+
+        with os.scandir(self.logs_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.log') or not entry.is_file():
+                    continue
+                try:
+                    st = entry.stat()
+                    handler = handlers.get(os.path.abspath(entry.path))
+                    oversized = st.st_size > max_bytes
+                    # Only logs nothing here still writes to count as finished daily logs
+                    stale = handler is None and st.st_size and st.st_mtime < stale_before
+                    if not (oversized or stale):
+                        continue
+                    rotated_count += 1
+                    if dry_run:
+                        continue
+                    if stale:
+                        rotated = self._rotated_name(entry.path)
+                        os.replace(entry.path, rotated)
+                    else:
+                        rotated = self._rotate_file(entry.path, handler)
+                    logging.info(f"Rotated log: {entry.path}")
+                    self._queued.add(rotated)
+                    self._pending.append(self._worker.submit(self._compress_and_prune, rotated))
+                except Exception as e:
+                    logging.error(f"Failed to rotate {entry.path}: {e}")
+
+        self._pending = [future for future in self._pending if not future.done()]
+        return rotated_count
+
+    def _compress_and_prune(self, path):
+        try:
+            tmp_path = f"{path}.gz.tmp"
+            with open(path, 'rb') as src, gzip.open(tmp_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            shutil.copystat(path, tmp_path)
+            os.replace(tmp_path, f"{path}.gz")
+            os.remove(path)
+        except OSError as e:
+            logging.error(f"Failed to compress {path}: {e}")
+        self._queued.discard(path)
+        self.prune()
+
+    def prune(self):
+        """Delete the oldest rotated logs beyond keep per log or max_total_mb overall"""
+        rotated = []
+        with os.scandir(self.logs_dir) as entries:
+            for entry in entries:
+                match = ROTATED_PATTERN.match(entry.name)
+                if match and entry.is_file() and entry.path not in self._queued:
+                    st = entry.stat()
+                    rotated.append((st.st_mtime, entry.path, DAILY_SUFFIX.sub('', match.group('base')), st.st_size))
+        rotated.sort(reverse=True)
+
+        kept_per_log = {}
+        total = 0
+        budget = self.max_total_mb * 1024 * 1024
+        removed = 0
+        for _, path, base, size in rotated:
+            kept_per_log[base] = kept_per_log.get(base, 0) + 1
+            if kept_per_log[base] <= self.keep and total + size <= budget:
+                total += size
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+                logging.info(f"Pruned rotated log: {path}")
+            except OSError as e:
+                logging.error(f"Failed to prune {path}: {e}")
+        return removed
+
+    def wait(self):
+        """Block until queued compressions have finished"""
+        for future in self._pending:
+            future.result()
+        self._pending = []
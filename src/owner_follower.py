@@ -0,0 +1,71 @@
+import logging
+import threading
+import time
+
+class OwnerFollower:
+    """A worker process's view of the owner process's state.
+
+    When serve.py runs several processes, the owner alone samples metrics,
+    watches Docker and writes to SQLite. A worker follows it through the
+    database instead: new_samples() is the worker's SystemMonitor source,
+    the registry is synced every interval seconds, and the status the owner
+    publishes stands in for its container cache, with the same
+    events_connected / get_staleness() readers as ContainerStateCache.
+    """
+
+    def __init__(self, db, registry, interval=1.0):
+        self.db = db
+        self.registry = registry
+        self.interval = interval
+        self.owner_status = {}
+        # Start one sample back, so the newest stored sample is followed straight away
+        self._last_metric_id = max((db.metrics_version() or 0) - 1, 0)
+        self._last_sync = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    @property
+    def events_connected(self):
+        return bool(self.owner_status.get('events_connected'))
+
+    def new_samples(self):
+        """Samples the owner stored since the last call"""
+        samples, self._last_metric_id = self.db.get_metrics_since(self._last_metric_id)
+        return samples
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self.poll()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='owner-follower', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.poll()
+
+    def poll(self):
+        try:
+            self.registry.sync()
+            self._last_sync = time.monotonic()
+            self.owner_status = self.db.get_service_status('owner') or {}
+        except Exception as e:
+            logging.error(f"Failed to follow the owner process: {e}")
+
+    def get_staleness(self):
+        """The owner's container cache freshness, plus the time since this worker last synced"""
+        cache = dict(self.owner_status.get('cache') or {'mode': None, 'staleness_seconds': None})
+        since_sync = round(time.monotonic() - self._last_sync, 3) if self._last_sync is not None else None
+        staleness = cache.get('staleness_seconds')
+        if staleness is not None and since_sync is not None:
+            # A polling owner's figure was true when it was published, not now
+            if cache.get('mode') == 'polling':
+                staleness += self.owner_status.get('age_seconds', 0)
+            cache['staleness_seconds'] = round(staleness + since_sync, 3)
+        cache['seconds_since_registry_sync'] = since_sync
+        cache['owner_status_age_seconds'] = self.owner_status.get('age_seconds')
+        return cache
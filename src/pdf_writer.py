@@ -0,0 +1,155 @@
+"""Minimal PDF writer, used for reports when reportlab is not installed"""
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+MARGIN = 54
+# Average Helvetica glyph width as a fraction of the font size, used to clip cells
+AVG_CHAR_WIDTH = 0.55
+HEADER_FILL = (0.0, 0.482, 1.0)
+
+def _escape(text):
+    text = str(text).replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return text.replace('\r', ' ').replace('\n', ' ')
+
+class PDFWriter:
+    """Write text and tables to a PDF file one page at a time.
+
+    Only the standard Helvetica fonts are referenced, so nothing is embedded
+    and text is limited to Latin-1 (anything else becomes '?'). A page's
+    content stream goes to disk as soon as the page is full; only byte
+    offsets are kept for the cross-reference table, so memory stays flat
+    however many pages a table spans.
+    """
+
+    # Fixed object numbers; pages and their content streams follow
+    CATALOG, PAGES, FONT, FONT_BOLD = 1, 2, 3, 4
+
+    def __init__(self, path, title=None):
+        self._file = open(path, 'wb')
+        self._offsets = {}
+        self._page_ids = []
+        self._next_id = 5
+        self._ops = []
+        self.title = title
+        self.pages = 0
+        self.y = PAGE_HEIGHT - MARGIN
+        self._file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def _object(self, object_id, body):
+        self._offsets[object_id] = self._file.tell()
+        self._file.write(f'{object_id} 0 obj\n'.encode())
+        self._file.write(body)
+        self._file.write(b'\nendobj\n')
+
+    def _allocate(self):
+        object_id = self._next_id
+        self._next_id += 1
+        return object_id
+
+    def _flush_page(self):
+        content = '\n'.join(self._ops).encode('latin-1', errors='replace')
+        content_id, page_id = self._allocate(), self._allocate()
+        self._object(content_id, b'<< /Length %d >>\nstream\n' % len(content) + content + b'\nendstream')
+        self._object(page_id, (f'<< /Type /Page /Parent {self.PAGES} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+                               f'/Resources << /Font << /F1 {self.FONT} 0 R /F2 {self.FONT_BOLD} 0 R >> >> '
+                               f'/Contents {content_id} 0 R >>').encode())
+        self._page_ids.append(page_id)
+        self._ops = []
+        self.pages += 1
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def new_page(self):
+        self._flush_page()
+
+    def ensure_space(self, height):
+        """Start a new page unless height points still fit above the bottom margin"""
+        if self.y - height < MARGIN:
+            self._flush_page()
+            return True
+        return False
+
+    def text(self, x, y, text, size=10, bold=False, color=None):
+        r, g, b = color or (0, 0, 0)
+        font = 'F2' if bold else 'F1'
+        self._ops.append(f'BT {r:.3f} {g:.3f} {b:.3f} rg /{font} {size} Tf '
+                         f'{x:.2f} {y:.2f} Td ({_escape(text)}) Tj ET')
+
+    def heading(self, text, size=16):
+        self.ensure_space(size + 12)
+        self.y -= size
+        self.text(MARGIN, self.y, text, size=size, bold=True)
+        self.y -= 12
+
+    def paragraph(self, text, size=10):
+        self.ensure_space(size + 6)
+        self.y -= size
+        self.text(MARGIN, self.y, text, size=size)
+        self.y -= 6
+
+    def spacer(self, height):
+        self.y -= height
+
+    def table(self, header, rows, widths=None, size=9):
+        """Draw a grid table from any iterable of rows, repeating the header on each page
+
+        widths are fractions of the printable width. Cell text that does not
+        fit its column is clipped.
+        """
+        usable = PAGE_WIDTH - 2 * MARGIN
+        widths = [usable * w for w in (widths or [1 / len(header)] * len(header))]
+        max_chars = [max(1, int((w - 6) / (size * AVG_CHAR_WIDTH))) for w in widths]
+        row_height = size + 8
+
+        def draw_row(cells, bold=False, fill=None):
+            top = self.y
+            if fill:
+                self._ops.append(f'{fill[0]:.3f} {fill[1]:.3f} {fill[2]:.3f} rg '
+                                 f'{MARGIN:.2f} {top - row_height:.2f} {usable:.2f} {row_height:.2f} re f')
+            x = MARGIN
+            for cell, width, limit in zip(cells, widths, max_chars):
+                cell = '' if cell is None else str(cell)
+                self.text(x + 3, top - size - 3, cell[:limit], size=size, bold=bold,
+                          color=(1, 1, 1) if fill else None)
+                self._ops.append(f'{x:.2f} {top - row_height:.2f} {width:.2f} {row_height:.2f} re S')
+                x += width
+            self.y -= row_height
+
+        self._ops.append('0.5 w 0 G')
+        self.ensure_space(row_height * 2)
+        draw_row(header, bold=True, fill=HEADER_FILL)
+        for row in rows:
+            if self.ensure_space(row_height):
+                self._ops.append('0.5 w 0 G')
+                draw_row(header, bold=True, fill=HEADER_FILL)
+            draw_row(row)
+
+    def close(self):
+        if self._ops or not self._page_ids:
+            self._flush_page()
+        self._object(self.FONT, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+        self._object(self.FONT_BOLD,
+                     b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>')
+        kids = ' '.join(f'{page_id} 0 R' for page_id in self._page_ids)
+        self._object(self.PAGES, f'<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>'.encode())
+        self._object(self.CATALOG, f'<< /Type /Catalog /Pages {self.PAGES} 0 R >>'.encode())
+        info_id = self._allocate()
+        title = _escape(self.title or '').encode('latin-1', errors='replace')
+        self._object(info_id, b'<< /Title (' + title + b') /Producer (System Sentinel) >>')
+
+        xref_offset = self._file.tell()
+        lines = [f'xref\n0 {self._next_id}\n', '0000000000 65535 f \n']
+        for object_id in range(1, self._next_id):
+            lines.append(f'{self._offsets[object_id]:010d} 00000 n \n')
+        lines.append(f'trailer\n<< /Size {self._next_id} /Root {self.CATALOG} 0 R /Info {info_id} 0 R >>\n'
+                     f'startxref\n{xref_offset}\n%%EOF\n')
+        self._file.write(''.join(lines).encode())
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        else:
+            self._file.close()
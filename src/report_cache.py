@@ -0,0 +1,124 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+class ReportCache:
+    """LRU cache of generated report files, keyed by format and data version.
+
+    A key describes everything the report depends on (format, inventory
+    version, metrics sample, options), so a hit can be served as-is. The
+    reports directory is bounded by max_entries and max_mb; the least
+    recently used files are deleted first, including reports left over
+    from earlier runs.
+    """
+
+    def __init__(self, reports_dir='reports', max_entries=50, max_mb=200):
+        self.reports_dir = reports_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        # filename -> (key, size), least recently used first
+        self._entries = OrderedDict()
+        self._by_key = {}
+        self._total_bytes = 0
+        os.makedirs(reports_dir, exist_ok=True)
+        self._adopt_existing()
+
+    def _adopt_existing(self):
+        entries = []
+        with os.scandir(self.reports_dir) as scan:
+            for entry in scan:
+                if entry.is_file():
+                    st = entry.stat()
+                    entries.append((st.st_mtime, entry.name, st.st_size))
+        for _, filename, size in sorted(entries):
+            self._entries[filename] = (None, size)
+            self._total_bytes += size
+        with self._lock:
+            self._evict()
+
+    @staticmethod
+    def make_key(*parts):
+        return hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+
+    def get(self, key, record=True):
+        """Filename of a cached report for key, or None"""
+        with self._lock:
+            filename = self._by_key.get(key)
+            if filename is None or not os.path.exists(os.path.join(self.reports_dir, filename)):
+                self.misses += record
+                return None
+            self._entries.move_to_end(filename)
+            self.hits += record
+            return filename
+
+    def put(self, key, filename):
+        path = os.path.join(self.reports_dir, filename)
+        size = os.path.getsize(path)
+        with self._lock:
+            if filename in self._entries:
+                self._total_bytes -= self._entries.pop(filename)[1]
+            old = self._by_key.get(key)
+            if old and old != filename:
+                self._remove(old)
+            self._entries[filename] = (key, size)
+            self._by_key[key] = filename
+            self._total_bytes += size
+            self._evict(keep=filename)
+
+    def get_or_create(self, key, create):
+        """Return (filename, cached); create(key) runs at most once per key at a time"""
+        filename = self.get(key)
+        if filename:
+            return filename, True
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                # Another request may have generated it while we waited
+                filename = self.get(key, record=False)
+                if filename:
+                    return filename, True
+                filename = create(key)
+                self.put(key, filename)
+                return filename, False
+        finally:
+            with self._lock:
+                self._key_locks.pop(key, None)
+
+    def _remove(self, filename):
+        # Called with the lock held
+        key, size = self._entries.pop(filename, (None, 0))
+        self._total_bytes -= size
+        if key is not None and self._by_key.get(key) == filename:
+            del self._by_key[key]
+        try:
+            os.remove(os.path.join(self.reports_dir, filename))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.error(f"Failed to delete report {filename}: {e}")
+
+    def _evict(self, keep=None):
+        while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+            oldest = next((name for name in self._entries if name != keep), None)
+            if oldest is None:
+                break
+            self._remove(oldest)
+            logging.info(f"Evicted cached report {oldest}")
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -1,73 +1,145 @@
+import asyncio
+import fnmatch
 import json
 import logging
+import itertools
+import threading
 import time
-import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from docker_client import DockerError, create_docker_client
+from server_registry import ServerRegistry
+
+DEFAULT_DEPLOY_CONCURRENCY = 8
+DEFAULT_BULK_CONCURRENCY = 32
+BULK_ACTIONS = ('stop', 'restart', 'terminate', 'delete')
 
 class ServerDeployer:
-    def __init__(self, config_path="config/server_templates.json"):
+    def __init__(self, config_path="config/server_templates.json", registry=None, discover=True):
         self.config_path = config_path
         self.templates = self._load_templates()
-        self.deployed_servers = []
+        self.registry = registry if registry is not None else ServerRegistry()
+        self._id_lock = threading.Lock()
+        self._id_sequence = itertools.count(1)
+        self.docker = None
         self.use_docker = self._check_docker()
-        if self.use_docker:
+        # A persisted registry skips the startup scan; the container cache reconciles later.
+        # Processes that only follow another process's registry never scan (discover=False).
+        if discover and self.use_docker and not self.registry.count():
             self._load_existing_containers()
         
     def _check_docker(self):
-        try:
-            result = subprocess.run(['docker', 'ps'], capture_output=True, check=True)
-            logging.info("Docker is available - using real containers")
+        self.docker = create_docker_client()
+        if self.docker:
+            logging.info(f"Docker is available - using real containers ({self.docker.backend} backend)")
             return True
-        except:
-            logging.warning("Docker not available - using simulation mode")
-            return False
+        logging.warning("Docker not available - using simulation mode")
+        return False
     
     def _load_existing_containers(self):
         """Load existing containers that match our naming pattern"""
         try:
-            result = subprocess.run(
-                ['docker', 'ps', '-a', '--filter', 'name=web_server', '--filter', 'name=database_server', 
-                 '--filter', 'name=monitoring_server', '--format', '{{.Names}}|{{.ID}}|{{.Status}}|{{.Image}}'],
-                capture_output=True, text=True, check=True
-            )
-            
-            for line in result.stdout.strip().split('\n'):
-                if not line:
-                    continue
-                    
-                parts = line.split('|')
-                if len(parts) >= 4:
-                    name, container_id, status, image = parts[0], parts[1], parts[2], parts[3]
-                    
-                    # Determine server type from name
-                    server_type = 'web_server' if 'web_server' in name else \
-                                 'database_server' if 'database_server' in name else 'monitoring_server'
-                    
-                    # Determine status
-                    if 'Up' in status:
-                        server_status = 'running'
-                    elif 'Exited' in status:
-                        server_status = 'stopped'
-                    else:
-                        server_status = 'terminated'
-                    
-                    server = {
-                        'name': name,
-                        'container_id': container_id,
-                        'status': server_status,
-                        'ip': self._get_container_ip(container_id) if server_status == 'running' else 'N/A',
-                        'deployed_at': datetime.now().isoformat(),
-                        'real': True,
-                        'image': image
-                    }
-                    self.deployed_servers.append(server)
-                    logging.info(f"Loaded existing container: {name} ({server_status})")
+            self.sync_containers(self.docker.list_containers(all=True))
             
-            if self.deployed_servers:
-                logging.info(f"Loaded {len(self.deployed_servers)} existing containers")
+            if self.registry.count():
+                logging.info(f"Loaded {self.registry.count()} existing containers")
         except Exception as e:
             logging.error(f"Failed to load existing containers: {e}")
     
+    def server_type_for_name(self, name):
+        """Map a container name to a server type, or None if Sentinel doesn't manage it"""
+        for server_type, template in self.templates.items():
+            prefix = template.get('name', '').split('{')[0]
+            if (prefix and name.startswith(prefix)) or server_type in name:
+                return server_type
+        return None
+    
+    def _status_from_container(self, container):
+        state = container.get('state') or ''
+        if state == 'running' or (not state and 'Up' in container.get('status', '')):
+            return 'running'
+        if state in ('dead', 'removing'):
+            return 'terminated'
+        return 'stopped'
+    
+    def _server_from_container(self, container, server_type):
+        # The listing already carries the IP, so no per-container inspect is needed
+        status = self._status_from_container(container)
+        ip = (container.get('ip') or 'N/A') if status == 'running' else 'N/A'
+        created = container.get('created')
+        return {
+            'name': container['name'],
+            'type': server_type,
+            'container_id': container['id'][:12],
+            'status': status,
+            'ip': ip,
+            'deployed_at': datetime.fromtimestamp(created).isoformat() if created else datetime.now().isoformat(),
+            'real': True,
+            'image': container.get('image', '')
+        }
+    
+    @property
+    def deployed_servers(self):
+        return self.registry.list()
+    
+    def _find_by_container(self, container_id, name=None):
+        server = self.registry.get_by_container(container_id)
+        if server is None and name:
+            server = self.registry.get(name)
+        return server
+    
+    def sync_containers(self, containers):
+        """Reconcile server records with a full container listing"""
+        seen = set()
+        for container in containers:
+            server_type = self.server_type_for_name(container['name'])
+            if not server_type:
+                continue
+            seen.add(container['id'][:12])
+            self.apply_container_state(container, server_type)
+        
+        # Real containers that vanished outside Sentinel
+        for server in self.registry.list():
+            if server.get('real') and server.get('container_id') and server['container_id'][:12] not in seen \
+                    and server['status'] != 'deploying':
+                self.registry.remove(server['name'])
+                logging.info(f"Container {server['name']} no longer exists")
+    
+    def apply_container_state(self, container, server_type=None):
+        """Insert or update the record for one container"""
+        server_type = server_type or self.server_type_for_name(container['name'])
+        if not server_type:
+            return None
+        
+        server = self._find_by_container(container['id'], container['name'])
+        if server is None:
+            server = self.registry.add(self._server_from_container(container, server_type))
+            logging.info(f"Loaded existing container: {server['name']} ({server['status']})")
+            return server
+        
+        if server['status'] == 'deploying':
+            # deploy_server is still filling this record in
+            return server
+        status = self._status_from_container(container)
+        changes = {'container_id': container['id'][:12], 'real': True}
+        # Terminate is a Sentinel-level state on top of a stopped container
+        if not (server['status'] == 'terminated' and status == 'stopped'):
+            changes['status'] = status
+        if status == 'running' and container.get('ip'):
+            changes['ip'] = container['ip']
+        elif status != 'running':
+            changes['ip'] = 'N/A'
+        if all(server.get(key) == value for key, value in changes.items()):
+            return server
+        return self.registry.update(server['name'], **changes)
+    
+    def remove_container(self, container_id):
+        server = self._find_by_container(container_id)
+        if server and server['status'] != 'deploying':
+            self.registry.remove(server['name'])
+            logging.info(f"Container {server['name']} was removed")
+        return server
+    
     def _load_templates(self):
         try:
             with open(self.config_path, 'r') as f:
@@ -76,38 +148,62 @@ class ServerDeployer:
             logging.error(f"Template file not found: {self.config_path}")
             return {}
     
-    def deploy_server(self, server_type, server_id=None):
+    def get_deploy_concurrency(self):
+        """Max parallel deployments per server type, from the templates"""
+        return {server_type: template.get('max_concurrent_deploys', DEFAULT_DEPLOY_CONCURRENCY)
+                for server_type, template in self.templates.items()}
+    
+    def _next_server_id(self):
+        # int(time.time()) alone collides when several deploys run in the same second
+        with self._id_lock:
+            sequence = next(self._id_sequence)
+        return f"{int(time.time())}-{sequence}", sequence
+    
+    def deploy_server(self, server_type, server_id=None, progress=None):
         if server_type not in self.templates:
             raise ValueError(f"Unknown server type: {server_type}")
         
+        progress = progress or (lambda percent, message=None: None)
         template = self.templates[server_type].copy()
-        server_id = server_id or int(time.time())
+        template.pop('max_concurrent_deploys', None)
+        generated_id, sequence = self._next_server_id()
+        server_id = server_id or generated_id
         template['name'] = template['name'].format(id=server_id)
+        template['type'] = server_type
         template['deployed_at'] = datetime.now().isoformat()
         template['status'] = 'deploying'
+        # Register early so the dashboard and the container cache see it deploying
+        self.registry.add(template)
+        try:
+            server = self._deploy(template, server_type, sequence, progress)
+        except Exception as e:
+            # Never leave the record stuck in 'deploying'
+            self.registry.update(template['name'], status='failed', error=str(e))
+            raise
+        progress(100, f"{server['name']} {server['status']}")
+        return server
+    
+    def _deploy(self, template, server_type, sequence, progress):
+        progress(10, f"Deploying {template['name']}")
         
         if self.use_docker:
             # Deploy REAL Docker container
             container_id = self._deploy_docker_container(template['name'], server_type)
+            progress(70, 'Container started')
             if container_id:
-                template['container_id'] = container_id
-                template['status'] = 'running'
-                template['ip'] = self._get_container_ip(container_id)
-                template['real'] = True
+                server = self.registry.update(template['name'], container_id=container_id[:12],
+                                              ip=self._get_container_ip(container_id),
+                                              real=True, status='running')
                 logging.info(f"Real container {template['name']} deployed: {container_id[:12]}")
             else:
-                template['status'] = 'failed'
-                template['real'] = False
+                server = self.registry.update(template['name'], status='failed', real=False)
         else:
             # Simulation fallback
             logging.info(f"Simulating deployment of {template['name']}...")
             time.sleep(2)
-            template['status'] = 'running'
-            template['ip'] = f"192.168.1.{len(self.deployed_servers) + 10}"
-            template['real'] = False
-        
-        self.deployed_servers.append(template)
-        return template
+            server = self.registry.update(template['name'], status='running', real=False,
+                                          ip=f"192.168.1.{sequence % 245 + 10}")
+        return server
     
     def _deploy_docker_container(self, name, server_type):
         try:
@@ -120,86 +216,186 @@ class ServerDeployer:
             image = image_map.get(server_type, 'busybox:latest')
             
             # Run container
-            result = subprocess.run(
-                ['docker', 'run', '-d', '--name', name, image, 'sleep', '3600'],
-                capture_output=True, text=True, check=True
-            )
-            return result.stdout.strip()
-        except subprocess.CalledProcessError as e:
-            logging.error(f"Failed to deploy container: {e.stderr}")
+            return self.docker.run_container(name, image, ['sleep', '3600'])
+        except DockerError as e:
+            logging.error(f"Failed to deploy container: {e}")
             return None
     
     def _get_container_ip(self, container_id):
         try:
-            result = subprocess.run(
-                ['docker', 'inspect', '-f', '{{range.NetworkSettings.Networks}}{{.IPAddress}}{{end}}', container_id],
-                capture_output=True, text=True, check=True
-            )
-            ip = result.stdout.strip()
-            return ip if ip else 'N/A'
-        except:
+            return self.docker.container_ip(container_id)
+        except DockerError:
             return 'N/A'
     
     def get_server_status(self, server_name):
-        for server in self.deployed_servers:
-            if server['name'] == server_name:
-                return server
-        return None
+        return self.registry.get(server_name)
     
     def list_servers(self):
-        return self.deployed_servers
+        return self.registry.list()
+    
+    # Each lifecycle action is written once, as a generator that yields the
+    # Docker calls it needs as (method, args, kwargs) and receives their
+    # results. _run_steps makes the calls on the blocking client, and
+    # run_action_async awaits them on an async one.
+    @staticmethod
+    def _advance(steps, result=None, error=None):
+        """Resume steps: (the next Docker call, None), or (None, the action's result) once it is done"""
+        try:
+            return (steps.throw(error) if error is not None else steps.send(result)), None
+        except StopIteration as done:
+            return None, done.value
+    
+    def _run_steps(self, steps):
+        try:
+            method, args, kwargs = next(steps)
+            while True:
+                try:
+                    result = getattr(self.docker, method)(*args, **kwargs)
+                except DockerError as e:
+                    method, args, kwargs = steps.throw(e)
+                else:
+                    method, args, kwargs = steps.send(result)
+        except StopIteration as done:
+            return done.value
+    
+    async def run_action_async(self, action, server_name, docker):
+        """Run a lifecycle action with its Docker calls awaited on docker, an async client
+        
+        The code between the calls updates the registry, which commits to
+        SQLite and notifies listeners, so it runs on a worker thread rather
+        than on the event loop.
+        """
+        if action not in BULK_ACTIONS:
+            raise ValueError(f"Unknown action: {action}")
+        steps = getattr(self, f"_{action}_steps")(server_name)
+        call, value = await asyncio.to_thread(self._advance, steps)
+        while call:
+            method, args, kwargs = call
+            try:
+                result = await getattr(docker, method)(*args, **kwargs)
+            except DockerError as e:
+                call, value = await asyncio.to_thread(self._advance, steps, error=e)
+            else:
+                call, value = await asyncio.to_thread(self._advance, steps, result)
+        return value
+    
+    def _has_container(self, server):
+        return self.use_docker and server.get('container_id')
+    
+    def _stop_steps(self, server_name):
+        server = self.registry.get(server_name)
+        if not (server and server['status'] == 'running'):
+            return False
+        # Update status immediately
+        self.registry.update(server_name, status='stopped')
+        if self._has_container(server):
+            try:
+                # Use timeout to avoid long waits
+                yield 'stop', (server['container_id'],), {'timeout': 2}
+                logging.info(f"Real container {server_name} stopped")
+            except DockerError:
+                logging.error(f"Failed to stop container {server_name}")
+        return True
+    
+    def _restart_steps(self, server_name):
+        server = self.registry.get(server_name)
+        if not (server and server['status'] == 'stopped'):
+            return False
+        if self._has_container(server):
+            try:
+                yield 'start', (server['container_id'],), {}
+                logging.info(f"Real container {server_name} restarted")
+            except DockerError:
+                logging.error(f"Failed to restart container {server_name}")
+        self.registry.update(server_name, status='running')
+        return True
+    
+    def _terminate_steps(self, server_name):
+        server = self.registry.get(server_name)
+        if not server:
+            return False
+        if self._has_container(server):
+            try:
+                yield 'stop', (server['container_id'],), {}
+                logging.info(f"Real container {server_name} terminated")
+            except DockerError:
+                pass
+        self.registry.update(server_name, status='terminated')
+        return True
+    
+    def _delete_steps(self, server_name):
+        server = self.registry.get(server_name)
+        if not server:
+            return False
+        if self._has_container(server):
+            try:
+                yield 'remove', (server['container_id'],), {'force': True}
+                logging.info(f"Real container {server_name} deleted")
+            except DockerError:
+                logging.error(f"Failed to delete container {server_name}")
+        self.registry.remove(server_name)
+        return True
     
     def stop_server(self, server_name):
-        for server in self.deployed_servers:
-            if server['name'] == server_name and server['status'] == 'running':
-                # Update status immediately
-                server['status'] = 'stopped'
-                if self.use_docker and server.get('container_id'):
-                    try:
-                        # Use timeout to avoid long waits
-                        subprocess.run(['docker', 'stop', '-t', '2', server['container_id']], 
-                                     check=True, capture_output=True, timeout=5)
-                        logging.info(f"Real container {server_name} stopped")
-                    except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
-                        logging.error(f"Failed to stop container {server_name}")
-                return True
-        return False
+        return self._run_steps(self._stop_steps(server_name))
     
     def restart_server(self, server_name):
-        for server in self.deployed_servers:
-            if server['name'] == server_name and server['status'] == 'stopped':
-                if self.use_docker and server.get('container_id'):
-                    try:
-                        subprocess.run(['docker', 'start', server['container_id']], check=True, capture_output=True)
-                        logging.info(f"Real container {server_name} restarted")
-                    except subprocess.CalledProcessError:
-                        logging.error(f"Failed to restart container {server_name}")
-                server['status'] = 'running'
-                return True
-        return False
+        return self._run_steps(self._restart_steps(server_name))
     
     def terminate_server(self, server_name):
-        for server in self.deployed_servers:
-            if server['name'] == server_name:
-                if self.use_docker and server.get('container_id'):
-                    try:
-                        subprocess.run(['docker', 'stop', server['container_id']], check=True, capture_output=True)
-                        logging.info(f"Real container {server_name} terminated")
-                    except subprocess.CalledProcessError:
-                        pass
-                server['status'] = 'terminated'
-                return True
-        return False
+        return self._run_steps(self._terminate_steps(server_name))
     
     def delete_server(self, server_name):
-        for server in self.deployed_servers:
-            if server['name'] == server_name:
-                if self.use_docker and server.get('container_id'):
-                    try:
-                        subprocess.run(['docker', 'rm', '-f', server['container_id']], check=True, capture_output=True)
-                        logging.info(f"Real container {server_name} deleted")
-                    except subprocess.CalledProcessError:
-                        logging.error(f"Failed to delete container {server_name}")
-                self.deployed_servers.remove(server)
-                return True
-        return False
\ No newline at end of file
+        return self._run_steps(self._delete_steps(server_name))
+    
+    def select_servers(self, names=None, server_type=None, status=None, name_glob=None):
+        """Names of servers matching an explicit list and/or a type/status/glob selector"""
+        selected = self.registry.names(status=status, server_type=server_type)
+        if names is not None:
+            selected &= set(names)
+        if name_glob:
+            selected = {name for name in selected if fnmatch.fnmatchcase(name, name_glob)}
+        return sorted(selected)
+    
+    def bulk_action(self, action, names, concurrency=DEFAULT_BULK_CONCURRENCY):
+        """Run a lifecycle action on many servers in parallel
+        
+        Each Docker call blocks until the daemon is done with the container,
+        so the calls run on a bounded pool rather than one after another.
+        """
+        if action not in BULK_ACTIONS:
+            raise ValueError(f"Unknown action: {action}")
+        handler = getattr(self, f"{action}_server")
+        
+        def run(name):
+            started = time.perf_counter()
+            try:
+                success, error = handler(name), None
+            except Exception as e:
+                success, error = False, str(e)
+            server = self.registry.get(name)
+            return {
+                'name': name,
+                'success': success,
+                'status': server['status'] if server else 'deleted',
+                'error': error,
+                'seconds': round(time.perf_counter() - started, 3)
+            }
+        
+        started = time.perf_counter()
+        results = []
+        if names:
+            with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(names))),
+                                    thread_name_prefix=f'bulk-{action}') as pool:
+                results = list(pool.map(run, names))
+        elapsed = round(time.perf_counter() - started, 3)
+        succeeded = sum(1 for result in results if result['success'])
+        logging.info(f"Bulk {action}: {succeeded}/{len(results)} servers in {elapsed}s")
+        return {
+            'action': action,
+            'requested': len(names),
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'wall_seconds': elapsed,
+            'results': results
+        }
@@ -0,0 +1,245 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+class ServerRegistry:
+    """Indexed, thread-safe store of server records.
+
+    Records are looked up by name or container ID in O(1), with secondary
+    indexes by status and type whose sizes double as per-status counters.
+    All changes go through add/update/remove so the indexes stay correct.
+    Real (Docker-backed) records are written through to SQLite so the
+    registry survives a restart without rescanning Docker. With persist_all
+    every record is written, so other processes can follow it with sync().
+    """
+
+    def __init__(self, db_path='data/infrastructure.db', persist_all=False):
+        self.db_path = db_path
+        self.persist_all = persist_all
+        self.version = 0
+        # (max revision, row count) of the store at the last load or sync. Unlike
+        # version it means the same thing in every process sharing the store.
+        self.synced_state = (None, 0)
+        self._lock = threading.RLock()
+        self._by_name = {}
+        self._by_container = {}
+        self._by_status = {}
+        self._by_type = {}
+        self._real = set()
+        self._listeners = []
+        self._conn = None
+        if db_path:
+            self._open_store()
+            self._load()
+
+    def _open_store(self):
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        # One connection shared under self._lock
+        self._conn = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False)
+        # Before WAL, so whichever opener creates the shared file gets Database's vacuum mode
+        self._conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS server_registry
+                              (name TEXT PRIMARY KEY, container_id TEXT, type TEXT,
+                               status TEXT, data TEXT NOT NULL, updated_at TEXT)''')
+        # Every write takes the next revision, so followers only read rows changed since their last sync
+        if 'revision' not in {row[1] for row in self._conn.execute('PRAGMA table_info(server_registry)')}:
+            self._conn.execute('ALTER TABLE server_registry ADD COLUMN revision INTEGER NOT NULL DEFAULT 0')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_server_registry_revision ON server_registry (revision)')
+        if self.persist_all:
+            # Simulated servers never outlive the process that made them
+            self._conn.execute("DELETE FROM server_registry WHERE json_extract(data, '$.real') IS NOT 1")
+        self._conn.commit()
+
+    def _store_state(self):
+        return self._conn.execute('SELECT MAX(revision), COUNT(*) FROM server_registry').fetchone()
+
+    def _load(self):
+        with self._lock:
+            self.synced_state = self._store_state()
+            rows = self._conn.execute('SELECT data FROM server_registry').fetchall()
+            for (data,) in rows:
+                self._index(json.loads(data))
+        if rows:
+            logging.info(f"Loaded {len(rows)} servers from the registry")
+
+    def _persist(self, server):
+        if not self._conn or not (server.get('real') or self.persist_all):
+            return
+        try:
+            self._conn.execute('''INSERT INTO server_registry
+                                      (name, container_id, type, status, data, updated_at, revision)
+                                  VALUES (?, ?, ?, ?, ?, ?, (SELECT IFNULL(MAX(revision), 0) + 1 FROM server_registry))
+                                  ON CONFLICT(name) DO UPDATE SET container_id = excluded.container_id,
+                                      type = excluded.type, status = excluded.status,
+                                      data = excluded.data, updated_at = excluded.updated_at,
+                                      revision = excluded.revision''',
+                               (server['name'], server.get('container_id'), server.get('type'),
+                                server.get('status'), json.dumps(server), datetime.now().isoformat()))
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Failed to persist server {server['name']}: {e}")
+
+    def _unpersist(self, name):
+        if not self._conn:
+            return
+        try:
+            self._conn.execute('DELETE FROM server_registry WHERE name = ?', (name,))
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Failed to remove server {name} from the registry: {e}")
+
+    def sync(self):
+        """Apply changes another process wrote to the store; returns how many records changed
+
+        Costs one indexed MAX/COUNT query when nothing changed. Changed rows
+        are found by revision, and deletions by comparing the row count.
+        """
+        if not self._conn:
+            return 0
+        changed = 0
+        with self._lock:
+            state = self._store_state()
+            if state == self.synced_state:
+                return 0
+            rows = self._conn.execute('SELECT data FROM server_registry WHERE revision > ?',
+                                      (self.synced_state[0] or 0,)).fetchall()
+            for (data,) in rows:
+                record = json.loads(data)
+                existing = self._by_name.get(record['name'])
+                if existing == record:
+                    continue
+                if existing:
+                    self._unindex(existing)
+                self._index(record)
+                self.version += 1
+                self._notify('upsert', record)
+                changed += 1
+            if state[1] != len(self._by_name):
+                stored = {name for (name,) in self._conn.execute('SELECT name FROM server_registry')}
+                for name in set(self._by_name) - stored:
+                    server = self._by_name[name]
+                    self._unindex(server)
+                    self.version += 1
+                    self._notify('remove', server)
+                    changed += 1
+            self.synced_state = state
+        return changed
+
+    def add_listener(self, callback):
+        """Register callback(action, server) for every change; action is 'upsert' or 'remove'"""
+        self._listeners.append(callback)
+
+    def _notify(self, action, server):
+        # Called with the lock held, so listeners see changes in order
+        for listener in self._listeners:
+            try:
+                listener(action, dict(server))
+            except Exception as e:
+                logging.error(f"Registry listener failed: {e}")
+
+    def _index(self, server):
+        name = server['name']
+        self._by_name[name] = server
+        if server.get('container_id'):
+            self._by_container[server['container_id'][:12]] = name
+        self._by_status.setdefault(server.get('status'), set()).add(name)
+        self._by_type.setdefault(server.get('type'), set()).add(name)
+        if server.get('real'):
+            self._real.add(name)
+
+    def _unindex(self, server):
+        name = server['name']
+        self._by_name.pop(name, None)
+        if server.get('container_id'):
+            self._by_container.pop(server['container_id'][:12], None)
+        self._by_status.get(server.get('status'), set()).discard(name)
+        self._by_type.get(server.get('type'), set()).discard(name)
+        self._real.discard(name)
+
+    def add(self, server):
+        with self._lock:
+            existing = self._by_name.get(server['name'])
+            if existing:
+                self._unindex(existing)
+            record = dict(server)
+            self._index(record)
+            self.version += 1
+            self._persist(record)
+            self._notify('upsert', record)
+            return dict(record)
+
+    def update(self, name, **fields):
+        """Apply field changes to a record, moving it between indexes as needed"""
+        with self._lock:
+            server = self._by_name.get(name)
+            if server is None:
+                return None
+            self._unindex(server)
+            server.update(fields)
+            self._index(server)
+            self.version += 1
+            self._persist(server)
+            self._notify('upsert', server)
+            return dict(server)
+
+    def remove(self, name):
+        with self._lock:
+            server = self._by_name.get(name)
+            if server is None:
+                return None
+            self._unindex(server)
+            self.version += 1
+            self._unpersist(name)
+            self._notify('remove', server)
+            return server
+
+    def get(self, name):
+        with self._lock:
+            server = self._by_name.get(name)
+            return dict(server) if server else None
+
+    def get_by_container(self, container_id):
+        with self._lock:
+            name = self._by_container.get(container_id[:12])
+            return dict(self._by_name[name]) if name else None
+
+    def list(self):
+        with self._lock:
+            return [dict(server) for server in self._by_name.values()]
+
+    def names(self, status=None, server_type=None):
+        """Names matching a status and/or type, answered from the indexes"""
+        with self._lock:
+            names = set(self._by_name) if status is None else set(self._by_status.get(status, ()))
+            if server_type is not None:
+                names &= self._by_type.get(server_type, set())
+            return names
+
+    def count(self, status=None):
+        with self._lock:
+            if status is None:
+                return len(self._by_name)
+            return len(self._by_status.get(status, ()))
+
+    def counts(self):
+        with self._lock:
+            return {
+                'total': len(self._by_name),
+                'real': len(self._real),
+                'by_status': {status: len(names) for status, names in self._by_status.items() if names},
+                'by_type': {server_type: len(names) for server_type, names in self._by_type.items() if names}
+            }
+
+    def __len__(self):
+        return len(self._by_name)
+
+    def close(self):
+        with self._lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
@@ -1,5 +1,9 @@
 import json
 import logging
+import socket
+import threading
+import time
+from collections import deque
 import psutil
 from datetime import datetime
 
@@ -8,6 +12,19 @@ class SystemMonitor:
         self.config = self._load_config(config_path)
         self.alerts = []
         self.use_real_metrics = True
+        self.host = socket.gethostname()
+        
+        # Background sampler state. The latest sample lives in a single slot
+        # that is replaced wholesale, so readers never need a lock.
+        sampler_config = self.config.get('sampler', {})
+        self.sample_interval = sampler_config.get('interval', 5)
+        self.max_staleness = sampler_config.get('max_staleness', 15)
+        self.samples = deque(maxlen=sampler_config.get('history_size', 720))
+        self._latest = None
+        self._listeners = []
+        self._source = None
+        self._sampler_thread = None
+        self._stop_event = threading.Event()
         
     def _load_config(self, config_path):
         try:
@@ -17,10 +34,10 @@ class SystemMonitor:
             logging.error(f"Config file not found: {config_path}")
             return {"thresholds": {"cpu_usage": 80, "memory_usage": 85, "disk_usage": 90}}
     
-    def get_system_metrics(self):
+    def get_system_metrics(self, cpu_interval=1):
         if self.use_real_metrics:
             # Get REAL system metrics
-            cpu = psutil.cpu_percent(interval=1)
+            cpu = psutil.cpu_percent(interval=cpu_interval)
             memory = psutil.virtual_memory().percent
             disk = psutil.disk_usage('/').percent
             net_io = psutil.net_io_counters()
@@ -45,34 +62,128 @@ class SystemMonitor:
                 'process_count': 150
             }
     
-    def check_thresholds(self, metrics):
+    def evaluate_thresholds(self, metrics):
+        """Return a structured alert record for every threshold the sample breaches"""
         alerts = []
         thresholds = self.config['thresholds']
+        critical = self.config.get('critical_thresholds', {})
+        labels = {'cpu_usage': 'CPU usage', 'memory_usage': 'memory usage', 'disk_usage': 'disk usage'}
         
-        if metrics['cpu_usage'] > thresholds['cpu_usage']:
-            alerts.append(f"High CPU usage: {metrics['cpu_usage']:.1f}%")
-        
-        if metrics['memory_usage'] > thresholds['memory_usage']:
-            alerts.append(f"High memory usage: {metrics['memory_usage']:.1f}%")
-        
-        if metrics['disk_usage'] > thresholds['disk_usage']:
-            alerts.append(f"High disk usage: {metrics['disk_usage']:.1f}%")
+        for metric, label in labels.items():
+            value = metrics[metric]
+            if value > thresholds[metric]:
+                severity = 'critical' if metric in critical and value > critical[metric] else 'warning'
+                alerts.append({
+                    'timestamp': metrics['timestamp'],
+                    'metric': metric,
+                    'value': value,
+                    'threshold': thresholds[metric],
+                    'severity': severity,
+                    'host': self.host,
+                    'message': f"High {label}: {value:.1f}%"
+                })
         
         return alerts
     
-    def monitor_system(self):
-        metrics = self.get_system_metrics()
-        alerts = self.check_thresholds(metrics)
+    def check_thresholds(self, metrics):
+        return [alert['message'] for alert in self.evaluate_thresholds(metrics)]
+    
+    def _record_sample(self, metrics, log_alerts=True):
+        alerts = self.evaluate_thresholds(metrics)
+        messages = [alert['message'] for alert in alerts]
         
-        if alerts:
-            self.alerts.extend(alerts)
+        if alerts and log_alerts:
+            self.alerts.extend(messages)
             for alert in alerts:
-                logging.warning(f"ALERT: {alert}")
+                logging.warning(f"ALERT ({alert['severity']}): {alert['message']}")
+        
+        self._latest = (metrics, messages, time.monotonic())
+        self.samples.append(metrics)
+        
+        for listener in self._listeners:
+            try:
+                listener(metrics, alerts)
+            except Exception as e:
+                logging.error(f"Metrics listener failed: {e}")
+        
+        return metrics, messages
+    
+    def add_listener(self, callback):
+        """Register callback(metrics, alert_records), called once per new sample"""
+        self._listeners.append(callback)
+    
+    def start_sampler(self, interval=None, source=None):
+        """Start the background thread that keeps the latest snapshot fresh
+        
+        With source, each tick records the samples source() returns instead of
+        reading psutil, so a process can follow samples taken by another one.
+        Their alerts were already logged where they were taken.
+        """
+        if self._sampler_thread and self._sampler_thread.is_alive():
+            return
+        if interval:
+            self.sample_interval = interval
+        self._source = source
         
-        return metrics, alerts
+        if source is None:
+            # Prime cpu_percent so the first non-blocking reading is meaningful
+            psutil.cpu_percent(interval=None)
+        self._stop_event.clear()
+        self._sampler_thread = threading.Thread(target=self._sample_loop, name='metrics-sampler', daemon=True)
+        self._sampler_thread.start()
+        logging.info(f"Metrics sampler started (every {self.sample_interval}s{', following' if source else ''})")
+    
+    def stop_sampler(self):
+        self._stop_event.set()
+        if self._sampler_thread:
+            self._sampler_thread.join(timeout=self.sample_interval + 1)
+            self._sampler_thread = None
+    
+    def _sample_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                if self._source:
+                    for metrics in self._source():
+                        self._record_sample(metrics, log_alerts=False)
+                else:
+                    # The loop interval is the CPU measurement window, so no sleep here
+                    self._record_sample(self.get_system_metrics(cpu_interval=None))
+            except Exception as e:
+                logging.error(f"Metrics sampling failed: {e}")
+            self._stop_event.wait(self.sample_interval)
+    
+    def get_staleness(self):
+        """Seconds since the cached snapshot was taken, or None if there is none"""
+        latest = self._latest
+        if latest is None:
+            return None
+        return time.monotonic() - latest[2]
+    
+    def _get_snapshot(self):
+        latest = self._latest
+        if self._sampler_thread and latest is not None and time.monotonic() - latest[2] <= self.max_staleness:
+            return latest[0], latest[1]
+        
+        if self._source:
+            # Following another process: sampling here would block the request for the
+            # CPU interval, so answer with the last followed sample, marked stale
+            if latest is None:
+                return {'timestamp': None, 'cpu_usage': None, 'memory_usage': None, 'disk_usage': None,
+                        'network_io': None, 'process_count': None, 'stale': True}, []
+            return dict(latest[0], stale=True), latest[1]
+        
+        # No sampler running (CLI usage) or it fell behind: sample synchronously
+        return self._record_sample(self.get_system_metrics())
+    
+    def monitor_system(self):
+        return self._get_snapshot()
     
     def get_current_metrics(self):
-        return self.get_system_metrics()
+        return self._get_snapshot()[0]
+    
+    def get_metrics_samples(self, limit=None):
+        samples = list(self.samples)
+        return samples[-limit:] if limit else samples
     
     def get_process_info(self):
         if self.use_real_metrics:
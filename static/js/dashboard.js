@@ -1,67 +1,105 @@
 let metricsChart;
+let lastPointTimestamp = null;
 const API_BASE = '';
+const CHART_POINTS = 20;
+// True while /api/stream is connected; actions then wait for pushed updates instead of refetching
+let streaming = false;
+let pollTimer = null;
+// After the server turns the stream away (at its stream limit), poll this long before trying again
+const STREAM_RETRY_MS = 60000;
 
-async function fetchStats() {
-    const response = await fetch(`${API_BASE}/api/stats`);
-    const data = await response.json();
-    
-    document.getElementById('totalServers').textContent = data.total_servers;
-    document.getElementById('activeServers').textContent = data.active_servers;
-    document.getElementById('totalAlerts').textContent = data.total_alerts;
-    document.getElementById('uptime').textContent = data.uptime_percentage + '%';
+function renderStats(data) {
+    // Stream updates only carry the fields that changed
+    if ('total_servers' in data) document.getElementById('totalServers').textContent = data.total_servers;
+    if ('active_servers' in data) document.getElementById('activeServers').textContent = data.active_servers;
+    if ('total_alerts' in data) document.getElementById('totalAlerts').textContent = data.total_alerts;
+    if ('uptime_percentage' in data) document.getElementById('uptime').textContent = data.uptime_percentage + '%';
     
     // Show Docker status
     const dockerBadge = document.getElementById('dockerStatus');
-    if (dockerBadge) {
+    if (dockerBadge && 'docker_enabled' in data) {
         dockerBadge.textContent = data.docker_enabled ? '🐳 Docker Active' : '⚠️ Simulation Mode';
         dockerBadge.className = data.docker_enabled ? 'badge bg-success' : 'badge bg-warning';
     }
 }
 
+async function fetchStats() {
+    const response = await fetch(`${API_BASE}/api/stats`);
+    renderStats(await response.json());
+}
+
+function serverRow(server) {
+    let buttons = '';
+    const realBadge = server.real ? '<span class="badge bg-success" title="Real Docker Container">🐳</span>' : '<span class="badge bg-secondary" title="Simulated">💭</span>';
+    
+    if (server.status === 'running') {
+        buttons = `
+            <button class="btn btn-sm btn-warning" onclick="stopServer('${server.name}')" title="Stop">
+                <i class="bi bi-pause-circle"></i>
+            </button>
+            <button class="btn btn-sm btn-danger" onclick="terminateServer('${server.name}')" title="Terminate">
+                <i class="bi bi-x-circle"></i>
+            </button>
+        `;
+    } else if (server.status === 'stopped') {
+        buttons = `
+            <button class="btn btn-sm btn-success" onclick="restartServer('${server.name}')" title="Restart">
+                <i class="bi bi-play-circle"></i>
+            </button>
+            <button class="btn btn-sm btn-danger" onclick="terminateServer('${server.name}')" title="Terminate">
+                <i class="bi bi-x-circle"></i>
+            </button>
+        `;
+    } else if (server.status === 'terminated') {
+        buttons = `
+            <button class="btn btn-sm btn-dark" onclick="deleteServer('${server.name}')" title="Delete">
+                <i class="bi bi-trash"></i>
+            </button>
+        `;
+    }
+    
+    return `
+        <tr data-name="${server.name}">
+            <td>${server.name} ${realBadge}</td>
+            <td>${server.ip || 'N/A'}</td>
+            <td><span class="status-badge status-${server.status}">${server.status}</span></td>
+            <td>${buttons}</td>
+        </tr>
+    `;
+}
+
+function renderServers(servers) {
+    document.getElementById('serversList').innerHTML = servers.map(serverRow).join('');
+}
+
+function applyServerChange(action, server) {
+    // Touch only the row that changed
+    const tbody = document.getElementById('serversList');
+    const row = tbody.querySelector(`tr[data-name="${CSS.escape(server.name)}"]`);
+    if (action === 'remove') {
+        if (row) row.remove();
+        return;
+    }
+    const template = document.createElement('template');
+    template.innerHTML = serverRow(server).trim();
+    if (row) {
+        row.replaceWith(template.content.firstChild);
+    } else {
+        tbody.appendChild(template.content.firstChild);
+    }
+}
+
 async function fetchServers() {
     const response = await fetch(`${API_BASE}/api/servers`);
     const data = await response.json();
-    
-    const tbody = document.getElementById('serversList');
-    tbody.innerHTML = data.servers.map(server => {
-        let buttons = '';
-        const realBadge = server.real ? '<span class="badge bg-success" title="Real Docker Container">🐳</span>' : '<span class="badge bg-secondary" title="Simulated">💭</span>';
-        
-        if (server.status === 'running') {
-            buttons = `
-                <button class="btn btn-sm btn-warning" onclick="stopServer('${server.name}')" title="Stop">
-                    <i class="bi bi-pause-circle"></i>
-                </button>
-                <button class="btn btn-sm btn-danger" onclick="terminateServer('${server.name}')" title="Terminate">
-                    <i class="bi bi-x-circle"></i>
-                </button>
-            `;
-        } else if (server.status === 'stopped') {
-            buttons = `
-                <button class="btn btn-sm btn-success" onclick="restartServer('${server.name}')" title="Restart">
-                    <i class="bi bi-play-circle"></i>
-                </button>
-                <button class="btn btn-sm btn-danger" onclick="terminateServer('${server.name}')" title="Terminate">
-                    <i class="bi bi-x-circle"></i>
-                </button>
-            `;
-        } else if (server.status === 'terminated') {
-            buttons = `
-                <button class="btn btn-sm btn-dark" onclick="deleteServer('${server.name}')" title="Delete">
-                    <i class="bi bi-trash"></i>
-                </button>
-            `;
-        }
-        
-        return `
-            <tr>
-                <td>${server.name} ${realBadge}</td>
-                <td>${server.ip || 'N/A'}</td>
-                <td><span class="status-badge status-${server.status}">${server.status}</span></td>
-                <td>${buttons}</td>
-            </tr>
-        `;
-    }).join('');
+    renderServers(data.servers);
+}
+
+function refreshAfterAction() {
+    if (!streaming) {
+        fetchServers();
+        fetchStats();
+    }
 }
 
 async function deployServer() {
@@ -76,45 +114,59 @@ async function deployServer() {
     });
     const data = await response.json();
     
-    if (data.success) {
-        const badge = data.server.real ? '🐳' : '💭';
-        showNotification(`${badge} Server deployed: <strong>${data.server.name}</strong>`, 'success', 'deploy-loading');
+    if (!data.success) {
+        showNotification(`❌ Deployment failed: ${data.error}`, 'danger', 'deploy-loading');
+        return;
     }
     
-    fetchServers();
-    fetchStats();
+    const job = await waitForJob(data.job_id);
+    if (job.status === 'succeeded') {
+        const badge = job.result.real ? '🐳' : '💭';
+        showNotification(`${badge} Server deployed: <strong>${job.result.name}</strong>`, 'success', 'deploy-loading');
+    } else {
+        showNotification(`❌ Deployment failed: ${job.error}`, 'danger', 'deploy-loading');
+    }
+    
+    refreshAfterAction();
+}
+
+async function waitForJob(jobId, intervalMs = 500) {
+    while (true) {
+        const response = await fetch(`${API_BASE}/api/jobs/${jobId}`);
+        const job = await response.json();
+        if (job.status === 'succeeded' || job.status === 'failed' || job.status === 'cancelled') {
+            return job;
+        }
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
 }
 
 async function stopServer(name) {
     const response = await fetch(`${API_BASE}/api/servers/${name}/stop`, {method: 'POST'});
     await response.json();
     showNotification(`⏸️ Server stopped: <strong>${name}</strong>`, 'warning');
-    await fetchServers();
-    await fetchStats();
+    refreshAfterAction();
 }
 
 async function restartServer(name) {
     const response = await fetch(`${API_BASE}/api/servers/${name}/restart`, {method: 'POST'});
     await response.json();
     showNotification(`▶️ Server restarted: <strong>${name}</strong>`, 'success');
-    await fetchServers();
-    await fetchStats();
+    refreshAfterAction();
 }
 
 async function terminateServer(name) {
     const response = await fetch(`${API_BASE}/api/servers/${name}/terminate`, {method: 'POST'});
     await response.json();
     showNotification(`🛑 Server terminated: <strong>${name}</strong>`, 'danger');
-    await fetchServers();
-    await fetchStats();
+    refreshAfterAction();
 }
 
 async function deleteServer(name) {
     const response = await fetch(`${API_BASE}/api/servers/${name}/delete`, {method: 'DELETE'});
     await response.json();
     showNotification(`🗑️ Server deleted: <strong>${name}</strong>`, 'dark');
-    await fetchServers();
-    await fetchStats();
+    refreshAfterAction();
 }
 
 function showNotification(message, type = 'success', id = null) {
@@ -159,7 +211,12 @@ async function createBackup() {
 async function runCleanup() {
     showNotification('⏳ Running cleanup...', 'info', 'cleanup-loading');
     const response = await fetch(`${API_BASE}/api/automation/cleanup`, {method: 'POST'});
-    const data = await response.json();
+    const job = await waitForJob((await response.json()).job_id);
+    if (job.status !== 'succeeded') {
+        showNotification(`❌ Cleanup failed: ${job.error}`, 'danger', 'cleanup-loading');
+        return;
+    }
+    const data = job.result;
     
     if (data.deleted_backups === 0 && data.rotated_logs === 0) {
         showNotification('✨ <strong>System is Clean!</strong><br>💡 No backups >3 hours old<br>💡 No logs >10MB<br><small>Nothing to delete - your system is optimized!</small>', 'success', 'cleanup-loading');
@@ -175,13 +232,20 @@ async function downloadReport() {
     
     showNotification(`📊 Generating ${formatLabels[format]} report...`, 'info', 'report-loading');
     try {
-        const response = await fetch(`${API_BASE}/api/report/generate?format=${format}`);
-        const data = await response.json();
+        // One request: the report comes back as the response body (from cache when unchanged)
+        const response = await fetch(`${API_BASE}/api/report/generate?format=${format}&stream=1`);
         
-        if (data.success) {
-            showNotification(`✅ <strong>${formatLabels[format]} Report Generated!</strong><br>📥 Downloading...`, 'success', 'report-loading');
-            window.location.href = `${API_BASE}/api/report/download/${data.filename}`;
+        if (response.ok && !response.headers.get('Content-Type').includes('application/json')) {
+            const disposition = response.headers.get('Content-Disposition') || '';
+            const filename = (disposition.match(/filename="?([^";]+)"?/) || [])[1] || `report.${format}`;
+            const link = document.createElement('a');
+            link.href = URL.createObjectURL(await response.blob());
+            link.download = filename;
+            link.click();
+            URL.revokeObjectURL(link.href);
+            showNotification(`✅ <strong>${formatLabels[format]} Report Downloaded!</strong>`, 'success', 'report-loading');
         } else {
+            const data = await response.json();
             const errorMsg = data.error.includes('reportlab') ? 
                 '❌ PDF requires reportlab. Run: <code>pip install reportlab</code>' : 
                 '❌ Report generation failed!';
@@ -192,46 +256,83 @@ async function downloadReport() {
     }
 }
 
+function showAlerts(messages) {
+    const alertsList = document.getElementById('alertsList');
+    messages.forEach(alert => {
+        const div = document.createElement('div');
+        div.className = 'alert-item';
+        div.textContent = alert;
+        alertsList.insertBefore(div, alertsList.firstChild);
+    });
+}
+
 async function updateMetrics() {
     const response = await fetch(`${API_BASE}/api/metrics`);
     const data = await response.json();
-    
-    if (data.alerts.length > 0) {
-        const alertsList = document.getElementById('alertsList');
-        data.alerts.forEach(alert => {
-            const div = document.createElement('div');
-            div.className = 'alert-item';
-            div.textContent = alert;
-            alertsList.insertBefore(div, alertsList.firstChild);
-        });
+    showAlerts(data.alerts);
+}
+
+function pointLabel(point) {
+    return (point.timestamp || '').substring(11, 19);
+}
+
+function updateLegend() {
+    const datasets = metricsChart.data.datasets;
+    const last = datasets[0].data.length - 1;
+    if (last < 0) return;
+    datasets[0].label = `CPU Usage: ${datasets[0].data[last].toFixed(1)}%`;
+    datasets[1].label = `Memory Usage: ${datasets[1].data[last].toFixed(1)}%`;
+    datasets[2].label = `Disk Usage: ${datasets[2].data[last].toFixed(1)}%`;
+}
+
+function setHistory(history) {
+    metricsChart.data.labels = history.map(pointLabel);
+    metricsChart.data.datasets[0].data = history.map(m => m.cpu_usage);
+    metricsChart.data.datasets[1].data = history.map(m => m.memory_usage);
+    metricsChart.data.datasets[2].data = history.map(m => m.disk_usage);
+    lastPointTimestamp = history.length ? history[history.length - 1].timestamp : null;
+    updateLegend();
+    metricsChart.update();
+}
+
+function addPoint(point) {
+    // A point can arrive twice around a reconnect; timestamps only move forward
+    if (lastPointTimestamp && point.timestamp <= lastPointTimestamp) return;
+    lastPointTimestamp = point.timestamp;
+    metricsChart.data.labels.push(pointLabel(point));
+    metricsChart.data.datasets[0].data.push(point.cpu_usage);
+    metricsChart.data.datasets[1].data.push(point.memory_usage);
+    metricsChart.data.datasets[2].data.push(point.disk_usage);
+    if (metricsChart.data.labels.length > CHART_POINTS) {
+        metricsChart.data.labels.shift();
+        metricsChart.data.datasets.forEach(dataset => dataset.data.shift());
     }
+    updateLegend();
+    metricsChart.update();
 }
 
-async function initChart() {
-    const response = await fetch(`${API_BASE}/api/metrics/history?limit=20`);
-    const data = await response.json();
-    
+function initChart() {
     const ctx = document.getElementById('metricsChart').getContext('2d');
     metricsChart = new Chart(ctx, {
         type: 'line',
         data: {
-            labels: data.history.map((_, i) => i),
+            labels: [],
             datasets: [
                 {
                     label: 'CPU Usage (%)',
-                    data: data.history.map(m => m.cpu_usage),
+                    data: [],
                     borderColor: 'rgb(255, 99, 132)',
                     tension: 0.1
                 },
                 {
                     label: 'Memory Usage (%)',
-                    data: data.history.map(m => m.memory_usage),
+                    data: [],
                     borderColor: 'rgb(54, 162, 235)',
                     tension: 0.1
                 },
                 {
                     label: 'Disk Usage (%)',
-                    data: data.history.map(m => m.disk_usage),
+                    data: [],
                     borderColor: 'rgb(75, 192, 192)',
                     tension: 0.1
                 }
@@ -244,7 +345,7 @@ async function initChart() {
                 x: {
                     title: {
                         display: true,
-                        text: 'Time (last 20 samples)'
+                        text: `Time (last ${CHART_POINTS} samples)`
                     }
                 },
                 y: {
@@ -267,33 +368,67 @@ async function initChart() {
 }
 
 async function updateChart() {
-    const response = await fetch(`${API_BASE}/api/metrics/history?limit=20`);
+    const response = await fetch(`${API_BASE}/api/metrics/history?limit=${CHART_POINTS}`);
     const data = await response.json();
-    
-    metricsChart.data.labels = data.history.map((_, i) => i);
-    metricsChart.data.datasets[0].data = data.history.map(m => m.cpu_usage);
-    metricsChart.data.datasets[1].data = data.history.map(m => m.memory_usage);
-    metricsChart.data.datasets[2].data = data.history.map(m => m.disk_usage);
-    
-    // Update legend with current values
-    if (data.history.length > 0) {
-        const latest = data.history[data.history.length - 1];
-        metricsChart.data.datasets[0].label = `CPU Usage: ${latest.cpu_usage.toFixed(1)}%`;
-        metricsChart.data.datasets[1].label = `Memory Usage: ${latest.memory_usage.toFixed(1)}%`;
-        metricsChart.data.datasets[2].label = `Disk Usage: ${latest.disk_usage.toFixed(1)}%`;
-    }
-    
-    metricsChart.update();
+    setHistory(data.history);
 }
 
-document.addEventListener('DOMContentLoaded', () => {
+function connectStream() {
+    // One connection replaces polling; the browser reconnects on its own and resumes from the last event
+    const source = new EventSource(`${API_BASE}/api/stream`);
+    source.onopen = () => {
+        streaming = true;
+        stopPolling();
+    };
+    source.onerror = () => {
+        streaming = false;
+        // Closed rather than reconnecting means the server refused the stream (e.g. 503 at its limit)
+        if (source.readyState === EventSource.CLOSED) {
+            startPolling();
+            setTimeout(connectStream, STREAM_RETRY_MS);
+        }
+    };
+    source.addEventListener('snapshot', event => {
+        const data = JSON.parse(event.data);
+        renderStats(data.stats);
+        renderServers(data.servers);
+        setHistory(data.history);
+    });
+    source.addEventListener('metrics', event => {
+        const data = JSON.parse(event.data);
+        addPoint(data.point);
+        showAlerts(data.alerts);
+    });
+    source.addEventListener('server', event => {
+        const data = JSON.parse(event.data);
+        applyServerChange(data.action, data.server);
+    });
+    source.addEventListener('stats', event => renderStats(JSON.parse(event.data)));
+}
+
+// Polling fallback for browsers without EventSource, or while the server has no stream to spare
+function startPolling() {
+    if (pollTimer) return;
     fetchStats();
     fetchServers();
-    initChart();
-    
-    setInterval(() => {
+    updateChart();
+    pollTimer = setInterval(() => {
         updateMetrics();
         updateChart();
         fetchStats();
     }, 5000);
+}
+
+function stopPolling() {
+    clearInterval(pollTimer);
+    pollTimer = null;
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    initChart();
+    if (window.EventSource) {
+        connectStream();
+    } else {
+        startPolling();
+    }
 });
@@ -0,0 +1,142 @@
+"""Flask API through its test client, run in a scratch directory"""
+import atexit
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+# asgi.py's dependencies, plus httpx2 for Starlette's TestClient
+ASGI_AVAILABLE = all(importlib.util.find_spec(name) for name in ('starlette', 'a2wsgi', 'httpx2'))
+
+app = None
+
+def setUpModule():
+    # app.py keeps its database, backups and reports under the working directory
+    global app, workdir, previous_cwd
+    workdir = tempfile.TemporaryDirectory()
+    shutil.copytree(os.path.join(ROOT, 'config'), os.path.join(workdir.name, 'config'))
+    previous_cwd = os.getcwd()
+    os.chdir(workdir.name)
+    import app
+
+def tearDownModule():
+    # Stop its threads while the scratch directory is still the working directory
+    app.shutdown()
+    atexit.unregister(app.shutdown)
+    os.chdir(previous_cwd)
+    workdir.cleanup()
+
+class ReadEndpointTest(unittest.TestCase):
+    def setUp(self):
+        self.client = app.app.test_client()
+
+    def test_stats_etag_and_not_modified(self):
+        response = self.client.get('/api/stats')
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers['ETag']
+        again = self.client.get('/api/stats', headers={'If-None-Match': etag})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.headers['ETag'], etag)
+
+    def test_cached_bodies_leave_out_freshness(self):
+        self.assertNotIn('cache_staleness_seconds', self.client.get('/api/stats').get_json())
+        self.assertNotIn('cache', self.client.get('/api/servers').get_json())
+
+    def test_cache_status_not_cached(self):
+        app.container_cache._last_sync = time.monotonic() - 5
+        first = self.client.get('/api/cache').get_json()
+        app.container_cache._last_sync -= 10
+        second = self.client.get('/api/cache').get_json()
+        self.assertGreaterEqual(second['seconds_since_resync'] - first['seconds_since_resync'], 10)
+
+    def test_bad_resolution_is_a_client_error(self):
+        response = self.client.get('/api/metrics/history?resolution=bogus')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.get_json())
+
+class StreamLimitTest(unittest.TestCase):
+    def test_streams_over_the_limit_told_to_poll(self):
+        client = app.app.test_client()
+        held, _ = app.broker.subscribe()
+        try:
+            with mock.patch.object(app, 'MAX_STREAMS', 1):
+                response = client.get('/api/stream')
+        finally:
+            held.close()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], str(app.STREAM_RETRY_AFTER))
+        self.assertEqual(response.get_json()['retry_after'], app.STREAM_RETRY_AFTER)
+
+class ReportTest(unittest.TestCase):
+    def setUp(self):
+        self.client = app.app.test_client()
+        self.reports_dir = app.report_cache.reports_dir
+
+    def test_report_reused_across_new_samples(self):
+        window_end = app.report_window(None)[1]
+        first = self.client.get('/api/report/generate?format=json').get_json()
+        sample = dict(app.monitor.get_current_metrics(), timestamp='2099-01-01T00:00:00')
+        with mock.patch.object(app.monitor, 'get_current_metrics', return_value=sample):
+            second = self.client.get('/api/report/generate?format=json').get_json()
+        if app.report_window(None)[1] != window_end:
+            self.skipTest('a minute boundary passed between the requests')
+        self.assertEqual(second['filename'], first['filename'])
+        self.assertTrue(second['cached'])
+
+    def test_abandoned_stream_leaves_no_partial_file(self):
+        response = self.client.get('/api/report/generate?format=html&stream=1&history_hours=0.5', buffered=False)
+        self.assertEqual(response.headers['X-Report-Cache'], 'miss')
+        next(response.response)
+        response.close()
+        self.assertFalse([name for name in os.listdir(self.reports_dir) if name.endswith('.part')])
+
+@unittest.skipUnless(ASGI_AVAILABLE, 'needs starlette, a2wsgi and httpx2')
+class AsgiTest(unittest.TestCase):
+    def setUp(self):
+        import asgi
+        from starlette.testclient import TestClient
+        self.client = TestClient(asgi.app)
+
+    def test_read_endpoint(self):
+        response = self.client.get('/api/stats')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_servers'], app.collect_stats()['total_servers'])
+        again = self.client.get('/api/stats', headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(self.client.get('/api/metrics/history?resolution=bogus').status_code, 400)
+
+    def test_flask_routes_mounted(self):
+        response = self.client.get('/api/stream/stats')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('subscribers', response.json())
+
+    def test_event_stream(self):
+        def publish_then_close():
+            time.sleep(0.5)
+            app.broker.publish('metrics', {'point': {'cpu_usage': 12.5}, 'alerts': []})
+            time.sleep(0.5)
+            for subscription in list(app.broker._subscribers):
+                subscription.close()
+
+        closer = threading.Thread(target=publish_then_close)
+        # A short heartbeat lets the stream notice the closed subscription quickly
+        with mock.patch.object(app, 'STREAM_HEARTBEAT', 0.1):
+            closer.start()
+            response = self.client.get('/api/stream')
+        closer.join()
+        self.assertEqual(response.headers['Content-Type'].split(';')[0], 'text/event-stream')
+        self.assertTrue(response.text.startswith('retry: 3000'))
+        self.assertIn('event: snapshot', response.text)
+        self.assertIn('"cpu_usage": 12.5', response.text)
+
+if __name__ == '__main__':
+    unittest.main()
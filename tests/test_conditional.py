@@ -0,0 +1,64 @@
+"""ETag, 304 and compression handling shared by the Flask and ASGI read endpoints"""
+import gzip
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+from werkzeug.http import parse_accept_header, parse_etags
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from api import conditional
+from api.conditional import BodyCache, conditional_body
+
+def request_headers(if_none_match=None, accept_encoding=None):
+    return parse_etags(if_none_match), parse_accept_header(accept_encoding)
+
+class ConditionalBodyTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = BodyCache(max_entries=2, dumps=json.dumps)
+        self.builds = 0
+
+    def build(self):
+        self.builds += 1
+        return {'values': list(range(1000))}
+
+    def test_body_built_once_per_version(self):
+        for _ in range(3):
+            status, body, headers = conditional_body('v1', self.build, self.cache, *request_headers())
+        self.assertEqual((status, self.builds), (200, 1))
+        self.assertEqual(headers['ETag'], '"v1"')
+        self.assertEqual(json.loads(body), self.build())
+
+    def test_not_modified(self):
+        status, body, headers = conditional_body('v1', self.build, self.cache, *request_headers('"v1"'))
+        self.assertEqual((status, body, self.builds), (304, None, 0))
+        self.assertEqual(headers['ETag'], '"v1"')
+
+    def test_compressed_once_per_version_and_encoding(self):
+        with mock.patch.object(conditional, 'encode_body', wraps=conditional.encode_body) as encode:
+            for _ in range(3):
+                status, body, headers = conditional_body('v1', self.build, self.cache,
+                                                         *request_headers(accept_encoding='gzip'))
+        self.assertEqual(encode.call_count, 1)
+        self.assertEqual((headers['Content-Encoding'], headers['ETag']), ('gzip', '"v1-gzip"'))
+        self.assertEqual(json.loads(gzip.decompress(body)), self.build())
+
+        status, _, _ = conditional_body('v1', self.build, self.cache, *request_headers('"v1-gzip"', 'gzip'))
+        self.assertEqual(status, 304)
+
+    def test_small_body_sent_uncompressed(self):
+        status, body, headers = conditional_body('v1', lambda: {'ok': True}, self.cache,
+                                                 *request_headers(accept_encoding='gzip'))
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(json.loads(body), {'ok': True})
+
+    def test_oldest_version_evicted(self):
+        for etag in ('v1', 'v2', 'v3', 'v1'):
+            conditional_body(etag, self.build, self.cache, *request_headers())
+        self.assertEqual(self.builds, 4)
+
+if __name__ == '__main__':
+    unittest.main()
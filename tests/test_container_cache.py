@@ -0,0 +1,127 @@
+"""ContainerStateCache event following, fallback polling and reconnect backoff"""
+import logging
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from container_cache import ContainerStateCache
+from docker_client import DockerError
+
+class FakeDocker:
+    def __init__(self, events_error=None, events=()):
+        self.events_error = events_error
+        self.event_list = list(events)
+        self.event_calls = []
+        self.list_calls = 0
+        self.containers = {}
+
+    def events(self, stop_event):
+        self.event_calls.append(time.monotonic())
+        if self.events_error:
+            raise self.events_error
+        return FakeStream(self.event_list, stop_event)
+
+    def list_containers(self, all=False):
+        self.list_calls += 1
+        return list(self.containers.values())
+
+    def get_container(self, container_id):
+        return self.containers[container_id]
+
+class FakeStream:
+    def __init__(self, events, stop_event):
+        self.events = events
+        self.stop_event = stop_event
+        self.closed = False
+
+    def __iter__(self):
+        yield from self.events
+        self.stop_event.wait()
+
+    def close(self):
+        self.closed = True
+
+class FakeDeployer:
+    use_docker = True
+
+    def __init__(self, docker):
+        self.docker = docker
+        self.synced = 0
+        self.applied = []
+        self.removed = []
+
+    def sync_containers(self, containers):
+        self.synced += 1
+
+    def server_type_for_name(self, name):
+        return 'web_server' if name.startswith('web') else None
+
+    def apply_container_state(self, container):
+        self.applied.append(container['id'])
+
+    def remove_container(self, container_id):
+        self.removed.append(container_id)
+
+def event(action, container_id, name='web-1'):
+    return {'action': action, 'id': container_id, 'name': name}
+
+class ContainerStateCacheTest(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def run_cache(self, docker, seconds, **options):
+        cache = ContainerStateCache(FakeDeployer(docker), **options)
+        cache.start()
+        time.sleep(seconds)
+        cache.stop()
+        cache._thread.join(timeout=2)
+        return cache
+
+    def test_events_applied_to_records(self):
+        docker = FakeDocker(events=[event('start', 'a'), event('destroy', 'b'), event('start', 'c', 'other'),
+                                    event('exec_start: sh', 'a')])
+        docker.containers['a'] = {'id': 'a'}
+        cache = ContainerStateCache(FakeDeployer(docker), poll_interval=0.05)
+        cache.start()
+        # Other servers' containers and actions that do not change state are skipped
+        for _ in range(200):
+            if cache.events_applied == 2:
+                break
+            time.sleep(0.01)
+        self.assertEqual(cache.events_applied, 2)
+        self.assertTrue(cache.events_connected)
+        self.assertEqual(cache.get_staleness()['staleness_seconds'], 0.0)
+        cache.stop()
+        self.assertEqual(cache.deployer.applied, ['a'])
+        self.assertEqual(cache.deployer.removed, ['b'])
+        self.assertEqual(cache.deployer.synced, 1)
+
+    def test_failing_stream_retried_with_backoff_while_polling(self):
+        docker = FakeDocker(events_error=DockerError('events unavailable'))
+        cache = self.run_cache(docker, 1.0, poll_interval=0.05, max_backoff=0.4)
+        self.assertFalse(cache.events_connected)
+        self.assertEqual(cache.get_staleness()['mode'], 'polling')
+        # Retries after 0.05, 0.1, 0.2, 0.4, 0.4 ... s instead of every poll
+        self.assertLessEqual(len(docker.event_calls), 6)
+        self.assertGreaterEqual(docker.list_calls, 10)
+        gaps = [b - a for a, b in zip(docker.event_calls, docker.event_calls[1:])]
+        self.assertGreater(gaps[-1], gaps[0])
+
+    def test_unexpected_errors_do_not_end_the_thread(self):
+        docker = FakeDocker(events_error=ValueError('bad payload'))
+        docker.list_containers = lambda all=False: (_ for _ in ()).throw(OSError('socket closed'))
+        cache = ContainerStateCache(FakeDeployer(docker), poll_interval=0.02, max_backoff=0.05)
+        cache.start()
+        time.sleep(0.3)
+        self.assertTrue(cache._thread.is_alive())
+        self.assertGreater(len(docker.event_calls), 1)
+        cache.stop()
+
+if __name__ == '__main__':
+    unittest.main()
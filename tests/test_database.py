@@ -0,0 +1,120 @@
+"""Database against a temporary SQLite file"""
+import gc
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from api.database import Database
+from backup_catalog import BackupCatalog
+from server_registry import ServerRegistry
+
+class RecordingDatabase(Database):
+    """Keeps every connection it opens, to check they were closed"""
+    def __init__(self, *args, **kwargs):
+        self.opened = []
+        super().__init__(*args, **kwargs)
+
+    def _connect(self):
+        conn = super()._connect()
+        self.opened.append(conn)
+        return conn
+
+def is_closed(conn):
+    try:
+        conn.execute('SELECT 1')
+    except sqlite3.ProgrammingError:
+        return True
+    return False
+
+class DatabaseTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'test.db')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_thread_connections_closed_when_threads_exit(self):
+        db = RecordingDatabase(self.db_path)
+        threads = [threading.Thread(target=db.metrics_version) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        gc.collect()
+
+        main_conn, *thread_conns = db.opened
+        self.assertEqual(len(thread_conns), 20)
+        self.assertTrue(all(is_closed(conn) for conn in thread_conns))
+        self.assertFalse(is_closed(main_conn))
+        db.close()
+        self.assertTrue(is_closed(main_conn))
+
+    def test_connection_reopened_after_close(self):
+        db = RecordingDatabase(self.db_path)
+        db.close()
+        self.assertIsNone(db.metrics_version())
+        self.assertEqual(len(db.opened), 2)
+        db.close()
+
+    def auto_vacuum(self, db_path):
+        conn = sqlite3.connect(db_path)
+        try:
+            return conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_new_file_uses_incremental_auto_vacuum(self):
+        Database(self.db_path).close()
+        self.assertEqual(self.auto_vacuum(self.db_path), 2)
+
+    def test_incremental_auto_vacuum_when_another_store_creates_the_file(self):
+        for store in (ServerRegistry, BackupCatalog):
+            with self.subTest(store=store.__name__):
+                db_path = os.path.join(self.tmp.name, f'{store.__name__}.db')
+                store(db_path=db_path)
+                Database(db_path).close()
+                self.assertEqual(self.auto_vacuum(db_path), 2)
+
+class MetricStatisticsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.tmp.name, 'test.db'))
+        rng = random.Random(7)
+        self.start = 1_700_000_000 // 3600 * 3600
+        self.end = self.start + 6 * 3600
+        self.db.save_batch([{'timestamp': datetime.fromtimestamp(ts).isoformat(), 'cpu_usage': rng.uniform(0, 100),
+                             'memory_usage': 50.0, 'disk_usage': 50.0, 'process_count': 100}
+                            for ts in range(self.start, self.end, 10)])
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_raw_percentiles_and_time_above_threshold(self):
+        cpu = self.db.metric_statistics(self.start, self.end, {'cpu_usage': 80})['metrics']['cpu_usage']
+        self.assertEqual(cpu['count'], 2160)
+        self.assertGreater(cpu['p95'], 90)
+        self.assertAlmostEqual(cpu['seconds_above_threshold'] / (6 * 3600), 0.2, delta=0.05)
+
+    def test_rollups_leave_out_sample_statistics(self):
+        raw = self.db.metric_statistics(self.start, self.end, {'cpu_usage': 80})['metrics']['cpu_usage']
+        for resolution in ('1m', '1h'):
+            with self.subTest(resolution=resolution):
+                cpu = self.db.metric_statistics(self.start, self.end, {'cpu_usage': 80},
+                                                resolution=resolution)['metrics']['cpu_usage']
+                self.assertEqual((cpu['count'], cpu['min'], cpu['max']), (raw['count'], raw['min'], raw['max']))
+                self.assertAlmostEqual(cpu['mean'], raw['mean'])
+                self.assertEqual((cpu['p50'], cpu['p95'], cpu['p99']), (None, None, None))
+                self.assertIsNone(cpu['seconds_above_threshold'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+"""DockerAPIClient against a fake Engine API served on a local Unix socket, no Docker needed"""
+import asyncio
+import json
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from docker_client import AsyncDockerAPIClient, DockerAPIClient, DockerError
+
+class FakeDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path):
+        super().__init__(path, FakeDockerHandler)
+        self.containers = {}
+        self.images = {'nginx:alpine'}
+        self.requests = []
+        self.drop_next = 0
+        self.lock = threading.Lock()
+
+class FakeDockerHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=None, content_type='application/json'):
+        data = b'' if body is None else body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        if data:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self):
+        daemon = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        parts = url.path.strip('/').split('/')
+        with daemon.lock:
+            daemon.requests.append((self.command, url.path))
+            if daemon.drop_next:
+                # Like a daemon closing an idle keep-alive connection: no response at all
+                daemon.drop_next -= 1
+                self.close_connection = True
+                return
+
+        if url.path == '/_ping':
+            return self._send(200, b'OK', 'text/plain')
+        if url.path == '/events':
+            return self._stream_events()
+        if url.path == '/containers/json':
+            return self._send(200, [{'Id': container_id, 'Names': [f"/{container['name']}"],
+                                     'Image': container['image'], 'State': container['state'],
+                                     'Status': container['state'], 'Created': 0,
+                                     'NetworkSettings': {'Networks': {'bridge': {'IPAddress': '172.17.0.2'}}}}
+                                    for container_id, container in daemon.containers.items()])
+        if url.path == '/containers/create':
+            config = json.loads(body)
+            if config['Image'] not in daemon.images:
+                return self._send(404, {'message': f"No such image: {config['Image']}"})
+            container_id = f"{len(daemon.containers) + 1:064x}"
+            daemon.containers[container_id] = {'name': query['name'], 'image': config['Image'], 'state': 'created'}
+            return self._send(201, {'Id': container_id, 'Warnings': []})
+        if url.path == '/images/create':
+            daemon.images.add(f"{query['fromImage']}:{query['tag']}")
+            return self._send(200, b'{"status":"Pulling"}\n{"status":"Done"}\n', 'application/json')
+
+        container = daemon.containers.get(parts[1]) if len(parts) > 1 else None
+        if container is None:
+            return self._send(404, {'message': f"No such container: {parts[-1]}"})
+        if self.command == 'DELETE':
+            del daemon.containers[parts[1]]
+            return self._send(204)
+        if parts[-1] == 'json':
+            return self._send(200, {'Id': parts[1], 'Name': f"/{container['name']}",
+                                    'Config': {'Image': container['image']}, 'State': {'Status': container['state']},
+                                    'Created': '2024-01-01T10:00:00.123456789Z',
+                                    'NetworkSettings': {'Networks': {'bridge': {'IPAddress': '172.17.0.2'}}}})
+        if parts[-1] in ('start', 'stop'):
+            container['state'] = 'running' if parts[-1] == 'start' else 'exited'
+            return self._send(204)
+        return self._send(404, {'message': 'page not found'})
+
+    def _stream_events(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for action in ('start', 'die'):
+            line = json.dumps({'Type': 'container', 'Action': action, 'time': 1,
+                               'Actor': {'ID': 'abc', 'Attributes': {'name': 'web', 'image': 'nginx'}}}) + '\n'
+            self.wfile.write(f"{len(line):x}\r\n{line}\r\n".encode())
+        self.wfile.write(b'0\r\n\r\n')
+        self.close_connection = True
+
+    do_GET = do_POST = do_DELETE = _handle
+
+class DockerAPIClientTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmp.name, 'docker.sock')
+        self.daemon = FakeDaemon(self.socket_path)
+        threading.Thread(target=self.daemon.serve_forever, daemon=True).start()
+        self.client = DockerAPIClient(self.socket_path, timeout=5)
+
+    def tearDown(self):
+        self.daemon.shutdown()
+        self.daemon.server_close()
+        self.tmp.cleanup()
+
+    def test_ping(self):
+        self.assertTrue(self.client.ping())
+        self.assertFalse(DockerAPIClient(os.path.join(self.tmp.name, 'missing.sock')).ping())
+
+    def test_lifecycle(self):
+        container_id = self.client.run_container('web-1', 'nginx:alpine', ['sleep', '3600'])
+        self.assertEqual(self.daemon.containers[container_id]['state'], 'running')
+        self.assertEqual([c['name'] for c in self.client.list_containers()], ['web-1'])
+        self.assertEqual(self.client.container_ip(container_id), '172.17.0.2')
+        self.assertEqual(self.client.get_container(container_id)['state'], 'running')
+
+        self.client.stop(container_id, timeout=1)
+        self.assertEqual(self.daemon.containers[container_id]['state'], 'exited')
+        self.client.remove(container_id)
+        self.assertEqual(self.daemon.containers, {})
+
+    def test_pulls_missing_image(self):
+        self.client.run_container('cache-1', 'redis:alpine', ['sleep', '3600'])
+        self.assertIn(('POST', '/images/create'), self.daemon.requests)
+        self.assertEqual(len(self.daemon.containers), 1)
+
+    def test_not_found_raises_docker_error(self):
+        with self.assertRaises(DockerError) as raised:
+            self.client.stop('nope')
+        self.assertEqual(raised.exception.status, 404)
+        self.assertIn('No such container', str(raised.exception))
+
+    def test_events_stream(self):
+        events = list(self.client.events())
+        self.assertEqual([event['action'] for event in events], ['start', 'die'])
+        self.assertEqual(events[0]['name'], 'web')
+
+    def test_get_retried_after_dropped_connection(self):
+        self.assertTrue(self.client.ping())
+        self.daemon.drop_next = 1
+        self.assertEqual(self.client.list_containers(), [])
+
+    def test_create_not_retried_after_dropped_connection(self):
+        self.assertTrue(self.client.ping())
+        self.daemon.drop_next = 1
+        with self.assertRaises(DockerError):
+            self.client.run_container('web-1', 'nginx:alpine', ['sleep', '3600'])
+        creates = [request for request in self.daemon.requests if request == ('POST', '/containers/create')]
+        self.assertEqual(len(creates), 1)
+
+    def test_async_client(self):
+        container_id = self.client.run_container('web-1', 'nginx:alpine', ['sleep', '3600'])
+        client = AsyncDockerAPIClient(self.socket_path, timeout=5)
+
+        async def run():
+            await client.stop(container_id, timeout=1)
+            self.assertEqual(self.daemon.containers[container_id]['state'], 'exited')
+            await client.start(container_id)
+            await client.remove(container_id)
+            with self.assertRaises(DockerError) as raised:
+                await client.stop(container_id)
+            return raised.exception.status
+
+        self.assertEqual(asyncio.run(run()), 404)
+        self.assertEqual(self.daemon.containers, {})
+
+if __name__ == '__main__':
+    unittest.main()
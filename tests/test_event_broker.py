@@ -0,0 +1,73 @@
+"""EventBroker fan-out, replay and subscriber limits"""
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from event_broker import EventBroker
+
+class EventBrokerTest(unittest.TestCase):
+    def setUp(self):
+        self.broker = EventBroker(max_queue=4, replay=8)
+
+    def test_event_encoded_once_for_every_subscriber(self):
+        first, _ = self.broker.subscribe()
+        second, _ = self.broker.subscribe()
+        self.broker.publish('metrics', {'cpu_usage': 10})
+        event = first.get(timeout=1)
+        self.assertIs(second.get(timeout=1), event)
+        self.assertIn('event: metrics\n', event)
+        self.assertIn('data: {"cpu_usage": 10}', event)
+
+    def test_reconnect_replays_missed_events(self):
+        self.broker.publish('stats', {'n': 1})
+        last_id = f"{self.broker.epoch}:{self.broker.publish('stats', {'n': 2})}"
+        self.broker.publish('stats', {'n': 3})
+        _, missed = self.broker.subscribe(last_id)
+        self.assertEqual(len(missed), 1)
+        self.assertIn('"n": 3', missed[0])
+
+        # Too old for the replay buffer, or from another process: a fresh snapshot
+        for _ in range(10):
+            self.broker.publish('stats', {})
+        self.assertIsNone(self.broker.subscribe(last_id)[1])
+        self.assertIsNone(self.broker.subscribe('0:1')[1])
+
+    def test_publish_changes_sends_only_differences(self):
+        subscription, _ = self.broker.subscribe()
+        self.assertEqual(self.broker.publish_changes('stats', {'a': 1, 'b': 2}), {'a': 1, 'b': 2})
+        self.assertEqual(self.broker.publish_changes('stats', {'a': 1, 'b': 3}), {'b': 3})
+        self.assertEqual(self.broker.publish_changes('stats', {'a': 1, 'b': 3}), {})
+        self.assertEqual(self.broker.get_stats()['published'], 2)
+
+    def test_slow_subscriber_dropped(self):
+        slow, _ = self.broker.subscribe()
+        for _ in range(5):
+            self.broker.publish('metrics', {})
+        self.assertTrue(slow.closed)
+        self.assertEqual(self.broker.get_stats()['dropped'], 1)
+
+    def test_subscriber_limit(self):
+        first, _ = self.broker.subscribe(limit=1)
+        self.assertEqual(self.broker.subscribe(limit=1), (None, None))
+        self.assertEqual(self.broker.get_stats()['rejected'], 1)
+        first.close()
+        self.assertIsNotNone(self.broker.subscribe(limit=1)[0])
+
+    def test_async_subscription(self):
+        async def run():
+            subscription, _ = self.broker.subscribe(loop=asyncio.get_running_loop())
+            # Published from another thread, as the sampler and registry listeners do
+            await asyncio.to_thread(self.broker.publish, 'metrics', {'cpu_usage': 1})
+            event = await subscription.get(timeout=1)
+            self.assertIsNone(await subscription.get(timeout=0.01))
+            subscription.close()
+            return event
+
+        self.assertIn('"cpu_usage": 1', asyncio.run(run()))
+        self.assertEqual(self.broker.get_stats()['subscribers'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""FileAutomation snapshots and restores in a temporary directory"""
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from backup_catalog import BackupCatalog
+from file_automation import FileAutomation
+
+class ChangingFileAutomation(FileAutomation):
+    """Rewrites each source file just before it is stored, like a writer racing the backup"""
+    def _store_file(self, path):
+        with open(path, 'ab') as f:
+            f.write(b' (changed)')
+        return super()._store_file(path)
+
+class FileAutomationTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = self.path('source')
+        os.makedirs(os.path.join(self.source, 'sub'))
+        self.write('a.txt', b'alpha')
+        self.write('sub/b.txt', b'beta')
+        self.automation = self.make(FileAutomation)
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        self.tmp.cleanup()
+
+    def path(self, *parts):
+        return os.path.join(self.tmp.name, *parts)
+
+    def write(self, rel_path, data):
+        with open(os.path.join(self.source, rel_path), 'wb') as f:
+            f.write(data)
+
+    def make(self, cls):
+        return cls(backup_dir=self.path('backups'), logs_dir=self.path('logs'), restore_dir=self.path('restores'),
+                   catalog=BackupCatalog(self.path('catalog.db')))
+
+    def object_digests(self):
+        """(name digest, content digest) of every stored object"""
+        for dirpath, _, filenames in os.walk(self.automation.objects_dir):
+            for filename in filenames:
+                with open(os.path.join(dirpath, filename), 'rb') as f:
+                    yield os.path.basename(dirpath) + filename, hashlib.sha256(f.read()).hexdigest()
+
+    def test_snapshot_stores_each_content_once(self):
+        first = self.automation.create_snapshot(self.source, 'site')
+        self.assertEqual((first['files'], first['new_objects']), (2, 2))
+        for name, content in self.object_digests():
+            self.assertEqual(name, content)
+
+        second = self.automation.create_snapshot(self.source, 'site')
+        self.assertEqual((second['reused'], second['new_objects']), (2, 0))
+
+    def test_object_named_after_the_bytes_stored(self):
+        automation = self.make(ChangingFileAutomation)
+        snapshot = automation.create_snapshot(self.source, 'site')
+        self.assertEqual(snapshot['new_objects'], 2)
+        for name, content in self.object_digests():
+            self.assertEqual(name, content)
+        self.assertFalse([name for name in os.listdir(automation.objects_dir) if name.startswith('.tmp-')])
+
+    def test_latest_manifest_reads_only_that_backup(self):
+        os.makedirs(self.automation.manifests_dir)
+        for name, backup_name in (('site_20240101_100000', 'site'), ('site_20240102_100000', 'site'),
+                                  ('site_2_20240103_100000', 'site_2')):
+            with open(os.path.join(self.automation.manifests_dir, f"{name}.json"), 'w') as f:
+                json.dump({'name': name, 'backup_name': backup_name}, f)
+        with open(os.path.join(self.automation.manifests_dir, 'site_20240103_100000.json'), 'w') as f:
+            f.write('{truncated')
+
+        self.assertEqual(self.automation._latest_manifest('site')['name'], 'site_20240102_100000')
+        self.assertEqual(self.automation._latest_manifest('site_2')['name'], 'site_2_20240103_100000')
+        self.assertIsNone(self.automation._latest_manifest('other'))
+
+    def test_restore_snapshot(self):
+        snapshot = self.automation.create_snapshot(self.source, 'site')
+        self.assertTrue(self.automation.restore_backup(snapshot['name'], 'copy'))
+        with open(self.path('restores', 'copy', 'sub', 'b.txt'), 'rb') as f:
+            self.assertEqual(f.read(), b'beta')
+
+    def test_restore_target_confined_to_restore_dir(self):
+        snapshot = self.automation.create_snapshot(self.source, 'site')
+        for target in ('', '/tmp/escape', '../escape', 'a/../../escape', '.'):
+            with self.subTest(target=target):
+                self.assertFalse(self.automation.restore_backup(snapshot['name'], target))
+        self.assertFalse(os.path.exists(self.path('escape')))
+
+if __name__ == '__main__':
+    unittest.main()
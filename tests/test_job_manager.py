@@ -0,0 +1,69 @@
+"""JobManager scheduling, per-key limits and shutdown"""
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from job_manager import JobManager, JobQueueFull
+
+class JobManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.started = threading.Semaphore(0)
+
+    def blocking_job(self, progress):
+        self.started.release()
+        self.release.wait(5)
+        return 'done'
+
+    def wait_for(self, manager, job_id, timeout=5):
+        for _ in range(int(timeout / 0.01)):
+            job = manager.get(job_id)
+            if job['status'] not in ('queued', 'running'):
+                return job
+            threading.Event().wait(0.01)
+        self.fail(f"job {job_id} still {job['status']}")
+
+    def test_key_limit_queues_without_holding_pool_threads(self):
+        manager = JobManager(max_workers=2, concurrency_limits={'web': 1})
+        first = manager.submit('deploy', self.blocking_job, concurrency_key='web')
+        second = manager.submit('deploy', self.blocking_job, concurrency_key='web')
+        other = manager.submit('cleanup', lambda progress: 'ok', concurrency_key='cleanup')
+
+        self.assertEqual(self.wait_for(manager, other['id'])['result'], 'ok')
+        self.assertEqual(manager.get_stats()['waiting_for_slot'], {'web': 1})
+        self.release.set()
+        self.assertEqual(self.wait_for(manager, first['id'])['status'], 'succeeded')
+        self.assertEqual(self.wait_for(manager, second['id'])['status'], 'succeeded')
+        self.assertEqual(manager.get_stats()['pending'], 0)
+        manager.shutdown()
+
+    def test_queue_full(self):
+        manager = JobManager(max_workers=1, max_pending=1)
+        manager.submit('deploy', self.blocking_job)
+        with self.assertRaises(JobQueueFull):
+            manager.submit('deploy', self.blocking_job)
+        self.release.set()
+        manager.shutdown()
+
+    def test_shutdown_without_wait_cancels_jobs_not_started(self):
+        manager = JobManager(max_workers=1, concurrency_limits={'web': 1})
+        running = manager.submit('deploy', self.blocking_job, concurrency_key='web')
+        self.assertTrue(self.started.acquire(timeout=5))
+        waiting = manager.submit('deploy', self.blocking_job, concurrency_key='web')
+        queued = manager.submit('cleanup', self.blocking_job)
+
+        manager.shutdown(wait=False)
+        for job in (waiting, queued):
+            self.assertEqual(manager.get(job['id'])['status'], 'cancelled')
+        self.assertEqual(manager.get_stats()['pending'], 1)
+
+        self.release.set()
+        self.assertEqual(self.wait_for(manager, running['id'])['status'], 'succeeded')
+        self.assertEqual(manager.get_stats()['pending'], 0)
+        self.assertEqual(manager._running['web'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
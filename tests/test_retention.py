@@ -0,0 +1,39 @@
+"""RetentionEngine on a temporary database"""
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from api.database import Database
+from api.retention import RetentionEngine
+
+class RetentionEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.tmp.name, 'test.db'))
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def sample(self, when):
+        return {'timestamp': when.isoformat(), 'cpu_usage': 50.0, 'memory_usage': 40.0, 'disk_usage': 30.0,
+                'network_io': {'bytes_sent': 1, 'bytes_recv': 2}, 'process_count': 100}
+
+    def test_old_rows_deleted_and_space_reclaimed(self):
+        old = datetime.now() - timedelta(days=40)
+        self.db.save_batch([self.sample(old + timedelta(seconds=5 * i)) for i in range(5000)])
+        self.db.save_batch([self.sample(datetime.now())])
+
+        report = RetentionEngine(self.db, retention_days=30).run()
+
+        self.assertEqual(report['rows_deleted']['metrics'], 5000)
+        self.assertEqual(self.db.get_metrics_history(10)[0]['cpu_usage'], 50.0)
+        self.assertGreater(report['bytes_reclaimed'], 0)
+        self.assertEqual(self.db._get_conn().execute('PRAGMA freelist_count').fetchone()[0], 0)
+
+if __name__ == '__main__':
+    unittest.main()
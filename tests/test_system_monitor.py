@@ -0,0 +1,65 @@
+"""SystemMonitor's background sampler and follower mode"""
+import logging
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from system_monitor import SystemMonitor
+
+def sample(cpu):
+    return {'timestamp': '2024-01-01T10:00:00', 'cpu_usage': cpu, 'memory_usage': 40.0, 'disk_usage': 30.0,
+            'network_io': {'bytes_sent': 1, 'bytes_recv': 2}, 'process_count': 100}
+
+class SystemMonitorTest(unittest.TestCase):
+    def setUp(self):
+        self.monitor = SystemMonitor(os.path.join(ROOT, 'config', 'monitoring_rules.json'))
+        logging.disable(logging.WARNING)
+
+    def tearDown(self):
+        self.monitor.stop_sampler()
+        logging.disable(logging.NOTSET)
+
+    def test_requests_read_the_sampled_snapshot(self):
+        seen = []
+        self.monitor.add_listener(lambda metrics, alerts: seen.append(metrics))
+        with mock.patch.object(self.monitor, 'get_system_metrics', side_effect=lambda **_: sample(95.0)) as read:
+            self.monitor.start_sampler(interval=60)
+            for _ in range(100):
+                if seen:
+                    break
+                time.sleep(0.01)
+            for _ in range(5):
+                metrics, alerts = self.monitor.monitor_system()
+        self.assertEqual(read.call_count, 1)
+        self.assertEqual(len(seen), 1)
+        self.assertEqual(metrics['cpu_usage'], 95.0)
+        self.assertEqual(alerts, ['High CPU usage: 95.0%'])
+
+    def test_follower_never_samples_on_a_request(self):
+        pending = [[sample(10.0)]]
+        self.monitor.max_staleness = 0
+        with mock.patch.object(self.monitor, 'get_system_metrics') as read:
+            self.monitor.start_sampler(interval=60, source=lambda: pending.pop() if pending else [])
+            for _ in range(100):
+                if self.monitor._latest:
+                    break
+                time.sleep(0.01)
+            metrics, _ = self.monitor.monitor_system()
+        read.assert_not_called()
+        self.assertEqual(metrics['cpu_usage'], 10.0)
+        self.assertTrue(metrics['stale'])
+
+    def test_follower_without_a_sample_yet(self):
+        with mock.patch.object(self.monitor, 'get_system_metrics') as read:
+            self.monitor.start_sampler(interval=60, source=lambda: [])
+            metrics, alerts = self.monitor.monitor_system()
+        read.assert_not_called()
+        self.assertEqual((metrics['cpu_usage'], metrics['stale'], alerts), (None, True, []))
+
+if __name__ == '__main__':
+    unittest.main()